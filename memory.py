@@ -3,27 +3,640 @@ Yevedia AI Chat - Système de Mémoire Persistante
 Base de données SQLite pour stocker les souvenirs de l'IA
 """
 
+import atexit
+import functools
+import heapq
 import sqlite3
+import sys
+import hashlib
+import inspect
+import itertools
 import json
-from datetime import datetime
+import queue
+import math
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime, timezone
 from pathlib import Path
 
 # Chemin de la base de données
 DB_PATH = Path(__file__).parent / "memory.db"
 
+# Réglages SQLite appliqués une fois par connexion
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 64 * 1024           # cache de pages par connexion (64 Mo)
+MMAP_SIZE = 256 * 1024 * 1024       # lecture mappée en mémoire (256 Mo)
 
-def get_connection():
-    """Créer une connexion à la base de données"""
-    conn = sqlite3.connect(str(DB_PATH))
-    conn.row_factory = sqlite3.Row
-    return conn
+# Nombre de connexions inactives conservées par pool
+MAX_IDLE_WRITERS = 4
+MAX_IDLE_READERS = 8
+
+
+class PooledConnection(sqlite3.Connection):
+    """Connexion SQLite dont close() la rend au pool au lieu de la fermer"""
+
+    pool = None
+    readonly = False
+    pinned = False
+
+    def close(self):
+        if self.pinned:
+            # Connexion attitrée à un thread (ThreadConnections): elle reste ouverte
+            return
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+    def close_for_real(self):
+        self.pool = None
+        self.pinned = False
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Pool de connexions thread-safe pour une base SQLite.
+
+    Les écrivains ouvrent la base en lecture/écriture (WAL, synchronous=NORMAL),
+    les lecteurs l'ouvrent en lecture seule (mode=ro) et ne bloquent pas les écritures.
+    Une connexion est créée à la demande si aucune n'est libre, et seules
+    MAX_IDLE_* connexions inactives sont conservées.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._idle = {False: [], True: []}
+        self._writer_ready = False
+        self._closed = False
+
+    def _connect(self, readonly: bool) -> PooledConnection:
+        if readonly:
+            uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_MS / 1000,
+                                   check_same_thread=False, factory=PooledConnection)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000,
+                                   check_same_thread=False, factory=PooledConnection)
+            # N'a d'effet que sur une base neuve, avant que WAL n'écrive l'en-tête
+            # (memory_maintenance.enable_incremental_vacuum convertit les autres)
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+        # ln() n'existe que si SQLite est compilé avec ses fonctions mathématiques
+        # (score d'éviction du cache web, voir _EVICTION_SCORE_SQL)
+        conn.create_function("ln", 1, math.log, deterministic=True)
+        conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.readonly = readonly
+        return conn
+
+    def acquire(self, readonly: bool = False) -> PooledConnection:
+        with self._lock:
+            idle = self._idle[readonly]
+            conn = idle.pop() if idle else None
+            need_writer = readonly and not self._writer_ready
+
+        if need_writer:
+            # Le fichier doit exister (et être en WAL) avant d'ouvrir un lecteur mode=ro
+            self.acquire(readonly=False).close()
+
+        if conn is None:
+            conn = self._connect(readonly)
+            if not readonly:
+                self._writer_ready = True
+        conn.row_factory = sqlite3.Row
+        conn.pool = self
+        return conn
+
+    def release(self, conn: PooledConnection):
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close_for_real()
+            return
+
+        limit = MAX_IDLE_READERS if conn.readonly else MAX_IDLE_WRITERS
+        with self._lock:
+            idle = self._idle[conn.readonly]
+            if not self._closed and len(idle) < limit and conn not in idle:
+                idle.append(conn)
+                return
+        conn.close_for_real()
+
+    def close_all(self):
+        with self._lock:
+            self._closed = True
+            conns = self._idle[False] + self._idle[True]
+            self._idle = {False: [], True: []}
+        for conn in conns:
+            conn.close_for_real()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ConnectionPool:
+    """Retourner le pool associé à DB_PATH (recréé si le chemin change)"""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.db_path == str(DB_PATH):
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.db_path != str(DB_PATH):
+            if _pool is not None:
+                _pool.close_all()
+            _pool = ConnectionPool(DB_PATH)
+        return _pool
+
+
+class ThreadConnections:
+    """
+    Connexions attitrées à un thread: une en lecture, une en écriture.
+
+    Une fois install() appelé dans un thread, get_connection() y retourne
+    toujours ces connexions (ouvertes à la demande) au lieu de passer par le
+    pool, et close() les laisse ouvertes. reset() annule une transaction
+    restée ouverte après une opération; interrupt() peut être appelé depuis
+    un autre thread pour interrompre la requête en cours.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conns = {}
+        self.db_path = None
+
+    def install(self) -> "ThreadConnections":
+        _thread_local.connections = self
+        return self
+
+    @staticmethod
+    def current():
+        """Connexions attitrées du thread courant (None si aucune)"""
+        return getattr(_thread_local, "connections", None)
+
+    def get(self, readonly: bool) -> PooledConnection:
+        pool = _get_pool()
+        with self._lock:
+            if self.db_path != pool.db_path:
+                self._close_all()
+                self.db_path = pool.db_path
+            conn = self._conns.get(readonly)
+        if conn is None:
+            conn = pool.acquire(readonly)
+            conn.pinned = True
+            with self._lock:
+                self._conns[readonly] = conn
+        return conn
+
+    def reset(self):
+        with self._lock:
+            conns = list(self._conns.values())
+        for conn in conns:
+            if conn.in_transaction:
+                conn.rollback()
+
+    def interrupt(self):
+        with self._lock:
+            for conn in self._conns.values():
+                conn.interrupt()
+
+    def _close_all(self):
+        for conn in self._conns.values():
+            conn.close_for_real()
+        self._conns = {}
+
+    def close(self):
+        with self._lock:
+            self._close_all()
+        if ThreadConnections.current() is self:
+            _thread_local.connections = None
+
+
+_thread_local = threading.local()
+
+
+def get_connection(readonly: bool = False):
+    """
+    Obtenir une connexion à la base de données depuis le pool.
+
+    Appeler close() rend la connexion au pool. Avec readonly=True, la connexion
+    est ouverte en lecture seule et ne prend jamais le verrou d'écriture.
+    Dans le thread de la file d'écriture, c'est la connexion de l'écrivain qui
+    est retournée (voir WriteQueue), et dans un thread qui a installé des
+    ThreadConnections, la connexion attitrée de ce thread.
+    """
+    writer = _write_queue
+    if writer is not None and writer.owns_current_thread():
+        return writer.connection
+    pinned = ThreadConnections.current()
+    if pinned is not None:
+        return pinned.get(readonly)
+    return _get_pool().acquire(readonly)
+
+
+def close_all_connections():
+    """Fermer toutes les connexions inactives du pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
+
+# ============================================
+# FILE D'ÉCRITURE (ÉCRIVAIN UNIQUE, COMMIT GROUPÉ)
+# ============================================
+
+# Nombre maximal d'opérations validées par une même transaction
+WRITE_BATCH_MAX = 256
+
+
+class _WriterConnection:
+    """
+    Connexion vue par une opération exécutée dans le thread écrivain.
+
+    commit() et close() ne font rien (la transaction du lot est validée par
+    l'écrivain), rollback() n'annule que l'opération en cours (savepoint).
+    Pour une opération exclusive (WriteQueue.submit_exclusive), commit() et
+    rollback() agissent sur la connexion: l'opération gère ses transactions.
+    """
+
+    exclusive = False
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self):
+        return self._conn.cursor()
+
+    def execute(self, *args):
+        return self._conn.execute(*args)
+
+    def executemany(self, *args):
+        return self._conn.executemany(*args)
+
+    def commit(self):
+        if self.exclusive:
+            self._conn.commit()
+
+    def close(self):
+        pass
+
+    def rollback(self):
+        if self.exclusive:
+            self._conn.rollback()
+        else:
+            self._conn.execute("ROLLBACK TO operation")
+
+
+class WriteQueue:
+    """
+    Thread unique propriétaire de la connexion d'écriture.
+
+    Les opérations soumises (fonctions de ce module ou requêtes SQL) sont
+    exécutées par lots: une transaction par lot, un savepoint par opération
+    pour qu'une erreur n'annule que l'opération fautive. Les Future ne sont
+    résolues qu'après le COMMIT du lot. Une opération exclusive passe seule,
+    entre deux lots, hors de toute transaction.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+        self.connection = None
+        self.batches = 0
+        self.operations = 0
+        self._thread.start()
+
+    def owns_current_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, func, *args, **kwargs) -> Future:
+        """Exécuter func(*args, **kwargs) dans le thread écrivain"""
+        future = Future()
+        self._queue.put((future, func, args, kwargs, False))
+        return future
+
+    def submit_exclusive(self, func, *args, **kwargs) -> Future:
+        """
+        Exécuter func(*args, **kwargs) seule dans le thread écrivain, hors lot.
+
+        Pour les opérations qui gèrent leurs propres transactions (ATTACH,
+        VACUUM, lots validés un par un): les autres écritures attendent
+        qu'elle se termine au lieu de se disputer le verrou avec elle.
+        """
+        future = Future()
+        self._queue.put((future, func, args, kwargs, True))
+        return future
+
+    def execute(self, sql: str, params=()) -> Future:
+        """Exécuter une requête d'écriture; la Future donne le lastrowid"""
+        return self.submit(lambda: self.connection.execute(sql, params).lastrowid)
+
+    def stop(self, timeout: float = None):
+        """Terminer les opérations en attente puis arrêter le thread"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        raw = _get_pool()._connect(readonly=False)
+        raw.row_factory = sqlite3.Row
+        self.connection = _WriterConnection(raw)
+        stopping = False
+        
+        while not stopping:
+            batch = [self._queue.get()]
+            while len(batch) < WRITE_BATCH_MAX:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stopping = True
+                batch = [item for item in batch if item is not None]
+            # Les opérations exclusives coupent le lot, dans l'ordre d'arrivée
+            pending = []
+            for item in batch:
+                if not item[4]:
+                    pending.append(item)
+                    continue
+                if pending:
+                    self._run_batch(raw, pending)
+                    pending = []
+                self._run_exclusive(raw, item)
+            if pending:
+                self._run_batch(raw, pending)
+        
+        raw.close()
+
+    def _run_exclusive(self, raw, item):
+        future, func, args, kwargs, _ = item
+        if not future.set_running_or_notify_cancel():
+            return
+        self.connection.exclusive = True
+        result = error = None
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            error = e
+        finally:
+            self.connection.exclusive = False
+            # Ce que l'opération n'a pas validé n'entre pas dans le lot suivant
+            if raw.in_transaction:
+                raw.rollback()
+        
+        self.operations += 1
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _run_batch(self, raw, batch):
+        done = []
+        try:
+            raw.execute("BEGIN IMMEDIATE")
+            for future, func, args, kwargs, _ in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                raw.execute("SAVEPOINT operation")
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    raw.execute("ROLLBACK TO operation")
+                    raw.execute("RELEASE operation")
+                    done.append((future, None, e))
+                else:
+                    raw.execute("RELEASE operation")
+                    done.append((future, result, None))
+            raw.commit()
+        except Exception as e:
+            # Échec du lot entier (BEGIN ou COMMIT): aucune opération n'est validée
+            if raw.in_transaction:
+                raw.rollback()
+            pending = {id(future) for future, _, _ in done}
+            done = [(future, None, e) for future, _, _ in done]
+            done += [(future, None, e) for future, *_ in batch
+                     if id(future) not in pending and future.running()]
+        
+        self.batches += 1
+        self.operations += len(done)
+        for future, result, error in done:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_write_queue = None
+_write_queue_lock = threading.Lock()
+
+
+def enable_write_queue() -> dict:
+    """
+    Faire passer toutes les écritures de ce processus par un thread écrivain unique.
+
+    Les fonctions marquées @queued_write appelées depuis d'autres threads
+    attendent alors le résultat de leur opération: plus de concurrence sur le
+    verrou d'écriture (ni de "database is locked"), et un seul COMMIT pour
+    toutes les écritures arrivées en même temps.
+    """
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is not None and _write_queue.db_path == str(DB_PATH):
+            return {"success": True, "started": False}
+        if _write_queue is not None:
+            _write_queue.stop()
+        _write_queue = WriteQueue(DB_PATH)
+    return {"success": True, "started": True}
+
+
+def disable_write_queue() -> dict:
+    """Arrêter le thread écrivain (après les opérations en attente)"""
+    global _write_queue
+    with _write_queue_lock:
+        writer, _write_queue = _write_queue, None
+    if writer is None:
+        return {"success": True, "stats": None}
+    writer.stop()
+    return {"success": True, "stats": {"batches": writer.batches, "operations": writer.operations}}
+
+
+def get_write_queue():
+    """Retourner la file d'écriture active (None si les écritures sont directes)"""
+    return _write_queue
+
+
+def _write_wrapper(func, exclusive: bool):
+    params = list(inspect.signature(func).parameters)
+    borrowed = params[0] if params and params[0] in ("cursor", "conn") else None
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        writer = _write_queue
+        if writer is None or writer.owns_current_thread() or writer.db_path != str(DB_PATH):
+            return func(*args, **kwargs)
+        if borrowed and (args[0] if args else kwargs.get(borrowed)) is not None:
+            # Curseur de l'appelant: l'opération fait partie de sa transaction
+            return func(*args, **kwargs)
+        submit = writer.submit_exclusive if exclusive else writer.submit
+        return submit(func, *args, **kwargs).result()
+    return wrapper
+
+
+def queued_write(func):
+    """Décorateur: exécuter la fonction dans le thread écrivain quand la file est active"""
+    return _write_wrapper(func, exclusive=False)
+
+
+def exclusive_write(func):
+    """
+    Décorateur: exécuter la fonction seule dans le thread écrivain, hors lot
+    (voir WriteQueue.submit_exclusive), quand la file est active
+    """
+    return _write_wrapper(func, exclusive=True)
+
+
+def bulk_write(func):
+    """
+    Décorateur des insertions en masse (paramètre commit_every): avec
+    commit_every, la fonction valide elle-même ses lots et passe seule dans le
+    thread écrivain (exclusive_write); sans, c'est une écriture de la file
+    comme une autre (queued_write)
+    """
+    signature = inspect.signature(func)
+    queued, exclusive = queued_write(func), exclusive_write(func)
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        chunked = signature.bind(*args, **kwargs).arguments.get("commit_every")
+        return (exclusive if chunked else queued)(*args, **kwargs)
+    return wrapper
 
 
 def init_database():
-    """Initialiser la base de données avec les tables nécessaires"""
+    """
+    Mettre le schéma de la base à jour.
+
+    Quand le schéma est à jour, l'appel ne coûte qu'une lecture de PRAGMA
+    user_version; sinon les migrations manquantes sont appliquées dans l'ordre.
+    """
+    conn = get_connection()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < SCHEMA_VERSION:
+        migrate_database(conn)
+    conn.close()
+    # Note: Ne pas utiliser print() ici car cela pollue la sortie JSON
+
+
+def add_column_if_missing(cursor, table: str, column: str, decl: str) -> bool:
+    """Ajouter une colonne à une table existante si elle n'y est pas encore"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if any(row[1] == column for row in cursor.fetchall()):
+        return False
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    return True
+
+
+# ============================================
+# ÉCRITURES EN MASSE
+# ============================================
+
+# Nombre de lignes envoyées à la fois à executemany (borne la mémoire utilisée)
+BULK_BATCH_SIZE = 10000
+
+
+def _bulk_rows(items, columns: tuple, defaults: dict):
+    """Convertir des dicts ou des tuples en tuples ordonnés selon columns"""
+    for item in items:
+        if isinstance(item, dict):
+            yield tuple(item.get(col, defaults.get(col)) for col in columns)
+        else:
+            item = tuple(item)
+            yield item + tuple(defaults.get(col) for col in columns[len(item):])
+
+
+def _bulk_insert(sql: str, rows, commit_every: int = None, after_batch=None,
+                 pause_triggers: str = None) -> dict:
+    """
+    Insérer des lignes par lots avec executemany et retourner les ids attribués.
+
+    Args:
+        sql: requête INSERT sur une table à clé AUTOINCREMENT
+        rows: itérable de tuples de paramètres (consommé au fur et à mesure)
+        commit_every: valider tous les N lignes (None = une seule transaction);
+            sans effet dans une opération de lot du thread écrivain, où la
+            transaction appartient à l'écrivain (voir bulk_write)
+        after_batch: fonction (cursor, ids, batch) appelée après chaque lot
+        pause_triggers: nom dans paused_triggers des triggers à suspendre pendant
+            l'insertion (after_batch fait alors leur travail pour tout le lot)
+
+    En cas d'erreur, le lot en cours est annulé; "ids" contient alors les
+    lignes déjà validées (toujours vide quand rien n'a été validé par lots).
+    """
+    batch_size = commit_every or BULK_BATCH_SIZE
+    rows = iter(rows)
+    ids = []
+    committed = 0
+    
     conn = get_connection()
     cursor = conn.cursor()
+    # Dans un lot de l'écrivain, commit() ne valide rien et rollback() annule toute l'opération
+    chunked = commit_every and not (isinstance(conn, _WriterConnection) and not conn.exclusive)
+    try:
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            if pause_triggers:
+                # La ligne n'existe que dans cette transaction: invisible des autres connexions
+                cursor.execute("INSERT OR IGNORE INTO paused_triggers (name) VALUES (?)", (pause_triggers,))
+            cursor.executemany(sql, batch)
+            if pause_triggers:
+                cursor.execute("DELETE FROM paused_triggers WHERE name = ?", (pause_triggers,))
+            # AUTOINCREMENT + verrou d'écriture tenu: les ids du lot sont consécutifs
+            last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+            batch_ids = list(range(last_id - len(batch) + 1, last_id + 1))
+            if after_batch is not None:
+                after_batch(cursor, batch_ids, batch)
+            ids.extend(batch_ids)
+            if chunked:
+                conn.commit()
+                committed = len(ids)
+        conn.commit()
+    except (sqlite3.Error, ValueError) as e:
+        conn.rollback()
+        return {"success": False, "error": f"Erreur dans le lot commençant à la ligne {len(ids) + 1}: {e}",
+                "ids": ids[:committed]}
+    finally:
+        conn.close()
     
+    return {"success": True, "count": len(ids), "ids": ids}
+
+
+# ============================================
+# MIGRATIONS DU SCHÉMA
+# ============================================
+# Chaque migration fait passer PRAGMA user_version de N-1 à N dans une seule
+# transaction. Elles sont idempotentes (IF NOT EXISTS, add_column_if_missing,
+# rattrapages limités aux lignes non traitées): une base créée par une version
+# qui ne connaissait pas user_version (0) repasse sans risque par toutes.
+
+def _migrate_base_schema(cursor):
+    """Tables d'origine: souvenirs, conversations, messages, embeddings, documents, cache web"""
     # Table des souvenirs/mémoires
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS memories (
@@ -98,37 +711,829 @@ def init_database():
             hit_count INTEGER DEFAULT 0
         )
     """)
+
+
+def _migrate_vector_storage(cursor):
+    """Vecteurs des morceaux de documents et dimension des vecteurs"""
+    add_column_if_missing(cursor, "embeddings", "document_id", "INTEGER")
+    add_column_if_missing(cursor, "embeddings", "chunk_index", "INTEGER")
+    add_column_if_missing(cursor, "embeddings", "dim", "INTEGER")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_memory ON embeddings(memory_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_document ON embeddings(document_id, chunk_index)")
+
+
+def _migrate_document_chunks(cursor):
+    """Morceaux de documents (positions en octets UTF-8 dans le contenu)"""
+    # Empreinte du contenu découpé (pour ne redécouper que si le texte change)
+    add_column_if_missing(cursor, "documents", "content_hash", "TEXT")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS document_chunks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            document_id INTEGER NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            start_byte INTEGER NOT NULL,
+            end_byte INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            FOREIGN KEY (document_id) REFERENCES documents(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_document_chunks_position
+        ON document_chunks(document_id, chunk_index)
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS documents_chunks_ad AFTER DELETE ON documents BEGIN
+            DELETE FROM document_chunks WHERE document_id = old.id;
+        END
+    """)
+    
+    # Découper les documents ajoutés avant l'existence des chunks
+    cursor.execute("SELECT id FROM documents WHERE content_hash IS NULL")
+    for (doc_id,) in cursor.fetchall():
+        cursor.execute("SELECT content FROM documents WHERE id = ?", (doc_id,))
+        store_document_chunks(cursor, doc_id, cursor.fetchone()[0])
+
+
+def _migrate_document_pagination(cursor):
+    """Liste paginée des documents et imports en plusieurs morceaux"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_created ON documents(created_at, id)")
+    
+    # Imports de documents en cours (état des décodeurs entre deux envois)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS document_uploads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            type TEXT DEFAULT 'text/plain',
+            size INTEGER DEFAULT 0,
+            received_bytes INTEGER DEFAULT 0,
+            part_count INTEGER DEFAULT 0,
+            base64_pending TEXT DEFAULT '',
+            utf8_pending BLOB DEFAULT x'',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS document_upload_parts (
+            upload_id INTEGER NOT NULL,
+            part_index INTEGER NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (upload_id, part_index)
+        )
+    """)
+
+
+def _migrate_conversations(cursor):
+    """Index des messages par conversation et résumé de la dernière activité"""
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_conversation
+        ON messages(conversation_id, created_at, id)
+    """)
+    
+    # Triggers de résumé suspendus le temps d'un import en masse (voir _bulk_insert)
+    cursor.execute("CREATE TABLE IF NOT EXISTS paused_triggers (name TEXT PRIMARY KEY) WITHOUT ROWID")
     
-    # Index pour recherche rapide par query normalisée
+    # Résumé de la dernière activité, tenu à jour par les triggers de messages
+    add_column_if_missing(cursor, "conversations", "message_count", "INTEGER DEFAULT 0")
+    add_column_if_missing(cursor, "conversations", "last_message_at", "TIMESTAMP")
+    add_column_if_missing(cursor, "conversations", "last_message_preview", "TEXT")
+    init_conversation_triggers(cursor)
+    refresh_conversation_summaries(cursor)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations(updated_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations(session_id, updated_at, id)")
+
+
+def _migrate_search_cache_expiry(cursor):
+    """Recherche par (query_normalized, expires_at) et nettoyage par expires_at"""
+    cursor.execute("DROP INDEX IF EXISTS idx_web_cache_query")
     cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_web_cache_query 
-        ON web_search_cache(query_normalized)
+        CREATE INDEX IF NOT EXISTS idx_web_cache_query_expires 
+        ON web_search_cache(query_normalized, expires_at)
     """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_web_cache_expires ON web_search_cache(expires_at)")
+    
+    # Entrées mises en cache avant que expires_at ne soit renseigné
+    cursor.execute(f"""
+        UPDATE web_search_cache
+        SET expires_at = datetime(created_at, '+' || ({_ttl_sql("source")}) || ' hours')
+        WHERE expires_at IS NULL
+    """)
+
+
+def _migrate_search_cache_fuzzy(cursor):
+    """Mots de la requête et buckets LSH pour la recherche de requêtes proches"""
+    add_column_if_missing(cursor, "web_search_cache", "query_tokens", "TEXT")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS web_search_cache_lsh (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            cache_id INTEGER NOT NULL,
+            PRIMARY KEY (band, bucket, cache_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_web_cache_lsh_entry ON web_search_cache_lsh(cache_id)")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS web_search_cache_lsh_ad AFTER DELETE ON web_search_cache BEGIN
+            DELETE FROM web_search_cache_lsh WHERE cache_id = old.id;
+        END
+    """)
+    cursor.execute("SELECT id, query FROM web_search_cache WHERE query_tokens IS NULL")
+    for cache_id, query in cursor.fetchall():
+        index_cached_query(cursor, cache_id, query)
+
+
+def _migrate_search_cache_budget(cursor):
+    """Résultats compressés, tailles et date du dernier hit pour l'éviction"""
+    add_column_if_missing(cursor, "web_search_cache", "results_size", "INTEGER")
+    add_column_if_missing(cursor, "web_search_cache", "raw_size", "INTEGER")
+    add_column_if_missing(cursor, "web_search_cache", "last_hit_at", "TIMESTAMP")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_web_cache_eviction
+        ON web_search_cache(hit_count, last_hit_at, created_at, results_size)
+    """)
+    cursor.execute("SELECT id, results FROM web_search_cache WHERE results_size IS NULL")
+    for cache_id, results in cursor.fetchall():
+        data, raw_size = compress_results(decode_results(results))
+        cursor.execute("""
+            UPDATE web_search_cache SET results = ?, results_size = ?, raw_size = ? WHERE id = ?
+        """, (data, len(data), raw_size, cache_id))
+
+
+# Horodatage au format de CURRENT_TIMESTAMP (UTC, "AAAA-MM-JJ HH:MM:SS"): les
+# valeurs écrites par datetime.now().isoformat() (heure locale, séparateur "T")
+# sont converties, celles de CURRENT_TIMESTAMP sont gardées telles quelles
+_UTC_TIMESTAMP_SQL = "CASE WHEN {col} LIKE '%T%' THEN datetime({col}, 'utc') ELSE {col} END"
+
+
+def _migrate_deactivation_dates(cursor):
+    """Date de désactivation des souvenirs et documents (pour l'archivage)"""
+    fallbacks = (("memories", _UTC_TIMESTAMP_SQL.format(col="COALESCE(updated_at, created_at)")),
+                 ("documents", _UTC_TIMESTAMP_SQL.format(col="created_at")))
+    for table, fallback in fallbacks:
+        add_column_if_missing(cursor, table, "deactivated_at", "TIMESTAMP")
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_deactivated_au
+            AFTER UPDATE OF is_active ON {table}
+            WHEN new.is_active IS NOT old.is_active BEGIN
+                UPDATE {table}
+                SET deactivated_at = CASE WHEN new.is_active = 1 THEN NULL ELSE CURRENT_TIMESTAMP END
+                WHERE id = new.id;
+            END
+        """)
+        cursor.execute(f"""
+            CREATE INDEX IF NOT EXISTS idx_{table}_deactivated
+            ON {table}(deactivated_at) WHERE is_active = 0
+        """)
+        # Lignes désactivées avant l'existence de la colonne: date la plus proche connue
+        cursor.execute(f"""
+            UPDATE {table} SET deactivated_at = {fallback}
+            WHERE is_active = 0 AND deactivated_at IS NULL
+        """)
+
+
+def _migrate_deactivation_dates_utc(cursor):
+    """
+    Dates de désactivation reprises d'un updated_at local (bases migrées avant
+    la conversion): remises en UTC, au format comparé à datetime('now', ...)
+    """
+    for table in ("memories", "documents"):
+        cursor.execute(f"""
+            UPDATE {table} SET deactivated_at = {_UTC_TIMESTAMP_SQL.format(col="deactivated_at")}
+            WHERE deactivated_at LIKE '%T%'
+        """)
+
+
+def _migrate_search_cache_score(cursor):
+    """Score d'éviction du cache web, tenu à jour par triggers et indexé"""
+    add_column_if_missing(cursor, "web_search_cache", "eviction_score", "REAL")
+    for name, event in (("ai", "AFTER INSERT ON web_search_cache"),
+                        ("au", "AFTER UPDATE OF hit_count, last_hit_at, created_at ON web_search_cache")):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS web_search_cache_score_{name} {event} BEGIN
+                UPDATE web_search_cache SET eviction_score = {_EVICTION_SCORE_SQL.format(row="new")}
+                WHERE id = new.id;
+            END
+        """)
+    cursor.execute(f"""
+        UPDATE web_search_cache SET eviction_score = {_EVICTION_SCORE_SQL.format(row="web_search_cache")}
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_web_cache_score
+        ON web_search_cache(eviction_score, results_size)
+    """)
+
+
+def _migrate_active_memory_buckets(cursor):
+    """Buckets LSH des seuls souvenirs actifs: retirés à la désactivation"""
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS memories_lsh_deactivated_au
+        AFTER UPDATE OF is_active ON memories WHEN new.is_active = 0 BEGIN
+            DELETE FROM memories_lsh WHERE memory_id = new.id;
+        END
+    """)
+    cursor.execute("""
+        DELETE FROM memories_lsh WHERE memory_id IN (SELECT id FROM memories WHERE is_active = 0)
+    """)
+
+
+def _migrate_memory_fingerprints(cursor):
+    """Empreinte MinHash des souvenirs et index LSH pour la détection des quasi-doublons"""
+    add_column_if_missing(cursor, "memories", "fingerprint", "TEXT")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS memories_lsh (
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            memory_id INTEGER NOT NULL,
+            PRIMARY KEY (band, bucket, memory_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_memories_lsh_memory ON memories_lsh(memory_id)")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS memories_lsh_ad AFTER DELETE ON memories BEGIN
+            DELETE FROM memories_lsh WHERE memory_id = old.id;
+        END
+    """)
+    cursor.execute("SELECT id, title, content FROM memories WHERE fingerprint IS NULL")
+    for memory_id, title, content in cursor.fetchall():
+        index_memory_fingerprint(cursor, memory_id, memory_tokens(title, content))
+
+
+# Migrations dans l'ordre: la position (à partir de 1) est la valeur de user_version
+# atteinte après la migration. Ne jamais réordonner ni retirer une entrée.
+MIGRATIONS = [
+    ("schéma initial", _migrate_base_schema),
+    ("stockage vectoriel", _migrate_vector_storage),
+    ("versions des données", lambda cursor: init_data_versions(cursor)),
+    ("morceaux de documents", _migrate_document_chunks),
+    ("recherche plein texte", lambda cursor: init_fulltext(cursor)),
+    ("pagination et import des documents", _migrate_document_pagination),
+    ("index et résumé des conversations", _migrate_conversations),
+    ("expiration du cache web", _migrate_search_cache_expiry),
+    ("requêtes proches du cache web", _migrate_search_cache_fuzzy),
+    ("budget et compression du cache web", _migrate_search_cache_budget),
+    ("compteurs de statistiques", lambda cursor: init_stat_counters(cursor)),
+    ("date de désactivation", _migrate_deactivation_dates),
+    ("empreintes des souvenirs", _migrate_memory_fingerprints),
+    ("dates de désactivation en UTC", _migrate_deactivation_dates_utc),
+    ("score d'éviction du cache web", _migrate_search_cache_score),
+    ("buckets LSH des souvenirs actifs", _migrate_active_memory_buckets),
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version() -> int:
+    """Version du schéma de la base (PRAGMA user_version)"""
+    conn = get_connection()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.close()
+    return version
+
+
+def migrate_database(conn=None, target: int = None) -> dict:
+    """
+    Appliquer les migrations manquantes, chacune dans sa propre transaction.
+
+    Le verrou d'écriture est pris avant de relire user_version: si un autre
+    processus migre en même temps, chaque migration n'est appliquée qu'une fois.
+    En cas d'erreur, la migration en cours est annulée et l'exception remontée.
+    """
+    own = conn is None
+    if own:
+        conn = get_connection()
+    target = SCHEMA_VERSION if target is None else min(target, SCHEMA_VERSION)
+    start = conn.execute("PRAGMA user_version").fetchone()[0]
+    applied = []
+    
+    try:
+        for version in range(start + 1, target + 1):
+            conn.execute("BEGIN IMMEDIATE")
+            if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                conn.rollback()
+                continue
+            name, migrate = MIGRATIONS[version - 1]
+            migrate(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+            applied.append({"version": version, "name": name})
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        if own:
+            conn.close()
+    
+    return {"success": True, "from": start, "to": max([start] + [m["version"] for m in applied]),
+            "applied": applied}
+
+
+# ============================================
+# VERSIONS DES DONNÉES (INVALIDATION DES CACHES)
+# ============================================
+
+# Table -> événements qui incrémentent son compteur de version.
+# Les vecteurs sont immuables (remplacer = supprimer + insérer): pour embeddings,
+# seules les suppressions comptent, les insertions étant détectées par le
+# filigrane de rowid de l'index vectoriel.
+VERSIONED_TABLES = {
+    "memories": ("INSERT", "UPDATE", "DELETE"),
+    "documents": ("INSERT", "UPDATE", "DELETE"),
+    "embeddings": ("DELETE",),
+}
+
+
+def init_data_versions(cursor):
+    """
+    Créer la table data_versions et les triggers qui l'incrémentent.
+
+    Les triggers voient toutes les écritures, y compris celles d'autres processus:
+    un cache en mémoire n'a qu'à relire une ligne pour savoir s'il est périmé.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    
+    for table, events in VERSIONED_TABLES.items():
+        cursor.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES (?, 0)", (table,))
+        for event in events:
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                AFTER {event} ON {table} BEGIN
+                    UPDATE data_versions SET version = version + 1 WHERE name = '{table}';
+                END
+            """)
+
+
+def get_data_versions(conn=None) -> dict:
+    """Lire les compteurs de version (name -> version)"""
+    own = conn is None
+    if own:
+        conn = get_connection(readonly=True)
+    rows = conn.execute("SELECT name, version FROM data_versions").fetchall()
+    if own:
+        conn.close()
+    return {row[0]: row[1] for row in rows}
+
+
+# ============================================
+# COMPTEURS (STATISTIQUES EN O(1))
+# ============================================
+
+# Compteur -> expression SQL qui le recalcule (les compteurs par catégorie
+# sont recalculés à part, voir rebuild_stat_counters)
+STAT_COUNTERS = {
+    "memories": "SELECT COUNT(*) FROM memories WHERE is_active = 1",
+    "conversations": "SELECT COUNT(*) FROM conversations",
+    "messages": "SELECT COUNT(*) FROM messages",
+    "search_cache.entries": "SELECT COUNT(*) FROM web_search_cache",
+    "search_cache.hits": "SELECT COALESCE(SUM(hit_count), 0) FROM web_search_cache",
+    "search_cache.bytes_stored": "SELECT COALESCE(SUM(results_size), 0) FROM web_search_cache",
+    "search_cache.bytes_raw": "SELECT COALESCE(SUM(raw_size), 0) FROM web_search_cache",
+}
+
+# Préfixe des compteurs de souvenirs actifs par catégorie
+CATEGORY_COUNTER_PREFIX = "memories.category:"
+
+
+def _bump(name_sql: str, delta_sql: str) -> str:
+    """Instruction d'un trigger qui ajoute delta_sql au compteur name_sql"""
+    return f"""
+        INSERT INTO stat_counters (name, value) VALUES ({name_sql}, {delta_sql})
+        ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;"""
+
+
+def init_stat_counters(cursor):
+    """
+    Créer la table stat_counters et les triggers qui la tiennent à jour.
+
+    Les fonctions de statistiques ne lisent plus que cette table au lieu de
+    compter les lignes à chaque appel.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'stat_counters'")
+    created = cursor.fetchone() is None
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stat_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    
+    active = lambda row: f"(CASE WHEN {row}.is_active = 1 THEN 1 ELSE 0 END)"
+    category = lambda row: f"'{CATEGORY_COUNTER_PREFIX}' || {row}.category"
+    triggers = {
+        "memories_counters_ai": ("AFTER INSERT ON memories",
+            _bump("'memories'", active("new")) + _bump(category("new"), active("new"))),
+        "memories_counters_ad": ("AFTER DELETE ON memories",
+            _bump("'memories'", f"-{active('old')}") + _bump(category("old"), f"-{active('old')}")),
+        "memories_counters_au": ("AFTER UPDATE OF is_active, category ON memories",
+            _bump("'memories'", f"{active('new')} - {active('old')}")
+            + _bump(category("old"), f"-{active('old')}") + _bump(category("new"), active("new"))),
+        "conversations_counters_ai": ("AFTER INSERT ON conversations", _bump("'conversations'", "1")),
+        "conversations_counters_ad": ("AFTER DELETE ON conversations", _bump("'conversations'", "-1")),
+        "messages_counters_ai": ("AFTER INSERT ON messages", _bump("'messages'", "1")),
+        "messages_counters_ad": ("AFTER DELETE ON messages", _bump("'messages'", "-1")),
+        "search_cache_counters_ai": ("AFTER INSERT ON web_search_cache",
+            _bump("'search_cache.entries'", "1")
+            + _bump("'search_cache.hits'", "COALESCE(new.hit_count, 0)")
+            + _bump("'search_cache.bytes_stored'", "COALESCE(new.results_size, 0)")
+            + _bump("'search_cache.bytes_raw'", "COALESCE(new.raw_size, 0)")),
+        "search_cache_counters_ad": ("AFTER DELETE ON web_search_cache",
+            _bump("'search_cache.entries'", "-1")
+            + _bump("'search_cache.hits'", "-COALESCE(old.hit_count, 0)")
+            + _bump("'search_cache.bytes_stored'", "-COALESCE(old.results_size, 0)")
+            + _bump("'search_cache.bytes_raw'", "-COALESCE(old.raw_size, 0)")),
+        "search_cache_counters_au": ("AFTER UPDATE OF hit_count, results_size, raw_size ON web_search_cache",
+            _bump("'search_cache.hits'", "COALESCE(new.hit_count, 0) - COALESCE(old.hit_count, 0)")
+            + _bump("'search_cache.bytes_stored'", "COALESCE(new.results_size, 0) - COALESCE(old.results_size, 0)")
+            + _bump("'search_cache.bytes_raw'", "COALESCE(new.raw_size, 0) - COALESCE(old.raw_size, 0)")),
+    }
+    for name, (event, body) in triggers.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+    
+    if created:
+        rebuild_stat_counters(cursor)
+
+
+@queued_write
+def rebuild_stat_counters(cursor=None) -> dict:
+    """Recalculer tous les compteurs depuis les tables (si jamais ils ont dérivé)"""
+    conn = None
+    if cursor is None:
+        conn = get_connection()
+        cursor = conn.cursor()
+    
+    cursor.execute("DELETE FROM stat_counters")
+    for name, query in STAT_COUNTERS.items():
+        cursor.execute(f"INSERT INTO stat_counters (name, value) VALUES (?, ({query}))", (name,))
+    cursor.execute("""
+        INSERT INTO stat_counters (name, value)
+        SELECT ? || category, COUNT(*) FROM memories WHERE is_active = 1 GROUP BY category
+    """, (CATEGORY_COUNTER_PREFIX,))
+    
+    cursor.execute("SELECT name, value FROM stat_counters")
+    counters = {row[0]: row[1] for row in cursor.fetchall()}
+    if conn is not None:
+        conn.commit()
+        conn.close()
+    
+    return {"success": True, "counters": counters}
+
+
+def get_stat_counters(conn=None) -> dict:
+    """Lire tous les compteurs (name -> value)"""
+    own = conn is None
+    if own:
+        conn = get_connection(readonly=True)
+    rows = conn.execute("SELECT name, value FROM stat_counters").fetchall()
+    if own:
+        conn.close()
+    return {row[0]: row[1] for row in rows}
+
+
+# ============================================
+# RECHERCHE PLEIN TEXTE (FTS5)
+# ============================================
+
+# Tokenizer insensible aux accents ("meteo" trouve "météo")
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Tables indexées: table source -> colonnes texte
+FTS_TABLES = {
+    "memories": ("title", "content"),
+    "documents": ("name", "content"),
+    "document_chunks": ("content",),
+}
+
+# Marqueurs de surlignage des extraits (rendus en gras par le Markdown du chat)
+SNIPPET_START = "**"
+SNIPPET_END = "**"
+
+
+def init_fulltext(cursor) -> bool:
+    """
+    Créer les tables FTS5 et les triggers qui les synchronisent avec leur table source.
+
+    Une table FTS nouvellement créée est remplie à partir des lignes existantes,
+    ce qui migre les anciens fichiers memory.db au premier démarrage.
+    Retourne False si SQLite n'a pas été compilé avec FTS5.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    existing = {row[0] for row in cursor.fetchall()}
+
+    for table, columns in FTS_TABLES.items():
+        fts = f"{table}_fts"
+        cols = ", ".join(columns)
+        new_values = ", ".join(f"new.{c}" for c in columns)
+        old_values = ", ".join(f"old.{c}" for c in columns)
+
+        try:
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts}
+                USING fts5({cols}, content='{table}', content_rowid='id', tokenize='{FTS_TOKENIZER}')
+            """)
+        except sqlite3.OperationalError:
+            return False
+
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+            END
+        """)
+        # Seules les modifications de texte réindexent (pas is_active, priority...)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});
+            END
+        """)
+
+        if fts not in existing:
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    return True
+
+
+@queued_write
+def rebuild_fulltext_index() -> dict:
+    """Reconstruire et compacter les index FTS5 (après un import ou une réparation)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    if not init_fulltext(cursor):
+        conn.close()
+        return {"success": False, "error": "FTS5 non disponible dans cette version de SQLite"}
+    
+    for table in FTS_TABLES:
+        cursor.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('optimize')")
     
     conn.commit()
     conn.close()
-    # Note: Ne pas utiliser print() ici car cela pollue la sortie JSON
+    
+    return {"success": True, "tables": [f"{table}_fts" for table in FTS_TABLES]}
+
+
+def fts_match_expression(query: str) -> str:
+    """
+    Transformer une requête utilisateur en expression MATCH FTS5.
+
+    Chaque mot devient un terme entre guillemets (pas d'injection de syntaxe FTS),
+    les mots de 3 lettres ou plus sont cherchés en préfixe ("voyag" trouve
+    "voyage" et "voyageur"), et les termes sont combinés en OR: le classement
+    BM25 place en tête les souvenirs qui contiennent le plus de termes.
+    """
+    terms = []
+    for word in re.findall(r"\w+", query):
+        terms.append(f'"{word}"*' if len(word) >= 3 else f'"{word}"')
+    return " OR ".join(terms)
 
 
 # ============================================
-# GESTION DES SOUVENIRS (MEMORIES)
+# SOUVENIRS: QUASI-DOUBLONS (MINHASH / LSH)
 # ============================================
+# Même signature que pour le cache web (query_tokens, lsh_buckets): les mots
+# du titre et du contenu, regroupés en LSH_BANDS buckets dans memories_lsh.
+
+# Similarité (Jaccard des mots) à partir de laquelle deux souvenirs de la même
+# catégorie sont des quasi-doublons ("Mon nom: Jean" / "Nom: Jean")
+DUPLICATE_THRESHOLD = 0.8
+
+# Traitement d'un quasi-doublon par add_memory:
+#   "merge"  -> le souvenir existant prend le nouveau texte et monte en priorité
+#   "reject" -> rien n'est écrit, l'id du souvenir existant est retourné
+#   "allow"  -> insertion sans vérification
+# L'empreinte est un ensemble de mots (ni ordre, ni champ d'origine): deux
+# souvenirs différents ("Paul travaille chez..." / "Marie travaille chez...")
+# peuvent atteindre le seuil. La fusion, qui écrase le texte existant, n'est
+# donc jamais implicite: elle se demande appel par appel.
+DUPLICATE_POLICIES = ("merge", "reject", "allow")
+DUPLICATE_POLICY = "allow"
+
+# Priorité au-delà de laquelle une fusion ne fait plus monter un souvenir
+MERGE_PRIORITY_CAP = 5
+
+
+def memory_tokens(title: str, content: str) -> list:
+    """Mots significatifs d'un souvenir (titre et contenu)"""
+    return query_tokens(f"{title} {content}")
+
+
+def index_memory_fingerprint(cursor, memory_id: int, tokens: list):
+    """Enregistrer l'empreinte (mots) et les buckets LSH d'un souvenir"""
+    fingerprint = " ".join(tokens)
+    cursor.execute("UPDATE memories SET fingerprint = ? WHERE id = ? AND fingerprint IS NOT ?",
+                   (fingerprint, memory_id, fingerprint))
+    cursor.execute("DELETE FROM memories_lsh WHERE memory_id = ?", (memory_id,))
+    cursor.executemany("""
+        INSERT OR IGNORE INTO memories_lsh (band, bucket, memory_id)
+        VALUES (?, ?, ?)
+    """, [(band, bucket, memory_id) for band, bucket in enumerate(lsh_buckets(tokens))])
+
 
-def add_memory(title: str, content: str, category: str = "knowledge", priority: int = 1) -> dict:
-    """Ajouter un nouveau souvenir à la mémoire"""
+def _merged_priority(*priorities, merged: int = 1) -> int:
+    """Priorité après fusion: la plus haute, relevée d'un cran par souvenir fusionné"""
+    priority = max(p or 0 for p in priorities)
+    return priority if priority >= MERGE_PRIORITY_CAP else min(priority + merged, MERGE_PRIORITY_CAP)
+
+
+def _find_duplicate_memory(cursor, tokens: list, category: str = None, threshold: float = None):
+    tokens = set(tokens)
+    buckets = lsh_buckets(sorted(tokens))
+    if not buckets:
+        return None
+    threshold = DUPLICATE_THRESHOLD if threshold is None else threshold
+    
+    bands = " OR ".join("(l.band = ? AND l.bucket = ?)" for _ in buckets)
+    params = [value for band, bucket in enumerate(buckets) for value in (band, bucket)]
+    condition = ""
+    if category is not None:
+        condition = "AND m.category = ?"
+        params.append(category)
+    # Les buckets sont retirés à la désactivation; le filtre sur is_active, avant
+    # le classement, écarte encore ceux d'un souvenir désactivé puis modifié
+    cursor.execute(f"""
+        SELECT m.id, m.title, m.category, m.priority, m.fingerprint
+        FROM memories_lsh l
+        JOIN memories m ON m.id = l.memory_id
+        WHERE ({bands}) AND m.is_active = 1 {condition}
+        GROUP BY m.id
+        ORDER BY COUNT(*) DESC
+        LIMIT ?
+    """, params + [FUZZY_CANDIDATES])
+    
+    best = None
+    for row in cursor.fetchall():
+        other = set((row["fingerprint"] or "").split())
+        similarity = len(tokens & other) / len(tokens | other) if other else 0.0
+        if similarity >= threshold and (best is None or similarity > best["similarity"]):
+            best = {"id": row["id"], "title": row["title"], "category": row["category"],
+                    "priority": row["priority"], "similarity": similarity}
+    return best
+
+
+def find_duplicate_memory(title: str, content: str, category: str = None, threshold: float = None) -> dict:
+    """
+    Trouver le souvenir actif le plus proche d'un titre et d'un contenu.
+
+    Returns:
+        dict (id, title, category, priority, similarity) ou None sous le seuil
+    """
+    conn = get_connection(readonly=True)
+    try:
+        return _find_duplicate_memory(conn.cursor(), memory_tokens(title, content), category, threshold)
+    finally:
+        conn.close()
+
+
+@queued_write
+def deduplicate_memories(threshold: float = None, category: str = None, dry_run: bool = False) -> dict:
+    """
+    Fusionner les quasi-doublons parmi les souvenirs actifs existants.
+
+    Les paires candidates sont celles qui partagent un bucket LSH (les
+    souvenirs désactivés n'en ont plus, voir _migrate_active_memory_buckets); dans chaque
+    groupe, le souvenir le plus ancien est gardé avec le texte du plus récent
+    et une priorité relevée, les autres sont désactivés (soft delete).
+
+    Returns:
+        dict avec "groups" (id gardé -> ids fusionnés) et "merged"
+    """
+    threshold = DUPLICATE_THRESHOLD if threshold is None else threshold
     conn = get_connection()
     cursor = conn.cursor()
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
     
     cursor.execute("""
-        INSERT INTO memories (title, content, category, priority)
-        VALUES (?, ?, ?, ?)
-    """, (title, content, category, priority))
+        SELECT DISTINCT a.memory_id, b.memory_id
+        FROM memories_lsh a
+        JOIN memories_lsh b ON b.band = a.band AND b.bucket = a.bucket AND b.memory_id > a.memory_id
+    """)
+    candidates = {}
+    for kept, duplicate in cursor.fetchall():
+        candidates.setdefault(duplicate, []).append(kept)
+    
+    involved = set(candidates) | {kept for kept_ids in candidates.values() for kept in kept_ids}
+    cursor.execute("""
+        SELECT id, category, priority, fingerprint FROM memories WHERE is_active = 1
+    """)
+    rows = {row["id"]: row for row in cursor.fetchall() if row["id"] in involved
+            and (category is None or row["category"] == category)}
+    
+    # Du plus ancien au plus récent: chaque souvenir rejoint le plus proche des
+    # souvenirs gardés avant lui (jamais un souvenir déjà fusionné)
+    merged_into = {}
+    for duplicate in sorted(candidates):
+        row = rows.get(duplicate)
+        if row is None:
+            continue
+        tokens = set((row["fingerprint"] or "").split())
+        best = None
+        for kept in candidates[duplicate]:
+            other = rows.get(kept)
+            if other is None or kept in merged_into or other["category"] != row["category"]:
+                continue
+            other_tokens = set((other["fingerprint"] or "").split())
+            union = tokens | other_tokens
+            similarity = len(tokens & other_tokens) / len(union) if union else 0.0
+            if similarity >= threshold and (best is None or similarity > best[1]):
+                best = (kept, similarity)
+        if best is not None:
+            merged_into[duplicate] = best[0]
+    
+    groups = {}
+    for duplicate, kept in merged_into.items():
+        groups.setdefault(kept, []).append(duplicate)
+    
+    if not dry_run:
+        now = datetime.now().isoformat()
+        for kept, duplicates in groups.items():
+            cursor.execute("SELECT title, content FROM memories WHERE id = ?", (max(duplicates),))
+            title, content = cursor.fetchone()
+            priority = _merged_priority(*(rows[i]["priority"] for i in [kept] + duplicates),
+                                        merged=len(duplicates))
+            cursor.execute("""
+                UPDATE memories SET title = ?, content = ?, priority = ?, updated_at = ? WHERE id = ?
+            """, (title, content, priority, now, kept))
+            index_memory_fingerprint(cursor, kept, memory_tokens(title, content))
+            cursor.execute(f"""
+                UPDATE memories SET is_active = 0 WHERE id IN ({", ".join("?" * len(duplicates))})
+            """, duplicates)
+        conn.commit()
+    else:
+        conn.rollback()
+    conn.close()
+    
+    return {"success": True, "groups": groups, "merged": len(merged_into), "dry_run": dry_run}
+
+
+# ============================================
+# GESTION DES SOUVENIRS (MEMORIES)
+# ============================================
+
+@queued_write
+def add_memory(title: str, content: str, category: str = "knowledge", priority: int = 1,
+               duplicates: str = None) -> dict:
+    """
+    Ajouter un nouveau souvenir à la mémoire.
+
+    Args:
+        duplicates: traitement d'un quasi-doublon actif de la même catégorie,
+            "merge", "reject" ou "allow" (None = DUPLICATE_POLICY)
+    """
+    policy = DUPLICATE_POLICY if duplicates is None else duplicates
+    if policy not in DUPLICATE_POLICIES:
+        return {"success": False, "error": f"Politique de doublons inconnue: {policy}"}
+    tokens = memory_tokens(title, content)
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    duplicate = None
+    if policy != "allow":
+        # Verrou d'écriture pris avant la recherche: deux ajouts simultanés du
+        # même souvenir ne peuvent pas passer tous les deux
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        duplicate = _find_duplicate_memory(cursor, tokens, category)
+    
+    if duplicate is not None and policy == "reject":
+        conn.rollback()
+        conn.close()
+        return {
+            "success": False,
+            "error": "Quasi-doublon d'un souvenir existant",
+            "duplicate_of": duplicate["id"],
+            "similarity": duplicate["similarity"]
+        }
+    
+    if duplicate is not None:
+        memory_id = duplicate["id"]
+        priority = _merged_priority(duplicate["priority"], priority)
+        cursor.execute("""
+            UPDATE memories SET title = ?, content = ?, priority = ?, updated_at = ?
+            WHERE id = ?
+        """, (title, content, priority, datetime.now().isoformat(), memory_id))
+    else:
+        cursor.execute("""
+            INSERT INTO memories (title, content, category, priority, fingerprint)
+            VALUES (?, ?, ?, ?, ?)
+        """, (title, content, category, priority, " ".join(tokens)))
+        memory_id = cursor.lastrowid
+    index_memory_fingerprint(cursor, memory_id, tokens)
     
-    memory_id = cursor.lastrowid
     conn.commit()
     conn.close()
     
-    return {
+    result = {
         "id": memory_id,
         "title": title,
         "content": content,
@@ -136,6 +1541,37 @@ def add_memory(title: str, content: str, category: str = "knowledge", priority:
         "priority": priority,
         "success": True
     }
+    if duplicate is not None:
+        result.update(merged=True, similarity=duplicate["similarity"])
+    return result
+
+
+def _index_memory_batch(cursor, ids, batch):
+    """after_batch d'add_memories: buckets LSH des souvenirs insérés"""
+    cursor.executemany("""
+        INSERT OR IGNORE INTO memories_lsh (band, bucket, memory_id)
+        VALUES (?, ?, ?)
+    """, [(band, bucket, memory_id)
+          for memory_id, row in zip(ids, batch)
+          for band, bucket in enumerate(lsh_buckets(row[4].split()))])
+
+
+@bulk_write
+def add_memories(memories, commit_every: int = None) -> dict:
+    """
+    Ajouter plusieurs souvenirs en une transaction.
+
+    memories: itérable de dicts (title, content, category, priority) ou de tuples
+    dans cet ordre. Retourne {"success", "count", "ids"}. Les quasi-doublons ne
+    sont pas vérifiés ligne à ligne: passer deduplicate_memories() après l'import.
+    """
+    rows = _bulk_rows(memories, ("title", "content", "category", "priority"),
+                      {"category": "knowledge", "priority": 1})
+    rows = (row + (" ".join(memory_tokens(row[0], row[1])),) for row in rows)
+    return _bulk_insert("""
+        INSERT INTO memories (title, content, category, priority, fingerprint)
+        VALUES (?, ?, ?, ?, ?)
+    """, rows, commit_every, after_batch=_index_memory_batch)
 
 
 def add_memory_base64(title_b64: str, content_b64: str, category: str = "knowledge", priority: int = 1) -> dict:
@@ -151,19 +1587,23 @@ def add_memory_base64(title_b64: str, content_b64: str, category: str = "knowled
     return add_memory(title, content, category, priority)
 
 
+# Colonnes renvoyées par les lectures de souvenirs (jamais l'empreinte MinHash)
+MEMORY_COLUMNS = "id, title, content, category, priority, created_at, updated_at, is_active, deactivated_at"
+
+
 def get_all_memories(active_only: bool = True) -> list:
     """Récupérer tous les souvenirs"""
-    conn = get_connection()
+    conn = get_connection(readonly=True)
     cursor = conn.cursor()
     
     if active_only:
-        cursor.execute("""
-            SELECT * FROM memories 
+        cursor.execute(f"""
+            SELECT {MEMORY_COLUMNS} FROM memories 
             WHERE is_active = 1 
             ORDER BY priority DESC, created_at DESC
         """)
     else:
-        cursor.execute("SELECT * FROM memories ORDER BY priority DESC, created_at DESC")
+        cursor.execute(f"SELECT {MEMORY_COLUMNS} FROM memories ORDER BY priority DESC, created_at DESC")
     
     rows = cursor.fetchall()
     conn.close()
@@ -173,11 +1613,11 @@ def get_all_memories(active_only: bool = True) -> list:
 
 def get_memories_by_category(category: str) -> list:
     """Récupérer les souvenirs par catégorie"""
-    conn = get_connection()
+    conn = get_connection(readonly=True)
     cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT * FROM memories 
+    cursor.execute(f"""
+        SELECT {MEMORY_COLUMNS} FROM memories 
         WHERE category = ? AND is_active = 1
         ORDER BY priority DESC, created_at DESC
     """, (category,))
@@ -188,6 +1628,7 @@ def get_memories_by_category(category: str) -> list:
     return [dict(row) for row in rows]
 
 
+@queued_write
 def update_memory(memory_id: int, title: str = None, content: str = None, 
                   category: str = None, priority: int = None) -> dict:
     """Mettre à jour un souvenir existant"""
@@ -220,12 +1661,19 @@ def update_memory(memory_id: int, title: str = None, content: str = None,
         WHERE id = ?
     """, values)
     
+    if title is not None or content is not None:
+        cursor.execute("SELECT title, content FROM memories WHERE id = ?", (memory_id,))
+        row = cursor.fetchone()
+        if row is not None:
+            index_memory_fingerprint(cursor, memory_id, memory_tokens(row["title"], row["content"]))
+    
     conn.commit()
     conn.close()
     
     return {"id": memory_id, "success": True}
 
 
+@queued_write
 def delete_memory(memory_id: int, soft_delete: bool = True) -> dict:
     """Supprimer un souvenir (soft delete par défaut)"""
     conn = get_connection()
@@ -242,6 +1690,7 @@ def delete_memory(memory_id: int, soft_delete: bool = True) -> dict:
     return {"id": memory_id, "deleted": True}
 
 
+@queued_write
 def clear_all_memories() -> dict:
     """Effacer toute la mémoire"""
     conn = get_connection()
@@ -255,17 +1704,43 @@ def clear_all_memories() -> dict:
     return {"success": True, "message": "Mémoire effacée"}
 
 
-def search_memories(query: str) -> list:
-    """Rechercher dans les souvenirs (recherche simple)"""
-    conn = get_connection()
+def search_memories(query: str, limit: int = 20) -> list:
+    """
+    Rechercher dans les souvenirs actifs, classés par pertinence (BM25).
+
+    Chaque résultat contient en plus un extrait surligné ("snippet") et son score
+    (plus petit = plus pertinent). Sans FTS5, repli sur une recherche LIKE.
+    """
+    match = fts_match_expression(query)
+    conn = get_connection(readonly=True)
     cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT * FROM memories 
+    if match:
+        try:
+            cursor.execute(f"""
+                SELECT {", ".join("m." + column for column in MEMORY_COLUMNS.split(", "))},
+                       snippet(memories_fts, -1, ?, ?, '…', 16) AS snippet,
+                       bm25(memories_fts, 2.0, 1.0) AS score
+                FROM memories_fts
+                JOIN memories m ON m.id = memories_fts.rowid
+                WHERE memories_fts MATCH ? AND m.is_active = 1
+                ORDER BY score, m.priority DESC
+                LIMIT ?
+            """, (SNIPPET_START, SNIPPET_END, match, limit))
+            rows = cursor.fetchall()
+            conn.close()
+            return [dict(row) for row in rows]
+        except sqlite3.OperationalError:
+            # Table FTS absente (base non migrée ou SQLite sans FTS5)
+            pass
+    
+    cursor.execute(f"""
+        SELECT {MEMORY_COLUMNS} FROM memories 
         WHERE is_active = 1 
         AND (title LIKE ? OR content LIKE ?)
         ORDER BY priority DESC
-    """, (f"%{query}%", f"%{query}%"))
+        LIMIT ?
+    """, (f"%{query}%", f"%{query}%", limit))
     
     rows = cursor.fetchall()
     conn.close()
@@ -273,40 +1748,199 @@ def search_memories(query: str) -> list:
     return [dict(row) for row in rows]
 
 
+# Catégories affichées dans le contexte, dans l'ordre
+CONTEXT_CATEGORIES = {
+    "identity": "👤 Identité",
+    "preferences": "⚙️ Préférences",
+    "knowledge": "📚 Connaissances",
+    "instructions": "📋 Instructions"
+}
+
+CONTEXT_HEADER = "Contexte et informations importantes à retenir:\n\n"
+CONTEXT_FOOTER = "Utilise ces informations pour personnaliser tes réponses.\n\n"
+
+# Dernier contexte rendu, valable tant que la version de "memories" ne change pas
+_context_cache = {"key": None, "context": None}
+_context_lock = threading.Lock()
+
+
 def build_memory_context() -> str:
-    """Construire le contexte mémoire pour le prompt"""
-    memories = get_all_memories()
+    """
+    Construire le contexte mémoire pour le prompt.
+
+    Le résultat est mis en cache et réutilisé tant que data_versions["memories"]
+    ne change pas: toute écriture dans memories (y compris depuis un autre
+    processus) incrémente ce compteur via trigger, un appel sans changement ne
+    coûte donc qu'une lecture d'une ligne.
+    """
+    conn = get_connection(readonly=True)
+    row = conn.execute("SELECT version FROM data_versions WHERE name = 'memories'").fetchone()
+    conn.close()
+    key = (str(DB_PATH), row["version"] if row else None)
+    
+    with _context_lock:
+        if key[1] is not None and _context_cache["key"] == key:
+            return _context_cache["context"]
     
+    context = render_memory_context(get_all_memories())
+    
+    with _context_lock:
+        _context_cache["key"] = key
+        _context_cache["context"] = context
+    return context
+
+
+def render_memory_context(memories: list) -> str:
+    """Mettre en forme une liste de souvenirs (groupés par catégorie, en une passe)"""
     if not memories:
         return ""
     
-    context = "Contexte et informations importantes à retenir:\n\n"
-    
-    # Grouper par catégorie
-    categories = {
-        "identity": "👤 Identité",
-        "preferences": "⚙️ Préférences", 
-        "knowledge": "📚 Connaissances",
-        "instructions": "📋 Instructions"
+    groups = {cat_key: [] for cat_key in CONTEXT_CATEGORIES}
+    for mem in memories:
+        lines = groups.get(mem["category"])
+        if lines is not None:
+            lines.append(f"  - {mem['title']}: {mem['content']}\n")
+    
+    parts = [CONTEXT_HEADER]
+    for cat_key, cat_name in CONTEXT_CATEGORIES.items():
+        if groups[cat_key]:
+            parts.append(f"{cat_name}:\n")
+            parts.extend(groups[cat_key])
+            parts.append("\n")
+    parts.append(CONTEXT_FOOTER)
+    
+    return "".join(parts)
+
+
+# Sélection du contexte sous budget de tokens: poids des critères de score
+RELEVANCE_WEIGHT = 3.0
+PRIORITY_WEIGHT = 1.0
+CATEGORY_WEIGHT = 1.0
+RECENCY_WEIGHT = 0.5
+RECENCY_HALF_LIFE_DAYS = 30
+
+# Importance de chaque catégorie (identité et instructions toujours utiles)
+CATEGORY_IMPORTANCE = {
+    "identity": 1.0,
+    "instructions": 1.0,
+    "preferences": 0.6,
+    "knowledge": 0.3,
+}
+
+# Entrées gardées dans le cache du nombre de tokens des souvenirs (LRU)
+TOKEN_CACHE_SIZE = 4096
+
+# Nombre de tokens par souvenir, indexé par (id, updated_at, compteur)
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation rapide du nombre de tokens (mots et ponctuation, ~1.3 token par mot)"""
+    return math.ceil(len(re.findall(r"\w+|[^\w\s]", text)) * 1.3)
+
+
+def _memory_tokens(mem: dict, token_counter) -> int:
+    key = (mem["id"], mem["updated_at"], token_counter)
+    with _token_cache_lock:
+        tokens = _token_cache.get(key)
+        if tokens is not None:
+            _token_cache.move_to_end(key)
+            return tokens
+    tokens = token_counter(f"  - {mem['title']}: {mem['content']}\n")
+    with _token_cache_lock:
+        _token_cache[key] = tokens
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return tokens
+
+
+def _age_days(timestamp) -> float:
+    """
+    Âge en jours d'un horodatage: CURRENT_TIMESTAMP de SQLite ("AAAA-MM-JJ
+    HH:MM:SS", UTC) ou datetime.now().isoformat() (séparateur "T", heure locale)
+    """
+    try:
+        moment = datetime.fromisoformat(str(timestamp))
+    except ValueError:
+        return 0.0
+    if moment.tzinfo is None:
+        moment = moment.astimezone() if "T" in str(timestamp) else moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (datetime.now(timezone.utc) - moment).total_seconds() / 86400)
+
+
+def build_relevant_memory_context(message: str, token_budget: int = 1500, token_counter=None) -> dict:
+    """
+    Construire un contexte mémoire limité à token_budget tokens, avec les
+    souvenirs les plus utiles pour le message courant.
+
+    Chaque souvenir est noté selon sa pertinence pour le message (BM25 via FTS5),
+    sa priorité, sa catégorie et son ancienneté, puis les meilleurs sont ajoutés
+    tant que le budget le permet.
+
+    Args:
+        message: le message de l'utilisateur
+        token_budget: nombre maximal de tokens du contexte rendu
+        token_counter: fonction texte -> nombre de tokens (défaut: estimate_tokens)
+
+    Returns:
+        dict avec le contexte, les ids retenus (pour audit) et les tokens utilisés
+    """
+    token_counter = token_counter or estimate_tokens
+    memories = get_all_memories()
+    if not memories:
+        return {"context": "", "selected_ids": [], "tokens": 0}
+    
+    # Pertinence: score BM25 ramené à [0, 1] par rapport au meilleur résultat
+    relevance = {}
+    if message and message.strip():
+        matches = search_memories(message, limit=len(memories))
+        best = min((m["score"] for m in matches if "score" in m), default=0)
+        for m in matches:
+            relevance[m["id"]] = m["score"] / best if best and "score" in m else 1.0
+    
+    max_priority = max((m["priority"] or 0) for m in memories) or 1
+    decay = math.log(2) / RECENCY_HALF_LIFE_DAYS
+    
+    def score(mem):
+        return (RELEVANCE_WEIGHT * relevance.get(mem["id"], 0.0)
+                + PRIORITY_WEIGHT * (mem["priority"] or 0) / max_priority
+                + CATEGORY_WEIGHT * CATEGORY_IMPORTANCE.get(mem["category"], 0.0)
+                + RECENCY_WEIGHT * math.exp(-decay * _age_days(mem["updated_at"] or mem["created_at"])))
+    
+    # Seules les catégories affichées peuvent entrer dans le contexte
+    candidates = [m for m in memories if m["category"] in CONTEXT_CATEGORIES]
+    candidates.sort(key=score, reverse=True)
+    
+    used = token_counter(CONTEXT_HEADER + CONTEXT_FOOTER)
+    opened = set()
+    selected = []
+    for mem in candidates:
+        tokens = _memory_tokens(mem, token_counter)
+        if mem["category"] not in opened:
+            # Le premier souvenir d'une catégorie paie aussi son en-tête
+            tokens += token_counter(f"{CONTEXT_CATEGORIES[mem['category']]}:\n\n")
+        if used + tokens <= token_budget:
+            selected.append(mem)
+            opened.add(mem["category"])
+            used += tokens
+    
+    if not selected:
+        return {"context": "", "selected_ids": [], "tokens": 0}
+    
+    context = render_memory_context(selected)
+    return {
+        "context": context,
+        "selected_ids": [m["id"] for m in selected],
+        "tokens": token_counter(context)
     }
-    
-    for cat_key, cat_name in categories.items():
-        cat_memories = [m for m in memories if m["category"] == cat_key]
-        if cat_memories:
-            context += f"{cat_name}:\n"
-            for mem in cat_memories:
-                context += f"  - {mem['title']}: {mem['content']}\n"
-            context += "\n"
-    
-    context += "Utilise ces informations pour personnaliser tes réponses.\n\n"
-    
-    return context
 
 
 # ============================================
 # GESTION DES DOCUMENTS
 # ============================================
 
+@queued_write
 def add_document(name: str, content: str, doc_type: str = "text/plain", size: int = 0) -> dict:
     """Ajouter un nouveau document"""
     conn = get_connection()
@@ -318,6 +1952,7 @@ def add_document(name: str, content: str, doc_type: str = "text/plain", size: in
     """, (name, content, doc_type, size))
     
     doc_id = cursor.lastrowid
+    chunks = store_document_chunks(cursor, doc_id, content)
     conn.commit()
     conn.close()
     
@@ -326,27 +1961,49 @@ def add_document(name: str, content: str, doc_type: str = "text/plain", size: in
         "name": name,
         "type": doc_type,
         "size": size,
+        "chunks": chunks,
         "success": True
     }
 
 
+@bulk_write
+def add_documents(documents, commit_every: int = None) -> dict:
+    """
+    Ajouter plusieurs documents (et leurs morceaux) en une transaction.
+
+    documents: itérable de dicts (name, content, type, size) ou de tuples dans cet ordre.
+    """
+    def store_chunks(cursor, ids, batch):
+        for doc_id, (name, content, doc_type, size) in zip(ids, batch):
+            store_document_chunks(cursor, doc_id, content)
+    
+    rows = _bulk_rows(documents, ("name", "content", "type", "size"),
+                      {"type": "text/plain", "size": 0})
+    return _bulk_insert("""
+        INSERT INTO documents (name, content, type, size)
+        VALUES (?, ?, ?, ?)
+    """, rows, commit_every, store_chunks)
+
+
 def add_document_base64(name: str, base64_content: str, doc_type: str = "text/plain", size: int = 0) -> dict:
-    """Ajouter un document avec contenu encodé en Base64"""
-    import base64
+    """Ajouter un document avec contenu encodé en Base64 (décodé par tranches, voir open_document_upload)"""
+    upload_id = open_document_upload(name, doc_type, size)["upload_id"]
     
-    # Décoder le contenu Base64
-    try:
-        content = base64.b64decode(base64_content).decode('utf-8')
-    except Exception as e:
-        return {"success": False, "error": f"Erreur décodage Base64: {str(e)}"}
+    for start in range(0, len(base64_content), UPLOAD_SLICE_SIZE):
+        result = append_document_upload(upload_id, base64_content[start:start + UPLOAD_SLICE_SIZE])
+        if not result["success"]:
+            abort_document_upload(upload_id)
+            return result
     
-    # Utiliser la fonction standard
-    return add_document(name, content, doc_type, size)
+    result = finalize_document_upload(upload_id)
+    if not result["success"]:
+        abort_document_upload(upload_id)
+    return result
 
 
 def get_all_documents(active_only: bool = False) -> list:
     """Récupérer tous les documents avec leur contenu et statut"""
-    conn = get_connection()
+    conn = get_connection(readonly=True)
     cursor = conn.cursor()
     
     if active_only:
@@ -366,7 +2023,7 @@ def get_all_documents(active_only: bool = False) -> list:
 
 def get_document_content(doc_id: int) -> str:
     """Récupérer le contenu d'un document"""
-    conn = get_connection()
+    conn = get_connection(readonly=True)
     cursor = conn.cursor()
     
     cursor.execute("SELECT content FROM documents WHERE id = ? AND is_active = 1", (doc_id,))
@@ -376,49 +2033,685 @@ def get_document_content(doc_id: int) -> str:
     return row["content"] if row else ""
 
 
+# Colonnes renvoyées par les listes de documents (jamais le contenu)
+DOCUMENT_META_COLUMNS = "id, name, type, size, created_at, is_active"
+
+# Taille par défaut d'une tranche de contenu lue en flux (octets)
+CONTENT_SLICE_SIZE = 64 * 1024
+
+
+def list_documents(limit: int = 50, cursor: str = None, active_only: bool = False) -> dict:
+    """
+    Lister les documents par page, sans leur contenu (du plus récent au plus ancien).
+
+    La pagination est par clé (created_at, id): chaque page est une lecture
+    d'index, quelle que soit sa position dans la liste.
+
+    Args:
+        limit: nombre de documents par page
+        cursor: valeur next_cursor de la page précédente (None pour la première)
+        active_only: ne lister que les documents actifs
+
+    Returns:
+        dict avec "documents" et "next_cursor" (None sur la dernière page)
+    """
+    conditions = []
+    params = []
+    if cursor:
+        created_at, _, last_id = cursor.rpartition("|")
+        conditions.append("(created_at, id) < (?, ?)")
+        params.extend([created_at, int(last_id)])
+    if active_only:
+        conditions.append("is_active = 1")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    conn = get_connection(readonly=True)
+    db_cursor = conn.cursor()
+    
+    db_cursor.execute(f"""
+        SELECT {DOCUMENT_META_COLUMNS} FROM documents
+        {where}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    """, params + [limit + 1])
+    
+    rows = db_cursor.fetchall()
+    conn.close()
+    
+    documents = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = documents[-1]
+        next_cursor = f"{last['created_at']}|{last['id']}"
+    
+    return {"documents": documents, "next_cursor": next_cursor}
+
+
+def _char_boundary(data: bytes, pos: int) -> int:
+    """Reculer pos jusqu'au début d'un caractère UTF-8 (pas au milieu d'une séquence)"""
+    while 0 < pos < len(data) and (data[pos] & 0xC0) == 0x80:
+        pos -= 1
+    return pos
+
+
+def read_document_slice(doc_id: int, start_byte: int = 0, length: int = CONTENT_SLICE_SIZE) -> dict:
+    """
+    Lire une tranche du contenu d'un document, en octets UTF-8, sans charger le texte entier.
+
+    La tranche est ajustée aux limites de caractères (au moins un caractère
+    entier, même si length est plus court): pour lire la suite, rappeler avec
+    start_byte = end_byte.
+    """
+    conn = get_connection(readonly=True)
+    try:
+        if conn.execute("SELECT 1 FROM documents WHERE id = ? AND is_active = 1", (doc_id,)).fetchone() is None:
+            return {"success": False, "error": "Document introuvable"}
+        
+        if hasattr(conn, "blobopen"):
+            # E/S incrémentale (Python 3.11+): seules les pages concernées sont lues
+            with conn.blobopen("documents", "content", doc_id, readonly=True) as blob:
+                total = len(blob)
+                start_byte = max(0, min(start_byte, total))
+                blob.seek(start_byte)
+                # Quelques octets de plus pour trouver la limite de caractère suivante
+                data = blob.read(min(length + 4, total - start_byte))
+        else:
+            total = conn.execute("SELECT length(CAST(content AS BLOB)) FROM documents WHERE id = ?",
+                                 (doc_id,)).fetchone()[0]
+            start_byte = max(0, min(start_byte, total))
+            data = conn.execute("SELECT substr(CAST(content AS BLOB), ?, ?) FROM documents WHERE id = ?",
+                                (start_byte + 1, min(length + 4, total - start_byte), doc_id)).fetchone()[0]
+    finally:
+        conn.close()
+    
+    # Un début au milieu d'un caractère avance jusqu'au caractère suivant
+    skip = 0
+    while skip < len(data) and (data[skip] & 0xC0) == 0x80:
+        skip += 1
+    if start_byte + len(data) >= total and len(data) <= length:
+        end = len(data)
+    else:
+        end = max(skip, _char_boundary(data, min(length, len(data))))
+    if end == skip and skip < len(data):
+        # length plus court que le caractère: le rendre entier pour toujours avancer
+        end = skip + 1
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end += 1
+    
+    return {
+        "success": True,
+        "id": doc_id,
+        "content": data[skip:end].decode("utf-8"),
+        "start_byte": start_byte + skip,
+        "end_byte": start_byte + end,
+        "total_bytes": total,
+        "eof": start_byte + end >= total
+    }
+
+
+def iter_document_content(doc_id: int, slice_size: int = CONTENT_SLICE_SIZE):
+    """Générateur du contenu d'un document par tranches de slice_size octets"""
+    start = 0
+    while True:
+        piece = read_document_slice(doc_id, start, slice_size)
+        if not piece["success"]:
+            return
+        if piece["content"]:
+            yield piece["content"]
+        if piece["eof"] or piece["end_byte"] == start:
+            return
+        start = piece["end_byte"]
+
+
+def search_documents(query: str, limit: int = 10) -> list:
+    """Rechercher dans les documents actifs, classés par pertinence (BM25), sans renvoyer le contenu complet"""
+    match = fts_match_expression(query)
+    if not match:
+        return []
+    
+    conn = get_connection(readonly=True)
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            SELECT d.id, d.name, d.type, d.size, d.created_at,
+                   snippet(documents_fts, 1, ?, ?, '…', 32) AS snippet,
+                   bm25(documents_fts, 3.0, 1.0) AS score
+            FROM documents_fts
+            JOIN documents d ON d.id = documents_fts.rowid
+            WHERE documents_fts MATCH ? AND d.is_active = 1
+            ORDER BY score
+            LIMIT ?
+        """, (SNIPPET_START, SNIPPET_END, match, limit))
+        rows = cursor.fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+    conn.close()
+    
+    return [dict(row) for row in rows]
+
+
+@queued_write
 def delete_document(doc_id: int) -> dict:
     """Supprimer un document"""
     conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute("UPDATE documents SET is_active = 0 WHERE id = ?", (doc_id,))
+    cursor.execute("UPDATE documents SET is_active = 0 WHERE id = ?", (doc_id,))
+    
+    conn.commit()
+    conn.close()
+    
+    return {"id": doc_id, "deleted": True}
+
+
+@queued_write
+def clear_all_documents() -> dict:
+    """Supprimer tous les documents"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("UPDATE documents SET is_active = 0")
+    
+    conn.commit()
+    conn.close()
+    
+    return {"success": True, "message": "Documents supprimés"}
+
+
+@queued_write
+def toggle_document(doc_id: int, is_active: int) -> dict:
+    """Activer ou désactiver un document"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("UPDATE documents SET is_active = ? WHERE id = ?", (is_active, doc_id))
+    
+    conn.commit()
+    conn.close()
+    
+    return {"id": doc_id, "is_active": is_active, "success": True}
+
+
+# ============================================
+# DÉCOUPAGE DES DOCUMENTS (CHUNKS)
+# ============================================
+
+# Taille cible d'un morceau et recouvrement entre deux morceaux (en caractères)
+CHUNK_SIZE = 1200
+CHUNK_OVERLAP = 200
+
+# Coupures préférées, de la plus forte à la plus faible
+_CHUNK_BREAKS = ("\n\n", "\n", ". ", "? ", "! ", "; ", ", ", " ")
+
+
+def content_hash(content: str) -> str:
+    """Empreinte SHA-256 d'un contenu texte"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list:
+    """
+    Découper un texte en morceaux qui se recouvrent.
+
+    Les coupures se font de préférence sur un paragraphe, puis une ligne, une
+    phrase ou un mot, dans la seconde moitié du morceau.
+
+    Returns:
+        liste de (start_byte, end_byte, texte), positions en octets UTF-8
+    """
+    return list(iter_text_chunks([text], chunk_size, overlap))
+
+
+def iter_text_chunks(pieces, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
+    """
+    Version en flux de chunk_text: le texte arrive par morceaux (pieces) et
+    seule une fenêtre d'environ chunk_size caractères est gardée en mémoire.
+    Produit des (start_byte, end_byte, texte).
+    """
+    pieces = iter(pieces)
+    buffer = ""
+    start = 0           # début du morceau courant dans buffer
+    start_byte = 0      # position en octets de buffer[start] dans le texte complet
+    exhausted = False
+    
+    while True:
+        # Lire jusqu'à avoir plus de chunk_size caractères (ou la fin du texte)
+        while not exhausted and len(buffer) - start <= chunk_size:
+            piece = next(pieces, None)
+            if piece is None:
+                exhausted = True
+            elif piece:
+                buffer = buffer[start:] + piece
+                start = 0
+        if start >= len(buffer):
+            return
+        
+        end = min(start + chunk_size, len(buffer))
+        last = exhausted and end == len(buffer)
+        if not last:
+            floor = start + chunk_size // 2
+            for sep in _CHUNK_BREAKS:
+                cut = buffer.rfind(sep, floor, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        
+        chunk = buffer[start:end]
+        yield (start_byte, start_byte + len(chunk.encode("utf-8")), chunk)
+        if last:
+            return
+        
+        # Le morceau suivant reprend `overlap` caractères, à partir d'un début de mot
+        next_start = max(end - overlap, start + 1)
+        space = buffer.find(" ", next_start, end)
+        next_start = space + 1 if space != -1 else next_start
+        start_byte += len(buffer[start:next_start].encode("utf-8"))
+        start = next_start
+
+
+def store_document_chunks(cursor, doc_id: int, content: str, force: bool = False) -> int:
+    """
+    (Re)découper un document dans la transaction courante.
+
+    Ne fait rien si l'empreinte du contenu n'a pas changé depuis le dernier
+    découpage (sauf force=True). Retourne le nombre de morceaux du document.
+    """
+    digest = content_hash(content)
+    cursor.execute("SELECT content_hash FROM documents WHERE id = ?", (doc_id,))
+    row = cursor.fetchone()
+    if row is not None and row[0] == digest and not force:
+        cursor.execute("SELECT COUNT(*) FROM document_chunks WHERE document_id = ?", (doc_id,))
+        return cursor.fetchone()[0]
+    
+    return replace_document_chunks(cursor, doc_id, iter_text_chunks([content]), digest)
+
+
+def replace_document_chunks(cursor, doc_id: int, chunks, digest: str) -> int:
+    """Remplacer les morceaux d'un document (chunks: itérable de (start_byte, end_byte, texte))"""
+    cursor.execute("DELETE FROM document_chunks WHERE document_id = ?", (doc_id,))
+    count = 0
+    
+    def rows():
+        nonlocal count
+        for i, (start, end, piece) in enumerate(chunks):
+            count += 1
+            yield (doc_id, i, start, end, piece)
+    
+    cursor.executemany("""
+        INSERT INTO document_chunks (document_id, chunk_index, start_byte, end_byte, content)
+        VALUES (?, ?, ?, ?, ?)
+    """, rows())
+    cursor.execute("UPDATE documents SET content_hash = ? WHERE id = ?", (digest, doc_id))
+    
+    return count
+
+
+@queued_write
+def _rechunk_document(doc_id: int, force: bool) -> bool:
+    """Redécouper un document si son contenu a changé; True s'il l'a été"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT content, content_hash FROM documents WHERE id = ?", (doc_id,))
+    row = cursor.fetchone()
+    rechunked = row is not None and (force or row["content_hash"] != content_hash(row["content"]))
+    if rechunked:
+        store_document_chunks(cursor, doc_id, row["content"], force=True)
+        conn.commit()
+    
+    conn.close()
+    return rechunked
+
+
+def chunk_all_documents(force: bool = False) -> dict:
+    """
+    Découper tous les documents dont le contenu a changé (ou jamais découpés).
+
+    Une opération d'écriture par document: un seul contenu complet en mémoire,
+    et la file d'écriture n'est pas bloquée pendant tout le parcours.
+    """
+    conn = get_connection(readonly=True)
+    doc_ids = [row[0] for row in conn.execute("SELECT id FROM documents").fetchall()]
+    conn.close()
+    
+    rechunked = sum(_rechunk_document(doc_id, force) for doc_id in doc_ids)
+    
+    return {"success": True, "documents": len(doc_ids), "rechunked": rechunked}
+
+
+def get_document_chunks(doc_id: int) -> list:
+    """Récupérer les morceaux d'un document, dans l'ordre"""
+    conn = get_connection(readonly=True)
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT id, document_id, chunk_index, start_byte, end_byte, content
+        FROM document_chunks
+        WHERE document_id = ?
+        ORDER BY chunk_index
+    """, (doc_id,))
+    
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return [dict(row) for row in rows]
+
+
+def search_document_chunks(query: str, limit: int = 5, max_per_document: int = None) -> list:
+    """
+    Retrouver les morceaux de documents actifs les plus pertinents (BM25).
+
+    Args:
+        query: la requête (ou le message de l'utilisateur)
+        limit: nombre maximal de morceaux retournés
+        max_per_document: limite optionnelle de morceaux par document
+    """
+    match = fts_match_expression(query)
+    if not match:
+        return []
+    
+    conn = get_connection(readonly=True)
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute("""
+            SELECT c.id, c.document_id, d.name, c.chunk_index, c.start_byte, c.end_byte, c.content,
+                   bm25(document_chunks_fts) AS score
+            FROM document_chunks_fts
+            JOIN document_chunks c ON c.id = document_chunks_fts.rowid
+            JOIN documents d ON d.id = c.document_id
+            WHERE document_chunks_fts MATCH ? AND d.is_active = 1
+            ORDER BY score
+            LIMIT ?
+        """, (match, limit if max_per_document is None else limit * 4))
+        rows = cursor.fetchall()
+    except sqlite3.OperationalError:
+        rows = []
+    conn.close()
+    
+    results = []
+    per_document = {}
+    for row in rows:
+        count = per_document.get(row["document_id"], 0)
+        if max_per_document is not None and count >= max_per_document:
+            continue
+        per_document[row["document_id"]] = count + 1
+        results.append(dict(row))
+        if len(results) >= limit:
+            break
+    
+    return results
+
+
+# ============================================
+# IMPORT DE DOCUMENTS EN FLUX
+# ============================================
+
+# Taille des tranches Base64 décodées à la fois par add_document_base64
+UPLOAD_SLICE_SIZE = 1024 * 1024
+
+# Morceaux d'un import concaténés dans l'ordre de part_index: SQLite ne garantit
+# pas l'ordre d'un agrégat sur une sous-requête triée, seulement celui d'un
+# ORDER BY dans l'agrégat (3.44+) ou d'une fenêtre
+if sqlite3.sqlite_version_info >= (3, 44, 0):
+    _CONCAT_PARTS_SQL = """
+        SELECT group_concat(data, '' ORDER BY part_index) FROM document_upload_parts WHERE upload_id = ?"""
+else:
+    _CONCAT_PARTS_SQL = """
+        SELECT group_concat(data, '') OVER (ORDER BY part_index
+               ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+        FROM document_upload_parts WHERE upload_id = ? LIMIT 1"""
+
+
+@queued_write
+def open_document_upload(name: str, doc_type: str = "text/plain", size: int = 0) -> dict:
+    """
+    Commencer l'import d'un document envoyé en plusieurs morceaux.
+
+    Enchaîner ensuite append_document_upload() puis finalize_document_upload().
+    Chaque morceau est décodé et écrit en base dès réception: la mémoire utilisée
+    ne dépend pas de la taille du document.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        INSERT INTO document_uploads (name, type, size)
+        VALUES (?, ?, ?)
+    """, (name, doc_type, size))
+    
+    upload_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    
+    return {"success": True, "upload_id": upload_id}
+
+
+@queued_write
+def append_document_upload(upload_id: int, data, encoding: str = "base64") -> dict:
+    """
+    Ajouter un morceau à un import en cours.
+
+    Args:
+        upload_id: identifiant retourné par open_document_upload
+        data: le morceau (texte Base64, texte brut, ou bytes)
+        encoding: "base64", "text" ou "raw" (bytes UTF-8)
+
+    Un morceau Base64 ou UTF-8 peut couper un groupe ou un caractère: la fin
+    incomplète est conservée et complétée par le morceau suivant.
+    """
+    import base64
+    import binascii
+    import codecs
+    
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT received_bytes, part_count, base64_pending, utf8_pending
+        FROM document_uploads WHERE id = ?
+    """, (upload_id,))
+    upload = cursor.fetchone()
+    if upload is None:
+        conn.close()
+        return {"success": False, "error": f"Import introuvable: {upload_id}"}
+    
+    base64_pending = upload["base64_pending"]
+    if encoding == "base64":
+        text = base64_pending + "".join(str(data).split())
+        usable = len(text) // 4 * 4
+        try:
+            raw = base64.b64decode(text[:usable], validate=True)
+        except (binascii.Error, ValueError) as e:
+            conn.close()
+            return {"success": False, "error": f"Erreur décodage Base64 (morceau {upload['part_count']}): {e}"}
+        base64_pending = text[usable:]
+    elif encoding == "text":
+        raw = str(data).encode("utf-8")
+    elif encoding == "raw":
+        raw = bytes(data)
+    else:
+        conn.close()
+        return {"success": False, "error": f"Encodage inconnu: {encoding}"}
+    
+    # Valider l'UTF-8 en reprenant la séquence incomplète du morceau précédent
+    pending = bytes(upload["utf8_pending"] or b"")
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        decoder.decode(pending + raw, final=False)
+    except UnicodeDecodeError as e:
+        conn.close()
+        offset = upload["received_bytes"] - len(pending) + e.start
+        return {"success": False, "error": f"UTF-8 invalide à l'octet {offset} (morceau {upload['part_count']}): {e.reason}"}
+    tail = decoder.getstate()[0]
+    complete = (pending + raw)[:len(pending) + len(raw) - len(tail)]
+    
+    if complete:
+        cursor.execute("""
+            INSERT INTO document_upload_parts (upload_id, part_index, data)
+            VALUES (?, ?, ?)
+        """, (upload_id, upload["part_count"], complete))
+    cursor.execute("""
+        UPDATE document_uploads
+        SET received_bytes = received_bytes + ?, part_count = part_count + ?,
+            base64_pending = ?, utf8_pending = ?
+        WHERE id = ?
+    """, (len(raw), 1 if complete else 0, base64_pending, tail, upload_id))
     
     conn.commit()
     conn.close()
     
-    return {"id": doc_id, "deleted": True}
+    return {"success": True, "upload_id": upload_id, "received_bytes": upload["received_bytes"] + len(raw)}
 
 
-def clear_all_documents() -> dict:
-    """Supprimer tous les documents"""
+@queued_write
+def finalize_document_upload(upload_id: int) -> dict:
+    """
+    Terminer un import: assembler le document en base, le découper, et
+    supprimer les morceaux temporaires, le tout dans une seule transaction.
+    """
     conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute("UPDATE documents SET is_active = 0")
+    cursor.execute("SELECT * FROM document_uploads WHERE id = ?", (upload_id,))
+    upload = cursor.fetchone()
+    if upload is None:
+        conn.close()
+        return {"success": False, "error": f"Import introuvable: {upload_id}"}
+    if upload["base64_pending"]:
+        conn.close()
+        return {"success": False, "error": "Base64 tronqué: la longueur totale n'est pas un multiple de 4"}
+    if upload["utf8_pending"]:
+        conn.close()
+        return {"success": False, "error": f"UTF-8 invalide: séquence incomplète à la fin (octet {upload['received_bytes'] - len(upload['utf8_pending'])})"}
+    
+    size = upload["size"] or upload["received_bytes"]
+    
+    # La concaténation se fait dans SQLite, pas en Python (l'index FTS5 lit de
+    # toute façon le texte entier), dans l'ordre garanti des morceaux
+    cursor.execute(f"""
+        INSERT INTO documents (name, content, type, size)
+        VALUES (?, CAST(COALESCE(({_CONCAT_PARTS_SQL}), '') AS TEXT), ?, ?)
+    """, (upload["name"], upload_id, upload["type"], size))
+    doc_id = cursor.lastrowid
+    
+    # Empreinte et découpage en relisant les morceaux un par un
+    digest = hashlib.sha256()
+    
+    def pieces():
+        reader = conn.cursor()
+        for part_index in range(upload["part_count"]):
+            reader.execute("SELECT data FROM document_upload_parts WHERE upload_id = ? AND part_index = ?",
+                           (upload_id, part_index))
+            data = reader.fetchone()[0]
+            digest.update(data)
+            yield data.decode("utf-8")
+    
+    chunks = replace_document_chunks(cursor, doc_id, iter_text_chunks(pieces()), "")
+    cursor.execute("UPDATE documents SET content_hash = ? WHERE id = ?", (digest.hexdigest(), doc_id))
+    cursor.execute("DELETE FROM document_upload_parts WHERE upload_id = ?", (upload_id,))
+    cursor.execute("DELETE FROM document_uploads WHERE id = ?", (upload_id,))
     
     conn.commit()
     conn.close()
     
-    return {"success": True, "message": "Documents supprimés"}
+    return {
+        "id": doc_id,
+        "name": upload["name"],
+        "type": upload["type"],
+        "size": size,
+        "chunks": chunks,
+        "success": True
+    }
 
 
-def toggle_document(doc_id: int, is_active: int) -> dict:
-    """Activer ou désactiver un document"""
+@queued_write
+def abort_document_upload(upload_id: int) -> dict:
+    """Abandonner un import et supprimer ses morceaux temporaires"""
     conn = get_connection()
     cursor = conn.cursor()
     
-    cursor.execute("UPDATE documents SET is_active = ? WHERE id = ?", (is_active, doc_id))
+    cursor.execute("DELETE FROM document_upload_parts WHERE upload_id = ?", (upload_id,))
+    cursor.execute("DELETE FROM document_uploads WHERE id = ?", (upload_id,))
     
     conn.commit()
     conn.close()
     
-    return {"id": doc_id, "is_active": is_active, "success": True}
+    return {"success": True, "upload_id": upload_id}
 
 
 # ============================================
 # CACHE DE RECHERCHE WEB
 # ============================================
 
+# Durée de validité des résultats par source (en heures, source en minuscules)
+SEARCH_CACHE_TTL_HOURS = {
+    "duckduckgo": 24,
+    "google (serper)": 12,
+    "tavily ai": 12,
+}
+SEARCH_CACHE_DEFAULT_TTL_HOURS = 24
+
+# Après expiration, une entrée est encore servie pendant SEARCH_STALE_HOURS le
+# temps qu'un rafraîchissement en arrière-plan la remplace
+SEARCH_STALE_HOURS = 24
+
+# Rafraîchissement anticipé des entrées populaires (au moins N hits) dans la
+# dernière fraction de leur durée de vie
+REFRESH_AHEAD_MIN_HITS = 3
+REFRESH_AHEAD_RATIO = 0.1
+
+# Nombre maximal de requêtes en attente de rafraîchissement
+REFRESH_QUEUE_MAX = 1000
+
+# Nettoyage des entrées expirées: taille d'un lot et pause entre deux passages
+SWEEP_BATCH_SIZE = 500
+SWEEP_INTERVAL = 600
+
+
+# Taille maximale du cache web (résultats compressés, en octets). Au-delà, les
+# entrées les moins utiles sont évincées jusqu'à EVICTION_TARGET du budget
+SEARCH_CACHE_MAX_BYTES = 50 * 1024 * 1024
+EVICTION_TARGET = 0.9
+
+# Éviction: valeur d'une entrée = (hits + 1) × 2^(-heures depuis le dernier usage / demi-vie)
+EVICTION_HALF_LIFE_HOURS = 24
+
+# Logarithme de cette valeur, décalé de ln(2) × heures écoulées depuis une date
+# fixe: le même décalage pour toutes les entrées, donc un ordre qui ne change
+# pas avec le temps. Stocké dans eviction_score par des triggers et indexé.
+_EVICTION_SCORE_SQL = (f"ln(COALESCE({{row}}.hit_count, 0) + 1) + (julianday(COALESCE({{row}}.last_hit_at, "
+                       f"{{row}}.created_at)) - 2451545.0) * 24 * {math.log(2) / EVICTION_HALF_LIFE_HOURS!r}")
+
+# Niveau de compression zlib des résultats
+RESULTS_COMPRESSION_LEVEL = 6
+
+
+def compress_results(results) -> tuple:
+    """Sérialiser (JSON compact) et compresser des résultats: (blob, taille JSON)"""
+    raw = json.dumps(results, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return zlib.compress(raw, RESULTS_COMPRESSION_LEVEL), len(raw)
+
+
+def decode_results(value):
+    """Décoder une colonne results (blob compressé, ou JSON texte des anciennes entrées)"""
+    if isinstance(value, bytes):
+        value = zlib.decompress(value)
+    return json.loads(value)
+
+
+def search_cache_ttl(source: str) -> int:
+    """Durée de validité (heures) des résultats d'une source"""
+    return SEARCH_CACHE_TTL_HOURS.get((source or "").lower(), SEARCH_CACHE_DEFAULT_TTL_HOURS)
+
+
+def _ttl_sql(column: str) -> str:
+    """Expression SQL équivalente à search_cache_ttl(column)"""
+    cases = " ".join(f"WHEN '{source}' THEN {hours}" for source, hours in SEARCH_CACHE_TTL_HOURS.items())
+    return f"CASE lower({column}) {cases} ELSE {SEARCH_CACHE_DEFAULT_TTL_HOURS} END"
+
+
 def normalize_query(query: str) -> str:
     """Normaliser une requête pour la comparaison (minuscules, sans espaces multiples)"""
     import re
@@ -428,59 +2721,348 @@ def normalize_query(query: str) -> str:
     return normalized
 
 
-def get_cached_search(query: str, max_age_hours: int = 24) -> dict:
+# Cache en mémoire devant web_search_cache: résultats déjà décodés, du plus
+# récent au plus ancien usage. Il n'est invalidé que par les écritures de ce
+# processus (le serveur mémoire est le seul écrivain du cache web).
+SEARCH_LRU_SIZE = 256
+
+# Les hits sont comptés en mémoire et écrits par lot tous les N hits ou après
+# HIT_FLUSH_INTERVAL secondes, par un minuteur (jamais dans le thread du lecteur)
+HIT_FLUSH_EVERY = 100
+HIT_FLUSH_INTERVAL = 5.0
+
+_search_lru = {"db": None, "entries": OrderedDict(), "pending_hits": {}, "pending_total": 0, "timer": None,
+               "urgent": False}
+_search_lru_lock = threading.RLock()
+
+
+def _search_lru_state() -> dict:
+    """Retourner l'état du cache en mémoire (vidé si DB_PATH a changé)"""
+    if _search_lru["db"] != str(DB_PATH):
+        if _search_lru["timer"] is not None:
+            _search_lru["timer"].cancel()
+        _search_lru.update(db=str(DB_PATH), entries=OrderedDict(), pending_hits={},
+                           pending_total=0, timer=None, urgent=False)
+    return _search_lru
+
+
+def _forget_cached_search(normalized: str = None):
+    """Retirer une requête (ou tout) du cache en mémoire après une écriture"""
+    with _search_lru_lock:
+        entries = _search_lru_state()["entries"]
+        if normalized is None:
+            entries.clear()
+        else:
+            entries.pop(normalized, None)
+
+
+def _timestamp(value: str) -> float:
+    """Convertir un CURRENT_TIMESTAMP SQLite (UTC) en secondes depuis l'epoch"""
+    return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc).timestamp()
+
+
+def _record_search_hit(cache_id: int):
+    """Compter un hit en mémoire et programmer l'écriture par lot"""
+    with _search_lru_lock:
+        state = _search_lru_state()
+        state["pending_hits"][cache_id] = state["pending_hits"].get(cache_id, 0) + 1
+        state["pending_total"] += 1
+        flush_now = state["pending_total"] >= HIT_FLUSH_EVERY
+        if state["timer"] is None or (flush_now and not state["urgent"]):
+            # Seuil atteint: le minuteur en cours est remplacé par un minuteur
+            # immédiat; le lecteur n'attend jamais l'écriture
+            if state["timer"] is not None:
+                state["timer"].cancel()
+            timer = threading.Timer(0 if flush_now else HIT_FLUSH_INTERVAL, flush_search_hits)
+            timer.daemon = True
+            state.update(timer=timer, urgent=flush_now)
+            timer.start()
+
+
+@queued_write
+def flush_search_hits() -> dict:
+    """Écrire dans web_search_cache les hits comptés en mémoire (une transaction)"""
+    with _search_lru_lock:
+        state = _search_lru_state()
+        pending = state["pending_hits"]
+        if state["timer"] is not None:
+            state["timer"].cancel()
+        state.update(pending_hits={}, pending_total=0, timer=None, urgent=False)
+    
+    if pending:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.executemany("""
+            UPDATE web_search_cache 
+            SET hit_count = hit_count + ?, last_hit_at = CURRENT_TIMESTAMP 
+            WHERE id = ?
+        """, [(count, cache_id) for cache_id, count in pending.items()])
+        conn.commit()
+        conn.close()
+    
+    return {"success": True, "flushed": sum(pending.values())}
+
+
+# Ne pas perdre les hits comptés en mémoire à l'arrêt du processus
+atexit.register(lambda: _search_lru["pending_total"] and flush_search_hits())
+
+
+def _load_cached_entry(normalized: str):
+    """Entrée du cache pour une requête normalisée: depuis la mémoire, sinon depuis SQLite"""
+    with _search_lru_lock:
+        entries = _search_lru_state()["entries"]
+        entry = entries.get(normalized)
+        if entry is not None:
+            entries.move_to_end(normalized)
+            return entry
+    
+    conn = get_connection(readonly=True)
+    cursor = conn.cursor()
+    
+    # Chercher dans le cache (pas expiré, ou encore dans la fenêtre de péremption):
+    # parcours de idx_web_cache_query_expires
+    cursor.execute("""
+        SELECT id, query, results, source, created_at, expires_at, hit_count
+        FROM web_search_cache 
+        WHERE query_normalized = ?
+        AND expires_at > datetime('now', ?)
+        ORDER BY expires_at DESC
+        LIMIT 1
+    """, (normalized, f"-{SEARCH_STALE_HOURS} hours"))
+    
+    row = cursor.fetchone()
+    conn.close()
+    if not row:
+        return None
+    
+    entry = dict(row)
+    entry["results"] = decode_results(row["results"])
+    entry["created_ts"] = _timestamp(row["created_at"])
+    entry["expires_ts"] = _timestamp(row["expires_at"])
+    with _search_lru_lock:
+        state = _search_lru_state()
+        entry["hit_count"] += state["pending_hits"].get(entry["id"], 0)
+        state["entries"][normalized] = entry
+        while len(state["entries"]) > SEARCH_LRU_SIZE:
+            state["entries"].popitem(last=False)
+    return entry
+
+
+def _entry_state(entry: dict, max_age_hours: int, stale_hours: float) -> str:
+    """"fresh", "stale" (servie mais à rafraîchir) ou None (inutilisable)"""
+    if entry is None:
+        return None
+    now = time.time()
+    deadline = min(entry["expires_ts"], entry["created_ts"] + max_age_hours * 3600)
+    if now < deadline:
+        return "fresh"
+    if now < deadline + stale_hours * 3600:
+        return "stale"
+    return None
+
+
+def get_cached_search(query: str, max_age_hours: int = 24, fuzzy: bool = False,
+                      fuzzy_threshold: float = None, stale_hours: float = None) -> dict:
     """
     Récupérer une recherche en cache si elle existe et n'est pas expirée.
     
+    Les entrées récemment lues sont servies depuis la mémoire, sans accès à
+    SQLite ni décodage JSON. Le compteur de hits est écrit plus tard, par lot.
+    
     Args:
         query: La requête de recherche
         max_age_hours: Âge maximum du cache en heures (défaut: 24h)
+        fuzzy: Si la requête exacte n'est pas en cache, accepter une requête
+            proche (mêmes mots à l'ordre, aux accents et aux mots vides près);
+            désactivé par défaut, les résultats pouvant être ceux d'une autre requête
+        fuzzy_threshold: Similarité minimale (défaut: FUZZY_THRESHOLD)
+        stale_hours: Fenêtre après expiration pendant laquelle l'entrée est encore
+            servie ("stale": True) et mise en file de rafraîchissement
+            (défaut: SEARCH_STALE_HOURS, 0 pour la désactiver)
     
     Returns:
         dict avec les résultats si trouvé, None sinon
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     normalized = normalize_query(query)
+    match = "exact"
+    similarity = 1.0
+    
+    stale_hours = min(SEARCH_STALE_HOURS if stale_hours is None else stale_hours, SEARCH_STALE_HOURS)
+    
+    entry = _load_cached_entry(normalized)
+    state = _entry_state(entry, max_age_hours, stale_hours)
+    _count_lookup("exact", state is not None)
+    
+    if state is None and fuzzy:
+        candidate = find_similar_cached_query(query, fuzzy_threshold)
+        entry = _load_cached_entry(candidate["query_normalized"]) if candidate is not None else None
+        state = _entry_state(entry, max_age_hours, stale_hours)
+        _count_lookup("fuzzy", state is not None)
+        match = "fuzzy"
+        similarity = candidate["similarity"] if state is not None else 0.0
+    
+    if state is None:
+        return None
+    
+    with _search_lru_lock:
+        entry["hit_count"] += 1
+        hit_count = entry["hit_count"]
+    _record_search_hit(entry["id"])
+    
+    # Entrée périmée, ou populaire et proche de l'expiration: rafraîchir en arrière-plan
+    if state == "stale":
+        _count_lookup("stale", True)
+        schedule_search_refresh(entry["query"], hit_count)
+    elif hit_count >= REFRESH_AHEAD_MIN_HITS:
+        lifetime = entry["expires_ts"] - entry["created_ts"]
+        if time.time() > entry["expires_ts"] - lifetime * REFRESH_AHEAD_RATIO:
+            schedule_search_refresh(entry["query"], hit_count)
     
-    # Chercher dans le cache (pas expiré)
-    cursor.execute("""
-        SELECT id, query, results, source, created_at, hit_count
-        FROM web_search_cache 
-        WHERE query_normalized = ?
-        AND datetime(created_at, '+' || ? || ' hours') > datetime('now')
-        ORDER BY created_at DESC
-        LIMIT 1
-    """, (normalized, max_age_hours))
+    return {
+        "success": True,
+        "cached": True,
+        "query": entry["query"],
+        "results": entry["results"],
+        "source": entry["source"] + " (cache)",
+        "cached_at": entry["created_at"],
+        "hit_count": hit_count,
+        "match": match,
+        "similarity": similarity,
+        "stale": state == "stale"
+    }
+
+
+# ============================================
+# CACHE WEB: REQUÊTES PROCHES (MINHASH / LSH)
+# ============================================
+
+# Similarité de Jaccard minimale entre ensembles de mots pour un hit approché
+FUZZY_THRESHOLD = 0.75
+
+# Signature MinHash: LSH_BANDS bandes de LSH_ROWS valeurs. Deux requêtes
+# partagent un bucket avec une probabilité élevée dès ~(1/bandes)^(1/lignes) = 0.59
+LSH_BANDS = 8
+LSH_ROWS = 4
+
+# Nombre maximal de candidats LSH comparés mot à mot
+FUZZY_CANDIDATES = 20
+
+# Mots vides ignorés (français et anglais, sans accents)
+STOPWORDS = frozenset("""
+    a au aux avec ce ces dans de des du en et est il la le les leur lui ma mais me
+    meme mes moi mon ne nos notre nous on ou par pas pour qu que qui sa se ses son
+    sur ta te tes toi ton tu un une vos votre vous y c d j l m n s t quel quelle
+    quels quelles comment quoi quand combien
+    the of and or to in on at for is are be what how when where which who with by
+""".split())
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MINHASH_SEEDS = [((2 * i + 1) * 0x9E3779B97F4A7C15 % _MERSENNE_PRIME,
+                   (i + 1) * 0xC2B2AE3D27D4EB4F % _MERSENNE_PRIME)
+                  for i in range(LSH_BANDS * LSH_ROWS)]
+
+# Compteurs des recherches dans le cache depuis le démarrage du processus
+_lookup_stats = {"exact_hits": 0, "exact_misses": 0, "fuzzy_hits": 0, "fuzzy_misses": 0, "stale_hits": 0}
+
+# Évictions (par manque de place) depuis le démarrage du processus
+_eviction_stats = {"evictions": 0, "evicted_bytes": 0}
+
+
+def _count_lookup(kind: str, hit: bool):
+    with _search_lru_lock:
+        _lookup_stats[f"{kind}_{'hits' if hit else 'misses'}"] += 1
+
+
+def query_tokens(query: str) -> list:
+    """Mots significatifs d'une requête: sans accents, sans mots vides, pluriels simplifiés"""
+    import unicodedata
+    folded = unicodedata.normalize("NFKD", query.lower())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    tokens = set()
+    for word in re.findall(r"\w+", folded):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word[-1] in "sx":
+            word = word[:-1]
+        tokens.add(word)
+    return sorted(tokens)
+
+
+def lsh_buckets(tokens: list) -> list:
+    """Signature MinHash d'un ensemble de mots, regroupée en un bucket (int64) par bande"""
+    if not tokens:
+        return []
+    hashes = [int.from_bytes(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest(), "little")
+              for t in tokens]
+    signature = [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _MINHASH_SEEDS]
+    buckets = []
+    for band in range(LSH_BANDS):
+        values = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(repr(values).encode(), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, "little", signed=True))
+    return buckets
+
+
+def index_cached_query(cursor, cache_id: int, query: str):
+    """Enregistrer les mots et les buckets LSH d'une entrée du cache"""
+    tokens = query_tokens(query)
+    cursor.execute("UPDATE web_search_cache SET query_tokens = ? WHERE id = ?", (" ".join(tokens), cache_id))
+    cursor.executemany("""
+        INSERT OR IGNORE INTO web_search_cache_lsh (band, bucket, cache_id)
+        VALUES (?, ?, ?)
+    """, [(band, bucket, cache_id) for band, bucket in enumerate(lsh_buckets(tokens))])
+
+
+def find_similar_cached_query(query: str, threshold: float = None) -> dict:
+    """
+    Trouver l'entrée non expirée dont la requête est la plus proche (Jaccard des mots).
+
+    Les candidats viennent des buckets LSH partagés (une lecture d'index par
+    bande); la similarité exacte n'est calculée que pour eux.
+
+    Returns:
+        dict (id, query, query_normalized, similarity) ou None sous le seuil
+    """
+    threshold = FUZZY_THRESHOLD if threshold is None else threshold
+    tokens = set(query_tokens(query))
+    buckets = lsh_buckets(sorted(tokens))
+    if not buckets:
+        return None
     
-    row = cursor.fetchone()
+    conn = get_connection(readonly=True)
+    cursor = conn.cursor()
     
-    if row:
-        # Incrémenter le compteur de hits
-        cursor.execute("""
-            UPDATE web_search_cache 
-            SET hit_count = hit_count + 1 
-            WHERE id = ?
-        """, (row["id"],))
-        conn.commit()
-        conn.close()
-        
-        return {
-            "success": True,
-            "cached": True,
-            "query": row["query"],
-            "results": json.loads(row["results"]),
-            "source": row["source"] + " (cache)",
-            "cached_at": row["created_at"],
-            "hit_count": row["hit_count"] + 1
-        }
+    # Plus deux requêtes partagent de bandes, plus elles sont proches: seuls les
+    # meilleurs candidats sont comparés mot à mot
+    bands = " OR ".join("(band = ? AND bucket = ?)" for _ in buckets)
+    cursor.execute(f"""
+        SELECT c.id, c.query, c.query_normalized, c.query_tokens
+        FROM (
+            SELECT cache_id, COUNT(*) AS shared FROM web_search_cache_lsh
+            WHERE {bands}
+            GROUP BY cache_id
+            ORDER BY shared DESC
+            LIMIT ?
+        ) l
+        JOIN web_search_cache c ON c.id = l.cache_id
+        WHERE c.expires_at > datetime('now')
+    """, [value for band, bucket in enumerate(buckets) for value in (band, bucket)] + [FUZZY_CANDIDATES])
     
+    rows = cursor.fetchall()
     conn.close()
-    return None
+    
+    best = None
+    for row in rows:
+        other = set((row["query_tokens"] or "").split())
+        similarity = len(tokens & other) / len(tokens | other) if other else 0.0
+        if similarity >= threshold and (best is None or similarity > best["similarity"]):
+            best = {"id": row["id"], "query": row["query"], "query_normalized": row["query_normalized"],
+                    "similarity": similarity}
+    return best
 
 
-def cache_search_results(query: str, results: list, source: str = "duckduckgo") -> dict:
+@queued_write
+def cache_search_results(query: str, results: list, source: str = "duckduckgo", ttl_hours: int = None) -> dict:
     """
     Enregistrer les résultats d'une recherche dans le cache.
     
@@ -488,6 +3070,7 @@ def cache_search_results(query: str, results: list, source: str = "duckduckgo")
         query: La requête originale
         results: Liste des résultats de recherche
         source: Source de la recherche (duckduckgo, google, etc.)
+        ttl_hours: Durée de validité (défaut: SEARCH_CACHE_TTL_HOURS de la source)
     
     Returns:
         dict avec le statut de l'opération
@@ -496,23 +3079,39 @@ def cache_search_results(query: str, results: list, source: str = "duckduckgo")
     cursor = conn.cursor()
     
     normalized = normalize_query(query)
-    results_json = json.dumps(results, ensure_ascii=False)
+    data, raw_size = compress_results(results)
+    expires = f"+{ttl_hours or search_cache_ttl(source)} hours"
     
-    # Supprimer les anciennes entrées pour cette requête
     cursor.execute("""
-        DELETE FROM web_search_cache 
-        WHERE query_normalized = ?
+        SELECT id FROM web_search_cache WHERE query_normalized = ? ORDER BY id DESC
     """, (normalized,))
+    existing = [row[0] for row in cursor.fetchall()]
     
-    # Insérer le nouveau cache
-    cursor.execute("""
-        INSERT INTO web_search_cache (query, query_normalized, results, source)
-        VALUES (?, ?, ?, ?)
-    """, (query, normalized, results_json, source))
-    
-    cache_id = cursor.lastrowid
+    if existing:
+        # Rafraîchissement: même ligne, mêmes hit_count et last_hit_at (et les
+        # hits encore en mémoire pour cet id restent valables)
+        cache_id = existing[0]
+        cursor.execute("""
+            UPDATE web_search_cache
+            SET query = ?, results = ?, source = ?, created_at = CURRENT_TIMESTAMP,
+                expires_at = datetime('now', ?), results_size = ?, raw_size = ?
+            WHERE id = ?
+        """, (query, data, source, expires, len(data), raw_size, cache_id))
+        cursor.executemany("DELETE FROM web_search_cache WHERE id = ?", [(old_id,) for old_id in existing[1:]])
+        cursor.execute("DELETE FROM web_search_cache_lsh WHERE cache_id = ?", (cache_id,))
+    else:
+        cursor.execute("""
+            INSERT INTO web_search_cache (query, query_normalized, results, source, expires_at,
+                                          results_size, raw_size)
+            VALUES (?, ?, ?, ?, datetime('now', ?), ?, ?)
+        """, (query, normalized, data, source, expires, len(data), raw_size))
+        cache_id = cursor.lastrowid
+    
+    index_cached_query(cursor, cache_id, query)
+    enforce_search_cache_budget(cursor, keep_id=cache_id)
     conn.commit()
     conn.close()
+    _forget_cached_search(normalized)
     
     return {
         "success": True,
@@ -522,21 +3121,68 @@ def cache_search_results(query: str, results: list, source: str = "duckduckgo")
     }
 
 
+@queued_write
+def enforce_search_cache_budget(cursor=None, keep_id: int = None, max_bytes: int = None) -> dict:
+    """
+    Évincer les entrées de moindre valeur si le cache dépasse son budget en octets.
+
+    La valeur combine popularité et fraîcheur d'usage (voir EVICTION_HALF_LIFE_HOURS);
+    les entrées sont lues dans l'ordre de idx_web_cache_score (sans tri), et
+    seulement jusqu'à libérer assez d'octets; le total vient de stat_counters.
+    """
+    max_bytes = SEARCH_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    conn = None
+    if cursor is None:
+        conn = get_connection()
+        cursor = conn.cursor()
+    
+    cursor.execute("SELECT value FROM stat_counters WHERE name = 'search_cache.bytes_stored'")
+    row = cursor.fetchone()
+    total = row[0] if row else 0
+    evicted = []
+    evicted_bytes = 0
+    
+    if total > max_bytes:
+        target = total - max_bytes * EVICTION_TARGET
+        cursor.execute("""
+            SELECT id, COALESCE(results_size, 0) FROM web_search_cache
+            WHERE id != ?
+            ORDER BY eviction_score
+        """, (keep_id if keep_id is not None else -1,))
+        for cache_id, size in cursor:
+            if evicted_bytes >= target:
+                break
+            evicted.append(cache_id)
+            evicted_bytes += size
+        cursor.executemany("DELETE FROM web_search_cache WHERE id = ?", [(cache_id,) for cache_id in evicted])
+    
+    if conn is not None:
+        conn.commit()
+        conn.close()
+    if evicted:
+        _forget_cached_search()
+        with _search_lru_lock:
+            _eviction_stats["evictions"] += len(evicted)
+            _eviction_stats["evicted_bytes"] += evicted_bytes
+    
+    return {"success": True, "evicted": len(evicted), "evicted_bytes": evicted_bytes,
+            "bytes": total - evicted_bytes}
+
+
 def get_search_cache_stats() -> dict:
     """Obtenir les statistiques du cache de recherche"""
-    conn = get_connection()
+    flush_search_hits()
+    conn = get_connection(readonly=True)
     cursor = conn.cursor()
     
-    # Total d'entrées
-    cursor.execute("SELECT COUNT(*) as total FROM web_search_cache")
-    total = cursor.fetchone()["total"]
-    
-    # Total de hits
-    cursor.execute("SELECT SUM(hit_count) as hits FROM web_search_cache")
-    row = cursor.fetchone()
-    total_hits = row["hits"] if row["hits"] else 0
+    # Entrées, hits et tailles: compteurs tenus par triggers
+    counters = get_stat_counters(conn)
+    total = counters.get("search_cache.entries", 0)
+    total_hits = counters.get("search_cache.hits", 0)
+    sizes = {"stored": counters.get("search_cache.bytes_stored", 0),
+             "raw": counters.get("search_cache.bytes_raw", 0)}
     
-    # Requêtes les plus consultées
+    # Requêtes les plus consultées (parcours de idx_web_cache_eviction)
     cursor.execute("""
         SELECT query, hit_count, created_at 
         FROM web_search_cache 
@@ -547,13 +3193,26 @@ def get_search_cache_stats() -> dict:
     
     conn.close()
     
+    with _search_lru_lock:
+        lookups = dict(_lookup_stats)
+        evictions = dict(_eviction_stats)
+    
     return {
         "total_cached": total,
         "total_hits": total_hits,
-        "top_queries": top_queries
+        "top_queries": top_queries,
+        "lookups": lookups,
+        "bytes_stored": sizes["stored"],
+        "bytes_raw": sizes["raw"],
+        "bytes_saved": sizes["raw"] - sizes["stored"],
+        "max_bytes": SEARCH_CACHE_MAX_BYTES,
+        "evictions": evictions["evictions"],
+        "evicted_bytes": evictions["evicted_bytes"],
+        "refresh": get_refresh_queue_stats()
     }
 
 
+@queued_write
 def clear_search_cache(older_than_hours: int = None) -> dict:
     """
     Vider le cache de recherche.
@@ -567,22 +3226,197 @@ def clear_search_cache(older_than_hours: int = None) -> dict:
     if older_than_hours:
         cursor.execute("""
             DELETE FROM web_search_cache 
-            WHERE datetime(created_at, '+' || ? || ' hours') < datetime('now')
-        """, (older_than_hours,))
+            WHERE created_at < datetime('now', ?)
+        """, (f"-{older_than_hours} hours",))
     else:
         cursor.execute("DELETE FROM web_search_cache")
     
     deleted = cursor.rowcount
     conn.commit()
     conn.close()
+    _forget_cached_search()
     
     return {"success": True, "deleted": deleted}
 
 
+@queued_write
+def _sweep_search_cache_batch(batch_size: int) -> int:
+    """Un lot de sweep_search_cache; retourne le nombre d'entrées supprimées"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        DELETE FROM web_search_cache WHERE id IN (
+            SELECT id FROM web_search_cache
+            WHERE expires_at <= datetime('now', ?)
+            LIMIT ?
+        )
+    """, (f"-{SEARCH_STALE_HOURS} hours", batch_size))
+    count = cursor.rowcount
+    conn.commit()
+    conn.close()
+    
+    return count
+
+
+def sweep_search_cache(batch_size: int = SWEEP_BATCH_SIZE, max_batches: int = None) -> dict:
+    """
+    Supprimer par petits lots les entrées expirées depuis plus de SEARCH_STALE_HOURS.
+
+    Chaque lot est une écriture courte (lecture de idx_web_cache_expires), et
+    une opération distincte de la file d'écriture: les autres écritures passent
+    entre deux lots.
+    """
+    deleted = 0
+    batches = 0
+    
+    while max_batches is None or batches < max_batches:
+        count = _sweep_search_cache_batch(batch_size)
+        deleted += count
+        batches += 1
+        if count < batch_size:
+            break
+    
+    if deleted:
+        _forget_cached_search()
+    
+    return {"success": True, "deleted": deleted, "batches": batches}
+
+
+_sweeper = {"thread": None, "stop": None}
+
+
+def start_search_cache_sweeper(interval: float = SWEEP_INTERVAL) -> dict:
+    """Lancer (une seule fois) le nettoyage périodique du cache web dans un thread"""
+    if _sweeper["thread"] is not None and _sweeper["thread"].is_alive():
+        return {"success": True, "started": False}
+    
+    stop = threading.Event()
+    
+    def run():
+        while not stop.wait(interval):
+            try:
+                sweep_search_cache()
+            except sqlite3.Error as e:
+                print(f"⚠️ Nettoyage du cache web: {e}", file=sys.stderr)
+    
+    thread = threading.Thread(target=run, name="search-cache-sweeper", daemon=True)
+    _sweeper.update(thread=thread, stop=stop)
+    thread.start()
+    return {"success": True, "started": True}
+
+
+def stop_search_cache_sweeper() -> dict:
+    """Arrêter le nettoyage périodique du cache web"""
+    if _sweeper["stop"] is not None:
+        _sweeper["stop"].set()
+    _sweeper.update(thread=None, stop=None)
+    return {"success": True}
+
+
+# ============================================
+# CACHE WEB: RAFRAÎCHISSEMENT EN ARRIÈRE-PLAN
+# ============================================
+
+_refresh = {
+    "heap": [],          # (-hit_count, ordre d'arrivée, requête normalisée, requête)
+    "queued": set(),     # requêtes normalisées en attente ou en cours
+    "fetcher": None,
+    "thread": None,
+    "counter": itertools.count(),
+    "refreshed": 0,
+    "errors": 0,
+}
+_refresh_cond = threading.Condition()
+
+
+def set_search_fetcher(fetcher) -> dict:
+    """
+    Brancher la fonction qui refait une recherche web pour le rafraîchissement.
+
+    fetcher(query) retourne les résultats (liste, ou dict avec "results" et
+    "source") qui sont alors mis en cache, ou None s'il les a mis en cache
+    lui-même. Un fetcher factice suffit pour les essais:
+
+        memory.set_search_fetcher(lambda q: {"results": [], "source": "test"})
+
+    Passer None arrête le thread de rafraîchissement (la file est conservée).
+    """
+    with _refresh_cond:
+        _refresh["fetcher"] = fetcher
+        if fetcher is not None and (_refresh["thread"] is None or not _refresh["thread"].is_alive()):
+            thread = threading.Thread(target=_refresh_worker, name="search-cache-refresh", daemon=True)
+            _refresh["thread"] = thread
+            thread.start()
+        _refresh_cond.notify_all()
+    return {"success": True, "queued": len(_refresh["heap"])}
+
+
+def schedule_search_refresh(query: str, priority: int = 0) -> bool:
+    """Mettre une requête dans la file de rafraîchissement (les plus consultées d'abord)"""
+    normalized = normalize_query(query)
+    with _refresh_cond:
+        if normalized in _refresh["queued"] or len(_refresh["heap"]) >= REFRESH_QUEUE_MAX:
+            return False
+        _refresh["queued"].add(normalized)
+        heapq.heappush(_refresh["heap"], (-priority, next(_refresh["counter"]), normalized, query))
+        _refresh_cond.notify()
+    return True
+
+
+def _refresh_worker():
+    while True:
+        with _refresh_cond:
+            while _refresh["fetcher"] is not None and not _refresh["heap"]:
+                _refresh_cond.wait()
+            fetcher = _refresh["fetcher"]
+            if fetcher is None:
+                _refresh["thread"] = None
+                return
+            _, _, normalized, query = heapq.heappop(_refresh["heap"])
+        
+        try:
+            fetched = fetcher(query)
+            if fetched is not None:
+                if isinstance(fetched, dict):
+                    cache_search_results(query, fetched.get("results", []), fetched.get("source", "duckduckgo"))
+                else:
+                    cache_search_results(query, fetched)
+            with _refresh_cond:
+                _refresh["refreshed"] += 1
+        except Exception as e:
+            print(f"⚠️ Rafraîchissement de \"{query}\": {e}", file=sys.stderr)
+            with _refresh_cond:
+                _refresh["errors"] += 1
+        finally:
+            with _refresh_cond:
+                _refresh["queued"].discard(normalized)
+                _refresh_cond.notify_all()
+
+
+def get_refresh_queue_stats() -> dict:
+    """État de la file de rafraîchissement"""
+    with _refresh_cond:
+        return {
+            "queued": len(_refresh["heap"]),
+            "in_progress": len(_refresh["queued"]) - len(_refresh["heap"]),
+            "refreshed": _refresh["refreshed"],
+            "errors": _refresh["errors"],
+            "fetcher": _refresh["fetcher"] is not None,
+        }
+
+
+def wait_for_search_refresh(timeout: float = None) -> bool:
+    """Attendre que la file de rafraîchissement soit vide (True si c'est le cas)"""
+    with _refresh_cond:
+        return _refresh_cond.wait_for(lambda: not _refresh["queued"] or _refresh["fetcher"] is None, timeout)
+
+
 # ============================================
 # GESTION DES CONVERSATIONS
 # ============================================
 
+@queued_write
 def create_conversation(session_id: str, title: str = None) -> dict:
     """Créer une nouvelle conversation"""
     conn = get_connection()
@@ -600,6 +3434,7 @@ def create_conversation(session_id: str, title: str = None) -> dict:
     return {"id": conversation_id, "session_id": session_id}
 
 
+@queued_write
 def add_message(conversation_id: int, role: str, content: str) -> dict:
     """Ajouter un message à une conversation"""
     conn = get_connection()
@@ -617,15 +3452,34 @@ def add_message(conversation_id: int, role: str, content: str) -> dict:
     return {"id": message_id, "success": True}
 
 
+@bulk_write
+def add_messages(messages, commit_every: int = None) -> dict:
+    """
+    Ajouter plusieurs messages en une transaction (import d'historique).
+
+    messages: itérable de dicts (conversation_id, role, content, created_at) ou de
+    tuples dans cet ordre; sans created_at, l'heure courante est utilisée.
+    """
+    def refresh_summaries(cursor, ids, batch):
+        refresh_conversation_summaries(cursor, {row[0] for row in batch})
+    
+    rows = _bulk_rows(messages, ("conversation_id", "role", "content", "created_at"), {})
+    # Un seul recalcul par conversation et par lot au lieu d'un trigger par message
+    return _bulk_insert("""
+        INSERT INTO messages (conversation_id, role, content, created_at)
+        VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+    """, rows, commit_every, refresh_summaries, pause_triggers="conversations")
+
+
 def get_conversation_messages(conversation_id: int) -> list:
     """Récupérer les messages d'une conversation"""
-    conn = get_connection()
+    conn = get_connection(readonly=True)
     cursor = conn.cursor()
     
     cursor.execute("""
         SELECT * FROM messages 
         WHERE conversation_id = ?
-        ORDER BY created_at ASC
+        ORDER BY created_at ASC, id ASC
     """, (conversation_id,))
     
     rows = cursor.fetchall()
@@ -634,14 +3488,61 @@ def get_conversation_messages(conversation_id: int) -> list:
     return [dict(row) for row in rows]
 
 
+def get_recent_messages(conversation_id: int, limit: int = 50, before: str = None) -> dict:
+    """
+    Récupérer les derniers messages d'une conversation, page par page.
+
+    La pagination est par clé (created_at, id) sur idx_messages_conversation:
+    seuls les messages de la page sont lus, quelle que soit la longueur de la
+    conversation.
+
+    Args:
+        conversation_id: identifiant de la conversation
+        limit: nombre de messages par page
+        before: valeur next_cursor de la page précédente (None pour les plus récents)
+
+    Returns:
+        dict avec "messages" (ordre chronologique) et "next_cursor" pour remonter
+        vers les messages plus anciens (None s'il n'y en a plus)
+    """
+    condition = ""
+    params = [conversation_id]
+    if before:
+        created_at, _, last_id = before.rpartition("|")
+        condition = "AND (created_at, id) < (?, ?)"
+        params.extend([created_at, int(last_id)])
+    
+    conn = get_connection(readonly=True)
+    cursor = conn.cursor()
+    
+    cursor.execute(f"""
+        SELECT * FROM messages
+        WHERE conversation_id = ? {condition}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    """, params + [limit + 1])
+    
+    rows = cursor.fetchall()
+    conn.close()
+    
+    messages = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        oldest = messages[-1]
+        next_cursor = f"{oldest['created_at']}|{oldest['id']}"
+    messages.reverse()
+    
+    return {"messages": messages, "next_cursor": next_cursor}
+
+
 def get_all_conversations() -> list:
     """Récupérer toutes les conversations"""
-    conn = get_connection()
+    conn = get_connection(readonly=True)
     cursor = conn.cursor()
     
     cursor.execute("""
         SELECT * FROM conversations 
-        ORDER BY updated_at DESC
+        ORDER BY updated_at DESC, id DESC
     """)
     
     rows = cursor.fetchall()
@@ -650,42 +3551,211 @@ def get_all_conversations() -> list:
     return [dict(row) for row in rows]
 
 
-# ============================================
-# STATISTIQUES
-# ============================================
+def list_conversations(limit: int = 50, cursor: str = None, session_id: str = None) -> dict:
+    """
+    Lister les conversations par page, de la plus récemment active à la plus ancienne.
 
-def get_memory_stats() -> dict:
-    """Obtenir les statistiques de la mémoire"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    Chaque conversation porte message_count, last_message_at et
+    last_message_preview: une seule requête suffit pour afficher la liste.
+
+    Args:
+        limit: nombre de conversations par page
+        cursor: valeur next_cursor de la page précédente (None pour la première)
+        session_id: ne lister que les conversations de cette session
+
+    Returns:
+        dict avec "conversations" et "next_cursor" (None sur la dernière page)
+    """
+    conditions = []
+    params = []
+    if session_id is not None:
+        conditions.append("session_id = ?")
+        params.append(session_id)
+    if cursor:
+        updated_at, _, last_id = cursor.rpartition("|")
+        conditions.append("(updated_at, id) < (?, ?)")
+        params.extend([updated_at, int(last_id)])
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    conn = get_connection(readonly=True)
+    db_cursor = conn.cursor()
+    
+    db_cursor.execute(f"""
+        SELECT * FROM conversations
+        {where}
+        ORDER BY updated_at DESC, id DESC
+        LIMIT ?
+    """, params + [limit + 1])
+    
+    rows = db_cursor.fetchall()
+    conn.close()
     
-    cursor.execute("SELECT COUNT(*) as total FROM memories WHERE is_active = 1")
-    total = cursor.fetchone()["total"]
+    conversations = [dict(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = conversations[-1]
+        next_cursor = f"{last['updated_at']}|{last['id']}"
     
-    cursor.execute("""
-        SELECT category, COUNT(*) as count 
-        FROM memories 
-        WHERE is_active = 1 
-        GROUP BY category
+    return {"conversations": conversations, "next_cursor": next_cursor}
+
+
+# Longueur de l'aperçu du dernier message (en caractères)
+PREVIEW_LENGTH = 120
+
+# Expression SQL de l'aperçu d'un message (sur une ligne)
+_PREVIEW_SQL = f"replace(replace(substr({{col}}, 1, {PREVIEW_LENGTH}), char(13), ''), char(10), ' ')"
+
+
+def init_conversation_triggers(cursor):
+    """Créer les triggers qui tiennent à jour le résumé des conversations"""
+    # Un message importé avec une date ancienne ne remplace pas le dernier message
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS messages_conversation_ai AFTER INSERT ON messages
+        WHEN NOT EXISTS (SELECT 1 FROM paused_triggers WHERE name = 'conversations')
+        BEGIN
+            UPDATE conversations SET
+                message_count = COALESCE(message_count, 0) + 1,
+                last_message_preview = CASE WHEN new.created_at >= COALESCE(last_message_at, '')
+                    THEN {_PREVIEW_SQL.format(col="new.content")} ELSE last_message_preview END,
+                last_message_at = max(COALESCE(last_message_at, ''), new.created_at),
+                updated_at = max(COALESCE(updated_at, ''), new.created_at)
+            WHERE id = new.conversation_id;
+        END
     """)
-    by_category = {row["category"]: row["count"] for row in cursor.fetchall()}
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS messages_conversation_ad AFTER DELETE ON messages BEGIN
+            UPDATE conversations SET
+                message_count = max(COALESCE(message_count, 0) - 1, 0),
+                last_message_at = (
+                    SELECT created_at FROM messages WHERE conversation_id = old.conversation_id
+                    ORDER BY created_at DESC, id DESC LIMIT 1),
+                last_message_preview = (
+                    SELECT {_PREVIEW_SQL.format(col="content")} FROM messages
+                    WHERE conversation_id = old.conversation_id
+                    ORDER BY created_at DESC, id DESC LIMIT 1)
+            WHERE id = old.conversation_id;
+        END
+    """)
+
+
+@queued_write
+def refresh_conversation_summaries(cursor=None, conversation_ids: list = None) -> dict:
+    """
+    Recalculer message_count, last_message_at et last_message_preview
+    (de toutes les conversations, ou seulement de conversation_ids)
+    """
+    conn = None
+    if cursor is None:
+        conn = get_connection()
+        cursor = conn.cursor()
     
-    cursor.execute("SELECT COUNT(*) as total FROM conversations")
-    conversations = cursor.fetchone()["total"]
+    where = ""
+    params = ()
+    if conversation_ids is not None:
+        where = "WHERE id IN (SELECT value FROM json_each(?))"
+        params = (json.dumps(list(conversation_ids)),)
+    
+    cursor.execute(f"""
+        UPDATE conversations SET
+            message_count = (SELECT COUNT(*) FROM messages WHERE conversation_id = conversations.id),
+            last_message_at = (
+                SELECT created_at FROM messages WHERE conversation_id = conversations.id
+                ORDER BY created_at DESC, id DESC LIMIT 1),
+            last_message_preview = (
+                SELECT {_PREVIEW_SQL.format(col="content")} FROM messages
+                WHERE conversation_id = conversations.id
+                ORDER BY created_at DESC, id DESC LIMIT 1)
+        {where}
+    """, params)
+    updated = cursor.rowcount
+    cursor.execute(f"""
+        UPDATE conversations SET updated_at = last_message_at
+        {where + " AND" if where else "WHERE"} last_message_at > COALESCE(updated_at, '')
+    """, params)
     
-    cursor.execute("SELECT COUNT(*) as total FROM messages")
-    messages = cursor.fetchone()["total"]
+    if conn is not None:
+        conn.commit()
+        conn.close()
     
-    conn.close()
+    return {"success": True, "conversations": updated}
+
+
+# ============================================
+# STATISTIQUES
+# ============================================
+
+def get_memory_stats() -> dict:
+    """Obtenir les statistiques de la mémoire (lecture des compteurs tenus par triggers)"""
+    counters = get_stat_counters()
+    by_category = {
+        name[len(CATEGORY_COUNTER_PREFIX):]: value
+        for name, value in counters.items()
+        if name.startswith(CATEGORY_COUNTER_PREFIX) and value > 0
+    }
     
     return {
-        "total_memories": total,
+        "total_memories": counters.get("memories", 0),
         "by_category": by_category,
-        "total_conversations": conversations,
-        "total_messages": messages
+        "total_conversations": counters.get("conversations", 0),
+        "total_messages": counters.get("messages", 0)
     }
 
 
+# ============================================
+# BANC D'ESSAI DE LA FILE D'ÉCRITURE
+# ============================================
+
+def _benchmark_write_queue(threads: int = 32, per_thread: int = 200) -> list:
+    """
+    Comparer écritures directes et file d'écriture sous N écrivains concurrents,
+    sur une base temporaire (add_message + cache_search_results).
+    """
+    import tempfile
+    global DB_PATH
+    saved_path = DB_PATH
+    results = []
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for queued in (False, True):
+            DB_PATH = Path(tmp) / f"bench_{'queue' if queued else 'direct'}.db"
+            init_database()
+            conversation_id = create_conversation("bench")["id"]
+            if queued:
+                enable_write_queue()
+            errors = []
+            
+            def work(worker):
+                for i in range(per_thread):
+                    try:
+                        add_message(conversation_id, "user", f"message {worker}-{i}")
+                        if i % 10 == 0:
+                            cache_search_results(f"requête {worker} {i}", [{"i": i}])
+                    except sqlite3.OperationalError as e:
+                        errors.append(str(e))
+            
+            workers = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+            stats = disable_write_queue()["stats"] if queued else None
+            close_all_connections()
+            
+            operations = threads * (per_thread + per_thread // 10)
+            results.append({
+                "mode": "file" if queued else "direct",
+                "seconds": round(elapsed, 3),
+                "ops_per_second": round(operations / elapsed),
+                "errors": len(errors),
+                "ops_per_commit": round(stats["operations"] / stats["batches"], 1) if stats else 1,
+            })
+    
+    DB_PATH = saved_path
+    return results
+
+
 # ============================================
 # INITIALISATION
 # ============================================
@@ -695,6 +3765,23 @@ if __name__ == "__main__":
     init_database()
     print("✅ Base de données initialisée")
     
+    # python memory.py benchmark-writes: file d'écriture contre écritures directes
+    if "benchmark-writes" in sys.argv[1:]:
+        for result in _benchmark_write_queue():
+            print(f"⏱️  {result['mode']:6}: {result['ops_per_second']:>6} op/s, "
+                  f"{result['errors']} erreurs, {result['ops_per_commit']} op/commit")
+    
+    # python memory.py rebuild-counters: recalculer les compteurs de statistiques
+    if "rebuild-counters" in sys.argv[1:]:
+        counters = rebuild_stat_counters()["counters"]
+        print(f"🔢 Compteurs recalculés ({len(counters)})")
+    
+    # python memory.py deduplicate-memories [--dry-run]: fusionner les quasi-doublons
+    if "deduplicate-memories" in sys.argv[1:]:
+        result = deduplicate_memories(dry_run="--dry-run" in sys.argv)
+        print(f"🧹 Quasi-doublons {'trouvés' if result['dry_run'] else 'fusionnés'}: "
+              f"{result['merged']} ({len(result['groups'])} groupes)")
+    
     # Afficher les stats
     stats = get_memory_stats()
     print(f"\n📊 Statistiques:")
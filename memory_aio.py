@@ -0,0 +1,252 @@
+"""
+Yevedia AI Chat - Mémoire Asynchrone
+Façade asyncio de memory.py: chaque fonction publique y existe en coroutine,
+exécutée sur un pool borné de threads qui gardent chacun leurs connexions SQLite.
+
+    import memory_aio as aio
+    await aio.add_memory("Mon nom", "Je suis Jean", "identity")
+    async for message in aio.iter_messages(conversation_id):
+        ...
+
+Annuler la tâche qui attend un appel retire l'opération de la file si elle
+n'a pas commencé, et interrompt sa requête SQLite (sqlite3 interrupt) si
+elle est en cours. Une écriture déjà transmise à la file d'écriture
+(memory.enable_write_queue) va à son terme.
+"""
+
+import asyncio
+import functools
+import inspect
+import threading
+import weakref
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import memory
+
+# Nombre de threads (et donc de paires de connexions) au plus
+MAX_WORKERS = 4
+
+# Taille des pages lues par les itérateurs asynchrones
+PAGE_SIZE = 200
+
+# Fonctions de memory.py qui n'ont pas de sens en coroutine
+SYNC_ONLY = {
+    "get_connection", "close_all_connections", "queued_write", "exclusive_write", "bulk_write",
+    "get_write_queue", "enable_write_queue", "disable_write_queue",
+    "set_search_fetcher", "start_search_cache_sweeper",
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_thread_connections = []
+_worker = threading.local()
+
+
+class _ThreadExit:
+    """Objet propre à un thread du pool: libéré (et finalisé) quand le thread se termine"""
+
+
+def _close_connections(connections):
+    connections.close()
+    with _executor_lock:
+        _thread_connections.remove(connections)
+
+
+def _install_connections():
+    """Initialisation de chaque thread du pool: connexions attitrées, fermées à la fin du thread"""
+    connections = memory.ThreadConnections().install()
+    with _executor_lock:
+        _thread_connections.append(connections)
+    _worker.exit = _ThreadExit()
+    weakref.finalize(_worker.exit, _close_connections, connections)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="memory-aio",
+                                           initializer=_install_connections)
+        return _executor
+
+
+def configure(max_workers: int = None) -> dict:
+    """Changer la taille du pool (appliquée au prochain appel, après shutdown())"""
+    global MAX_WORKERS
+    if max_workers is not None:
+        if max_workers < 1:
+            return {"success": False, "error": "max_workers doit être positif"}
+        MAX_WORKERS = max_workers
+    return {"success": True, "max_workers": MAX_WORKERS}
+
+
+def shutdown(wait: bool = True) -> dict:
+    """
+    Arrêter le pool de threads.
+
+    Chaque thread ferme ses connexions en se terminant: avec wait=False, après
+    l'opération qu'il est en train d'exécuter. "open" compte les threads dont
+    les connexions ne sont pas encore fermées au retour.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+    with _executor_lock:
+        return {"success": True, "open": len(_thread_connections)}
+
+
+class _Call:
+    """Appel exécuté dans un thread du pool, interruptible depuis la boucle"""
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self._lock = threading.Lock()
+        self._connections = None
+        self._cancelled = False
+
+    def run(self):
+        connections = memory.ThreadConnections.current()
+        with self._lock:
+            if self._cancelled:
+                raise CancelledError()
+            self._connections = connections
+        try:
+            return self.func(*self.args, **self.kwargs)
+        finally:
+            with self._lock:
+                self._connections = None
+            # Une opération interrompue ou en erreur ne laisse pas de transaction ouverte
+            connections.reset()
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            if self._connections is not None:
+                self._connections.interrupt()
+
+
+async def run(func, *args, **kwargs):
+    """Exécuter func(*args, **kwargs) sur le pool de threads et attendre son résultat"""
+    call = _Call(func, args, kwargs)
+    future = _get_executor().submit(call.run)
+    try:
+        return await asyncio.wrap_future(future)
+    except asyncio.CancelledError:
+        # wrap_future a déjà retiré l'appel de la file s'il n'avait pas commencé
+        call.cancel()
+        raise
+
+
+def _coroutine(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+    return wrapper
+
+
+def _code_names(code) -> set:
+    """Noms globaux utilisés par une fonction, y compris par ses fonctions imbriquées"""
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _code_names(const)
+    return names
+
+
+def _io_functions(functions: dict) -> set:
+    """Fonctions qui ouvrent une connexion SQLite, directement ou par une autre fonction"""
+    uses = {name: _code_names(inspect.unwrap(func).__code__) for name, func in functions.items()}
+    io = {"get_connection"}
+    while True:
+        found = {name for name, names in uses.items() if name not in io and names & io}
+        if not found:
+            return io
+        io |= found
+
+
+def _mirror_public_functions() -> list:
+    """
+    Créer une coroutine pour chaque fonction publique de memory.py qui accède
+    à la base (les fonctions de calcul pur restent à appeler directement)
+    """
+    functions = {name: func for name, func in inspect.getmembers(memory, inspect.isfunction)
+                 if func.__module__ == memory.__name__}
+    io = _io_functions(functions)
+    names = []
+    for name, func in functions.items():
+        if name.startswith("_") or name in SYNC_ONLY or name not in io:
+            continue
+        if inspect.isgeneratorfunction(func) or name in globals():
+            continue
+        params = list(inspect.signature(func).parameters.values())
+        if params and params[0].name in ("cursor", "conn") and params[0].default is inspect.Parameter.empty:
+            # Fonctions internes qui travaillent dans la transaction de l'appelant
+            # (un curseur optionnel, lui, est ouvert par la fonction elle-même)
+            continue
+        globals()[name] = _coroutine(func)
+        names.append(name)
+    return names
+
+
+# ============================================
+# ITÉRATEURS ASYNCHRONES (PAGINATION PAR CLÉ)
+# ============================================
+
+async def iter_messages(conversation_id: int, page_size: int = PAGE_SIZE):
+    """Messages d'une conversation, du plus récent au plus ancien, page par page"""
+    before = None
+    while True:
+        page = await run(memory.get_recent_messages, conversation_id, page_size, before)
+        for message in reversed(page["messages"]):
+            yield message
+        before = page["next_cursor"]
+        if before is None:
+            return
+
+
+async def iter_documents(page_size: int = PAGE_SIZE, active_only: bool = False):
+    """Documents (sans leur contenu), du plus récent au plus ancien, page par page"""
+    cursor = None
+    while True:
+        page = await run(memory.list_documents, page_size, cursor, active_only)
+        for document in page["documents"]:
+            yield document
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
+
+
+async def iter_conversations(page_size: int = PAGE_SIZE, session_id: str = None):
+    """Conversations, de la plus récemment active à la plus ancienne, page par page"""
+    cursor = None
+    while True:
+        page = await run(memory.list_conversations, page_size, cursor, session_id)
+        for conversation in page["conversations"]:
+            yield conversation
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return
+
+
+async def iter_document_content(doc_id: int, slice_size: int = memory.CONTENT_SLICE_SIZE):
+    """Contenu d'un document par tranches de slice_size octets"""
+    start = 0
+    while True:
+        piece = await run(memory.read_document_slice, doc_id, start, slice_size)
+        if not piece["success"]:
+            return
+        if piece["content"]:
+            yield piece["content"]
+        if piece["eof"] or piece["end_byte"] == start:
+            return
+        start = piece["end_byte"]
+
+
+MIRRORED = _mirror_public_functions()
+
+__all__ = MIRRORED + ["run", "configure", "shutdown", "iter_messages", "iter_documents",
+                      "iter_conversations", "iter_document_content"]
@@ -0,0 +1,609 @@
+"""
+Yevedia AI Chat - Index Vectoriel Approximatif (IVF-PQ)
+Index de plus proches voisins approximatif sur la table embeddings, stocké dans
+un fichier annexe memory.db.ann ouvert en mémoire mappée (np.memmap): le
+démarrage ne relit pas les BLOBs de la base.
+
+Structure:
+  - IVF: les vecteurs normalisés sont répartis en nlist listes (k-means);
+    une requête ne parcourt que les nprobe listes les plus proches.
+  - PQ: chaque vecteur est résumé par m octets (un centroïde par sous-espace),
+    le score se calcule avec une table de correspondance par requête.
+  - Les meilleurs candidats sont reclassés avec les vecteurs exacts lus en base.
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+import memory
+
+MAGIC = b"YVANN001"
+ALIGN = 64
+KSUB = 256                  # centroïdes par sous-espace (codes sur 1 octet)
+
+DEFAULT_NPROBE = 16
+RERANK_FACTOR = 8           # candidats reclassés = k * RERANK_FACTOR
+TRAIN_SAMPLE = 20000        # vecteurs utilisés pour entraîner k-means
+KMEANS_ITERS = 12
+BATCH_SIZE = 8192
+
+KIND_MEMORY = 0
+KIND_CHUNK = 1
+
+
+def get_ann_path():
+    """Chemin du fichier annexe (à côté de memory.db)"""
+    return memory.DB_PATH.with_name(memory.DB_PATH.name + ".ann")
+
+
+# ============================================
+# K-MEANS ET QUANTIFICATION
+# ============================================
+
+def _assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Indice du centroïde le plus proche (distance L2) pour chaque ligne de x"""
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), BATCH_SIZE):
+        block = x[start:start + BATCH_SIZE]
+        labels[start:start + len(block)] = np.argmax(block @ centroids.T - half_norms, axis=1)
+    return labels
+
+
+def _kmeans(x: np.ndarray, k: int, iters: int = KMEANS_ITERS, seed: int = 0) -> np.ndarray:
+    """k-means de Lloyd; les centroïdes vides sont réinitialisés sur des points au hasard"""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(x, centroids)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+    return centroids
+
+
+def _pq_train(residuals: np.ndarray, m: int, seed: int = 0) -> np.ndarray:
+    """Entraîner les m dictionnaires PQ (m, ksub, dsub), ksub = min(KSUB, nombre de résidus)"""
+    dsub = residuals.shape[1] // m
+    return np.stack([
+        _kmeans(np.ascontiguousarray(residuals[:, i * dsub:(i + 1) * dsub]), KSUB, seed=seed + i)
+        for i in range(m)
+    ])
+
+
+def _pq_encode(residuals: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+    """Encoder des résidus en codes PQ (n, m) uint8"""
+    m, _, dsub = codebooks.shape
+    codes = np.empty((len(residuals), m), dtype=np.uint8)
+    for i in range(m):
+        codes[:, i] = _assign(np.ascontiguousarray(residuals[:, i * dsub:(i + 1) * dsub]), codebooks[i])
+    return codes
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _choose_m(dim: int) -> int:
+    """Nombre de sous-espaces: sous-vecteurs de 8 dimensions si possible"""
+    for dsub in (8, 4, 2, 1):
+        if dim % dsub == 0:
+            return dim // dsub
+    return dim
+
+
+# ============================================
+# LECTURE DES VECTEURS EN BASE
+# ============================================
+
+def _decode_rows(rows, dim: int = None):
+    """Convertir des lignes (id, memory_id, embedding) en (ids, kinds, vecteurs normalisés)"""
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint8), None
+    dim = dim or len(rows[0][2]) // 4
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    kinds = np.fromiter((KIND_MEMORY if row[1] is not None else KIND_CHUNK for row in rows),
+                        dtype=np.uint8, count=len(rows))
+    vectors = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32).reshape(len(rows), dim)
+    return ids, kinds, _normalize(vectors)
+
+
+def _iter_embeddings(cursor, after_id: int = 0, dim: int = None):
+    """Parcourir la table embeddings par lots (sans tout charger en mémoire)"""
+    last = after_id
+    while True:
+        cursor.execute("""
+            SELECT id, memory_id, embedding FROM embeddings
+            WHERE id > ? ORDER BY id LIMIT ?
+        """, (last, BATCH_SIZE))
+        rows = cursor.fetchall()
+        if not rows:
+            return
+        last = rows[-1][0]
+        yield _decode_rows(rows, dim)
+
+
+def _missing_ids(cursor, index_ids: np.ndarray) -> np.ndarray:
+    """Ids de l'index qui n'existent plus dans la table embeddings"""
+    if not len(index_ids):
+        return np.zeros(0, dtype=np.int64)
+    cursor.execute("SELECT id FROM embeddings WHERE id <= ?", (int(index_ids.max()),))
+    existing = np.fromiter((row[0] for row in cursor.fetchall()), dtype=np.int64)
+    return index_ids[~np.isin(index_ids, existing)]
+
+
+def _load_tombstones(cursor, index_ids: np.ndarray = None) -> np.ndarray:
+    """
+    Ids des vecteurs à ignorer: souvenirs / documents désactivés, et (si index_ids
+    est fourni) vecteurs de l'index qui n'existent plus dans la table.
+    """
+    cursor.execute("""
+        SELECT e.id FROM memories m JOIN embeddings e ON e.memory_id = m.id WHERE m.is_active = 0
+        UNION ALL
+        SELECT e.id FROM documents d JOIN embeddings e ON e.document_id = d.id WHERE d.is_active = 0
+    """)
+    dead = [np.fromiter((row[0] for row in cursor.fetchall()), dtype=np.int64)]
+    if index_ids is not None:
+        dead.append(_missing_ids(cursor, index_ids))
+    return np.unique(np.concatenate(dead))
+
+
+# ============================================
+# FICHIER ANNEXE
+# ============================================
+
+def _write_index(path, header: dict, arrays: dict):
+    """Écrire l'en-tête JSON puis les tableaux alignés, de façon atomique"""
+    layout = {}
+    offset = 0
+    for name, arr in arrays.items():
+        offset = (offset + ALIGN - 1) // ALIGN * ALIGN
+        layout[name] = {"offset": offset, "dtype": arr.dtype.str, "shape": list(arr.shape)}
+        offset += arr.nbytes
+    header = dict(header, arrays=layout)
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = (len(MAGIC) + 8 + len(header_bytes) + ALIGN - 1) // ALIGN * ALIGN
+
+    tmp_path = str(path) + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for name, arr in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(arr).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _open_index(path):
+    """Ouvrir le fichier annexe: en-tête + tableaux en mémoire mappée (lecture seule)"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Fichier d'index invalide: {path}")
+        header_len = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    data_start = (len(MAGIC) + 8 + header_len + ALIGN - 1) // ALIGN * ALIGN
+
+    arrays = {}
+    for name, info in header["arrays"].items():
+        shape = tuple(info["shape"])
+        if 0 in shape:
+            arrays[name] = np.zeros(shape, dtype=np.dtype(info["dtype"]))
+        else:
+            arrays[name] = np.memmap(path, dtype=np.dtype(info["dtype"]), mode="r",
+                                     offset=data_start + info["offset"], shape=shape)
+    return header, arrays
+
+
+# ============================================
+# INDEX IVF-PQ
+# ============================================
+
+class AnnIndex:
+    """
+    Index IVF-PQ persistant.
+
+    Le segment principal (listes triées, codes, centroïdes) est en mémoire mappée.
+    Les vecteurs insérés après la construction (rowid > filigrane) sont encodés
+    avec les mêmes centroïdes dans un segment delta en mémoire, et fusionnés
+    dans le fichier par save(). Les souvenirs désactivés ou supprimés sont
+    exclus par une liste de tombstones, persistée avec l'index.
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.RLock()
+        self.header, arrays = _open_index(self.path)
+        self.dim = self.header["dim"]
+        self.centroids = arrays["centroids"]
+        self.codebooks = arrays["codebooks"]
+        self.list_offsets = arrays["list_offsets"]
+        self.ids = arrays["ids"]
+        self.kinds = arrays["kinds"]
+        self.codes = arrays["codes"]
+        self.tombstones = np.array(arrays["tombstones"])
+        self.versions = self.header.get("versions", {})
+        self.watermark = self.header["watermark"]
+        self._reset_delta()
+
+    def _reset_delta(self):
+        m = self.codebooks.shape[0]
+        self.delta_ids = np.zeros(0, dtype=np.int64)
+        self.delta_kinds = np.zeros(0, dtype=np.uint8)
+        self.delta_lists = np.zeros(0, dtype=np.int32)
+        self.delta_codes = np.zeros((0, m), dtype=np.uint8)
+
+    @property
+    def size(self) -> int:
+        return len(self.ids) + len(self.delta_ids)
+
+    def _encode(self, vectors: np.ndarray):
+        lists = _assign(vectors, np.asarray(self.centroids))
+        codes = _pq_encode(vectors - self.centroids[lists], np.asarray(self.codebooks))
+        return lists, codes
+
+    def refresh(self):
+        """Encoder les nouveaux vecteurs et mettre à jour les tombstones si la base a changé"""
+        with self._lock:
+            conn = memory.get_connection(readonly=True)
+            cursor = conn.cursor()
+            try:
+                versions = memory.get_data_versions(conn)
+                last = int(self.delta_ids[-1]) if len(self.delta_ids) else self.watermark
+                parts = list(_iter_embeddings(cursor, last, self.dim))
+                if parts:
+                    ids = np.concatenate([p[0] for p in parts])
+                    kinds = np.concatenate([p[1] for p in parts])
+                    lists, codes = self._encode(np.concatenate([p[2] for p in parts]))
+                    self.delta_ids = np.concatenate([self.delta_ids, ids])
+                    self.delta_kinds = np.concatenate([self.delta_kinds, kinds])
+                    self.delta_lists = np.concatenate([self.delta_lists, lists])
+                    self.delta_codes = np.concatenate([self.delta_codes, codes])
+
+                if versions != self.versions:
+                    deleted_rows = versions.get("embeddings") != self.versions.get("embeddings")
+                    all_ids = np.concatenate([np.asarray(self.ids), self.delta_ids]) if deleted_rows else None
+                    self.tombstones = _load_tombstones(cursor, all_ids)
+                    self.versions = versions
+            finally:
+                conn.close()
+
+    def _candidates(self, q: np.ndarray, nprobe: int):
+        """Scores PQ approximatifs des vecteurs des nprobe listes les plus proches"""
+        coarse = self.centroids @ q
+        nprobe = min(nprobe, len(coarse))
+        probes = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+
+        # Produit scalaire: q·x ≈ q·c + Σ q_i·pq_i[code_i] (table calculée une fois par requête)
+        m, ksub, dsub = self.codebooks.shape
+        lut = np.einsum("mkd,md->mk", self.codebooks, q.reshape(m, dsub))
+
+        ranges = [np.arange(self.list_offsets[p], self.list_offsets[p + 1]) for p in probes]
+        base_rows = np.concatenate(ranges) if ranges else np.zeros(0, dtype=np.int64)
+        base_lists = np.repeat(probes, [len(r) for r in ranges])
+        delta_rows = np.flatnonzero(np.isin(self.delta_lists, probes))
+
+        ids = np.concatenate([self.ids[base_rows], self.delta_ids[delta_rows]])
+        kinds = np.concatenate([self.kinds[base_rows], self.delta_kinds[delta_rows]])
+        codes = np.concatenate([self.codes[base_rows], self.delta_codes[delta_rows]])
+        lists = np.concatenate([base_lists, self.delta_lists[delta_rows]])
+
+        # ksub < KSUB quand l'index a été entraîné sur moins de KSUB vecteurs
+        flat_codes = codes.astype(np.intp) + np.arange(m) * ksub
+        scores = coarse[lists] + np.take(lut.ravel(), flat_codes).sum(axis=1)
+        return ids, kinds, scores
+
+    def search(self, vector, k: int = 5, nprobe: int = DEFAULT_NPROBE, kind: str = None,
+               active_only: bool = True, rerank: bool = True) -> list:
+        """
+        Rechercher les k vecteurs les plus proches (similarité cosinus approximative).
+
+        Args:
+            vector: vecteur de requête (d,)
+            k: nombre de résultats
+            nprobe: nombre de listes IVF parcourues (précision / vitesse)
+            kind: "memory", "chunk" ou None pour les deux
+            active_only: ignorer les souvenirs et documents désactivés
+            rerank: reclasser les meilleurs candidats avec les vecteurs exacts
+        """
+        self.refresh()
+        q = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if q.size != self.dim:
+            raise ValueError(f"Dimension {q.size} différente de l'index ({self.dim})")
+        q = q / (np.linalg.norm(q) or 1.0)
+
+        with self._lock:
+            ids, kinds, scores = self._candidates(q, nprobe)
+            keep = np.ones(len(ids), dtype=bool)
+            if active_only and len(self.tombstones):
+                keep &= ~np.isin(ids, self.tombstones)
+            if kind == "memory":
+                keep &= kinds == KIND_MEMORY
+            elif kind == "chunk":
+                keep &= kinds == KIND_CHUNK
+            ids, scores = ids[keep], scores[keep]
+
+        if len(ids) == 0:
+            return []
+        shortlist = min(len(ids), k * RERANK_FACTOR if rerank else k)
+        top = np.argpartition(-scores, shortlist - 1)[:shortlist]
+        return self._resolve(ids[top], scores[top], q, k, rerank)
+
+    def _resolve(self, ids: np.ndarray, scores: np.ndarray, q: np.ndarray, k: int, rerank: bool) -> list:
+        """Lire les métadonnées (et vecteurs exacts si rerank) des candidats retenus"""
+        placeholders = ",".join("?" * len(ids))
+        conn = memory.get_connection(readonly=True)
+        rows = conn.execute(f"""
+            SELECT id, memory_id, document_id, chunk_index{', embedding' if rerank else ''}
+            FROM embeddings WHERE id IN ({placeholders})
+        """, [int(i) for i in ids]).fetchall()
+        conn.close()
+
+        approx = dict(zip(ids.tolist(), scores.tolist()))
+        results = []
+        for row in rows:
+            if rerank:
+                vec = np.frombuffer(row["embedding"], dtype=np.float32)
+                score = float(vec @ q / (np.linalg.norm(vec) or 1.0))
+            else:
+                score = approx[row["id"]]
+            result = {"embedding_id": row["id"], "score": score}
+            if row["memory_id"] is not None:
+                result["memory_id"] = row["memory_id"]
+            else:
+                result["document_id"] = row["document_id"]
+                result["chunk_index"] = row["chunk_index"]
+            results.append(result)
+
+        results.sort(key=lambda r: r["score"], reverse=True)
+        return results[:k]
+
+    def save(self) -> dict:
+        """Fusionner le segment delta dans le fichier annexe (sans réentraîner)"""
+        with self._lock:
+            nlist = len(self.centroids)
+            base_lists = np.repeat(np.arange(nlist, dtype=np.int32), np.diff(self.list_offsets))
+            lists = np.concatenate([base_lists, self.delta_lists])
+            ids = np.concatenate([np.asarray(self.ids), self.delta_ids])
+
+            # Les vecteurs supprimés de la table sont retirés définitivement
+            conn = memory.get_connection(readonly=True)
+            cursor = conn.cursor()
+            versions = memory.get_data_versions(conn)
+            gone = _missing_ids(cursor, ids)
+            tombstones = _load_tombstones(cursor)
+            conn.close()
+
+            order = np.argsort(lists, kind="stable")
+            order = order[~np.isin(ids[order], gone)]
+            watermark = int(self.delta_ids[-1]) if len(self.delta_ids) else self.watermark
+            _write_index(self.path, dict(self.header, watermark=watermark, count=len(order),
+                                         versions=versions), {
+                "centroids": np.asarray(self.centroids),
+                "codebooks": np.asarray(self.codebooks),
+                "list_offsets": _list_offsets(lists[order], nlist),
+                "ids": ids[order],
+                "kinds": np.concatenate([np.asarray(self.kinds), self.delta_kinds])[order],
+                "codes": np.concatenate([np.asarray(self.codes), self.delta_codes])[order],
+                "tombstones": tombstones,
+            })
+            self.__init__(self.path)
+            return {"success": True, "count": self.size, "path": self.path}
+
+
+def _list_offsets(sorted_lists: np.ndarray, nlist: int) -> np.ndarray:
+    """Début de chaque liste IVF dans les tableaux triés par liste"""
+    return np.concatenate([[0], np.cumsum(np.bincount(sorted_lists, minlength=nlist))]).astype(np.int64)
+
+
+def build_ann_index(nlist: int = None, m: int = None, sample: int = TRAIN_SAMPLE, seed: int = 0) -> dict:
+    """
+    Construire (ou reconstruire) l'index IVF-PQ à partir de la table embeddings.
+
+    Les centroïdes sont entraînés sur un échantillon, puis tous les vecteurs sont
+    encodés par lots: la mémoire utilisée ne dépend pas de la taille de la table.
+    """
+    started = time.perf_counter()
+    conn = memory.get_connection(readonly=True)
+    cursor = conn.cursor()
+
+    versions = memory.get_data_versions(conn)
+    cursor.execute("SELECT COUNT(*), MAX(id) FROM embeddings")
+    count, max_id = cursor.fetchone()
+    if not count:
+        conn.close()
+        return {"success": False, "error": "Aucun vecteur dans la table embeddings"}
+
+    # Échantillon d'entraînement tiré au hasard sur les rowids
+    cursor.execute("SELECT id, memory_id, embedding FROM embeddings ORDER BY random() LIMIT ?", (sample,))
+    _, _, train = _decode_rows(cursor.fetchall())
+    dim = train.shape[1]
+    # √n listes, avec au moins ~39 points d'entraînement par centroïde
+    nlist = nlist or max(1, min(int(np.sqrt(count)), len(train) // 39))
+    m = m or _choose_m(dim)
+    if dim % m:
+        conn.close()
+        return {"success": False, "error": f"m={m} doit diviser la dimension {dim}"}
+
+    centroids = _kmeans(train, nlist, seed=seed)
+    codebooks = _pq_train(train - centroids[_assign(train, centroids)], m, seed=seed)
+
+    all_ids, all_kinds, all_lists, all_codes = [], [], [], []
+    for ids, kinds, vectors in _iter_embeddings(cursor, 0, dim):
+        lists = _assign(vectors, centroids)
+        all_ids.append(ids)
+        all_kinds.append(kinds)
+        all_lists.append(lists)
+        all_codes.append(_pq_encode(vectors - centroids[lists], codebooks))
+    tombstones = _load_tombstones(cursor)
+    conn.close()
+
+    ids = np.concatenate(all_ids)
+    lists = np.concatenate(all_lists)
+    order = np.argsort(lists, kind="stable")
+    path = get_ann_path()
+    _write_index(path, {
+        "dim": dim, "nlist": len(centroids), "m": m, "count": len(ids),
+        "watermark": int(ids.max()), "versions": versions,
+    }, {
+        "centroids": centroids.astype(np.float32),
+        "codebooks": codebooks.astype(np.float32),
+        "list_offsets": _list_offsets(lists[order], len(centroids)),
+        "ids": ids[order],
+        "kinds": np.concatenate(all_kinds)[order],
+        "codes": np.concatenate(all_codes)[order],
+        "tombstones": tombstones,
+    })
+
+    _reset_ann_index()
+    return {
+        "success": True, "path": str(path), "count": len(ids), "dim": dim,
+        "nlist": len(centroids), "m": m, "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _reset_ann_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def get_ann_index() -> AnnIndex:
+    """Ouvrir l'index annexe de memory.DB_PATH (None s'il n'a pas encore été construit)"""
+    global _index
+    path = str(get_ann_path())
+    with _index_lock:
+        if _index is None or _index.path != path:
+            _index = AnnIndex(path) if os.path.exists(path) else None
+        return _index
+
+
+def search_ann(vector, k: int = 5, nprobe: int = DEFAULT_NPROBE, kind: str = None,
+               active_only: bool = True, rerank: bool = True) -> list:
+    """Recherche approximative; retombe sur la recherche exacte si l'index n'existe pas"""
+    index = get_ann_index()
+    if index is None:
+        import memory_vectors
+        return memory_vectors.search_similar(vector, k=k, kind=kind, active_only=active_only)
+    return index.search(vector, k=k, nprobe=nprobe, kind=kind, active_only=active_only, rerank=rerank)
+
+
+# ============================================
+# BENCHMARK
+# ============================================
+
+def benchmark(n: int = 100000, dim: int = 384, queries: int = 200, k: int = 10,
+              latent: int = 48, seed: int = 0) -> list:
+    """
+    Comparer l'index IVF-PQ à la recherche exacte (memory_vectors) dans une base
+    temporaire. Les vecteurs synthétiques sont regroupés par "sujets" dans un
+    sous-espace de faible dimension, comme des embeddings de texte (des
+    gaussiennes isotropes seraient un pire cas sans structure).
+    Retourne rappel@k et latence moyenne par valeur de nprobe.
+    """
+    import tempfile
+    from pathlib import Path
+    import memory_vectors
+
+    rng = np.random.default_rng(seed)
+    projection = rng.standard_normal((latent, dim)).astype(np.float32)
+    topics = rng.standard_normal((max(1, n // 500), latent)).astype(np.float32)
+
+    def sample(count):
+        z = topics[rng.integers(0, len(topics), count)] + 0.7 * rng.standard_normal((count, latent)).astype(np.float32)
+        return z @ projection + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+
+    original_path = memory.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        memory.DB_PATH = Path(tmp) / "memory.db"
+        try:
+            memory.init_database()
+            conn = memory.get_connection()
+            for start in range(0, n, BATCH_SIZE):
+                vectors = sample(min(BATCH_SIZE, n - start))
+                conn.executemany("INSERT INTO embeddings (document_id, chunk_index, embedding, dim) VALUES (0, ?, ?, ?)",
+                                 [(start + i, v.tobytes(), dim) for i, v in enumerate(vectors)])
+            conn.executemany("INSERT INTO documents (id, name, content) VALUES (0, 'benchmark', '')", [()])
+            conn.commit()
+            conn.close()
+
+            build = build_ann_index()
+            queries_vectors = sample(queries)
+            exact_index = memory_vectors.VectorIndex(memory.DB_PATH)
+            exact_index.refresh()
+
+            started = time.perf_counter()
+            truth = [{r["embedding_id"] for r in exact_index.search(q, k=k)} for q in queries_vectors]
+            exact_ms = (time.perf_counter() - started) / queries * 1000
+
+            index = get_ann_index()
+            report = [{"method": "exact", "recall": 1.0, "ms": round(exact_ms, 3)}]
+            for nprobe in (1, 4, 16, 64):
+                for rerank in (False, True):
+                    started = time.perf_counter()
+                    found = [{r["embedding_id"] for r in index.search(q, k=k, nprobe=nprobe, rerank=rerank)}
+                             for q in queries_vectors]
+                    ms = (time.perf_counter() - started) / queries * 1000
+                    recall = float(np.mean([len(f & t) / k for f, t in zip(found, truth)]))
+                    report.append({"method": f"ivfpq nprobe={nprobe}{' +rerank' if rerank else ''}",
+                                   "recall": round(recall, 3), "ms": round(ms, 3)})
+            report.append({"method": "build", "seconds": build["seconds"], "nlist": build["nlist"], "m": build["m"]})
+        finally:
+            memory.close_all_connections()
+            _reset_ann_index()
+            memory.DB_PATH = original_path
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index vectoriel approximatif (IVF-PQ) de memory.db")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Construire l'index à partir de la table embeddings")
+    build.add_argument("--nlist", type=int, default=None, help="Nombre de listes IVF (défaut: √n)")
+    build.add_argument("--m", type=int, default=None, help="Octets par vecteur (sous-espaces PQ)")
+
+    sub.add_parser("save", help="Fusionner les nouveaux vecteurs dans le fichier d'index")
+
+    bench = sub.add_parser("benchmark", help="Rappel et latence comparés à la recherche exacte")
+    bench.add_argument("--n", type=int, default=100000)
+    bench.add_argument("--dim", type=int, default=384)
+    bench.add_argument("--queries", type=int, default=200)
+    bench.add_argument("--k", type=int, default=10)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        result = build_ann_index(nlist=args.nlist, m=args.m)
+    elif args.command == "save":
+        index = get_ann_index()
+        if index is None:
+            result = {"success": False, "error": "Index absent, lancer d'abord: build"}
+        else:
+            index.refresh()
+            result = index.save()
+    else:
+        result = benchmark(n=args.n, dim=args.dim, queries=args.queries, k=args.k)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Yevedia AI Chat - Sauvegarde de la Mémoire
+Sauvegarde à chaud de memory.db (sqlite3 Connection.backup), pendant que les
+serveurs écrivent: copie page par page, instantané compressé (gzip) avec son
+empreinte SHA-256 et vérification d'intégrité, restauration vers un nouveau chemin.
+
+    python memory_backup.py backup [dossier]         # --full: integrity_check complet
+    python memory_backup.py verify backups/memory-20260101-120000.db.gz
+    python memory_backup.py restore backups/memory-20260101-120000.db.gz /chemin/memory.db
+    python memory_backup.py list
+"""
+
+import gzip
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import memory
+
+# Pages copiées par étape de backup (4 Mo avec des pages de 4 Ko)
+BACKUP_STEP_PAGES = 1024
+
+# Pause entre deux étapes, pour laisser la main aux écrivains (secondes)
+BACKUP_SLEEP = 0.005
+
+# Niveau de compression gzip (1 = rapide, 9 = compact)
+COMPRESS_LEVEL = 1
+
+# Taille des blocs lus pour la compression et l'empreinte
+READ_SIZE = 1024 * 1024
+
+# Vérifications d'intégrité possibles
+CHECKS = {"quick": "PRAGMA quick_check", "full": "PRAGMA integrity_check"}
+
+
+def get_backup_dir() -> Path:
+    """Dossier des sauvegardes par défaut, à côté de memory.db"""
+    return memory.DB_PATH.parent / "backups"
+
+
+def _manifest_path(path: Path) -> Path:
+    name = path.name
+    for suffix in (".gz", ".db"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return path.with_name(f"{name}.json")
+
+
+def _check_integrity(conn, check: str) -> str:
+    if check is None:
+        return "skipped"
+    rows = conn.execute(CHECKS[check]).fetchall()
+    return "ok" if [tuple(row) for row in rows] == [("ok",)] else "; ".join(str(row[0]) for row in rows[:10])
+
+
+def _copy_hashed(reader, writer=None) -> tuple:
+    """Copier un flux dans un autre (writer None: lire seulement); retourne (octets, sha256 hexadécimal)"""
+    digest = hashlib.sha256()
+    total = 0
+    while True:
+        block = reader.read(READ_SIZE)
+        if not block:
+            break
+        digest.update(block)
+        if writer is not None:
+            writer.write(block)
+        total += len(block)
+    return total, digest.hexdigest()
+
+
+def _throughput(size: int, seconds: float) -> float:
+    return round(size / 1e6 / seconds, 1) if seconds > 0 else None
+
+
+def backup_database(dest_dir=None, pages_per_step: int = BACKUP_STEP_PAGES, sleep: float = BACKUP_SLEEP,
+                    compress: bool = True, check: str = "quick") -> dict:
+    """
+    Sauvegarder memory.db sans interrompre les écritures.
+
+    La copie se fait par étapes de pages_per_step pages, avec une pause de
+    sleep secondes entre deux étapes. Elle lit un instantané fixe (transaction
+    de lecture tenue jusqu'à la fin): en mode WAL, les écritures continuent
+    et n'obligent pas la copie à recommencer. La copie est vérifiée (check:
+    "quick", "full" ou None) avant d'être compressée, puis un manifeste JSON
+    (empreinte SHA-256 du contenu décompressé, tailles, version du schéma,
+    débits) est écrit à côté.
+    """
+    if check is not None and check not in CHECKS:
+        return {"success": False, "error": f"Vérification inconnue: {check}"}
+    dest_dir = Path(dest_dir) if dest_dir else get_backup_dir()
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    name = f"{memory.DB_PATH.stem}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+    copy_path = dest_dir / f"{name}.db.partial"
+    final_path = dest_dir / (f"{name}.db.gz" if compress else f"{name}.db")
+    timings = {}
+    steps = []
+
+    start = time.perf_counter()
+    source = memory.get_connection(readonly=True)
+    target = sqlite3.connect(copy_path)
+    try:
+        # Instantané tenu pendant toute la copie (sinon, en WAL, chaque écriture
+        # d'une autre connexion fait repartir la copie de zéro)
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        source.backup(target, pages=pages_per_step, sleep=sleep,
+                      progress=lambda status, remaining, total: steps.append(total))
+        source.rollback()
+        timings["copy"] = time.perf_counter() - start
+
+        # L'instantané est un fichier autonome (pas de -wal à côté)
+        target.execute("PRAGMA journal_mode = DELETE")
+        page_size = target.execute("PRAGMA page_size").fetchone()[0]
+        page_count = target.execute("PRAGMA page_count").fetchone()[0]
+        schema_version = target.execute("PRAGMA user_version").fetchone()[0]
+
+        started = time.perf_counter()
+        integrity = _check_integrity(target, check)
+        timings["check"] = time.perf_counter() - started
+    except sqlite3.Error as e:
+        target.close()
+        copy_path.unlink(missing_ok=True)
+        return {"success": False, "error": str(e)}
+    finally:
+        source.close()
+    target.close()
+
+    if integrity not in ("ok", "skipped"):
+        copy_path.unlink(missing_ok=True)
+        return {"success": False, "error": f"Copie corrompue: {integrity}"}
+
+    started = time.perf_counter()
+    if compress:
+        partial_path = final_path.with_name(final_path.name + ".partial")
+        with open(copy_path, "rb") as reader, \
+                gzip.open(partial_path, "wb", compresslevel=COMPRESS_LEVEL) as writer:
+            size, sha256 = _copy_hashed(reader, writer)
+        copy_path.unlink()
+        partial_path.replace(final_path)
+    else:
+        # La copie est déjà le fichier final (même nom en .partial): empreinte seule
+        with open(copy_path, "rb") as reader:
+            size, sha256 = _copy_hashed(reader)
+        copy_path.replace(final_path)
+    timings["compress"] = time.perf_counter() - started
+    total_seconds = time.perf_counter() - start
+
+    manifest = {
+        "file": final_path.name,
+        "source": str(memory.DB_PATH),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "sha256": sha256,
+        "bytes": size,
+        "stored_bytes": final_path.stat().st_size,
+        "compression": "gzip" if compress else None,
+        "page_size": page_size,
+        "page_count": page_count,
+        "schema_version": schema_version,
+        "integrity": integrity,
+        "steps": len(steps),
+        "seconds": {phase: round(value, 3) for phase, value in timings.items()},
+        "mb_per_second": {
+            "copy": _throughput(size, timings["copy"]),
+            "total": _throughput(size, total_seconds),
+        },
+    }
+    _manifest_path(final_path).write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    return {"success": True, "path": str(final_path), **manifest}
+
+
+def _open_snapshot(path: Path):
+    return gzip.open(path, "rb") if path.name.endswith(".gz") else open(path, "rb")
+
+
+def _read_manifest(path: Path):
+    manifest_path = _manifest_path(path)
+    if not manifest_path.exists():
+        return None
+    return json.loads(manifest_path.read_text(encoding="utf-8"))
+
+
+def verify_backup(path) -> dict:
+    """Recalculer l'empreinte d'une sauvegarde et la comparer à son manifeste"""
+    path = Path(path)
+    if not path.exists():
+        return {"success": False, "error": "Sauvegarde introuvable"}
+    manifest = _read_manifest(path)
+
+    started = time.perf_counter()
+    try:
+        with _open_snapshot(path) as reader:
+            digest = hashlib.sha256()
+            size = 0
+            for block in iter(lambda: reader.read(READ_SIZE), b""):
+                digest.update(block)
+                size += len(block)
+    except (OSError, EOFError) as e:
+        return {"success": False, "error": f"Archive illisible: {e}"}
+    seconds = time.perf_counter() - started
+
+    sha256 = digest.hexdigest()
+    matches = None if manifest is None else (sha256 == manifest["sha256"] and size == manifest["bytes"])
+    return {"success": matches is not False, "sha256": sha256, "bytes": size, "matches_manifest": matches,
+            "mb_per_second": _throughput(size, seconds)}
+
+
+def restore_backup(path, dest, check: str = "quick", overwrite: bool = False) -> dict:
+    """
+    Restaurer une sauvegarde dans un nouveau fichier.
+
+    Le contenu est décompressé à côté de dest, son empreinte est comparée au
+    manifeste et son intégrité vérifiée avant qu'il ne prenne la place de
+    dest. Le memory.db en service n'est jamais écrasé: arrêter les serveurs
+    puis déplacer le fichier restauré.
+    """
+    path = Path(path)
+    dest = Path(dest)
+    if check is not None and check not in CHECKS:
+        return {"success": False, "error": f"Vérification inconnue: {check}"}
+    if not path.exists():
+        return {"success": False, "error": "Sauvegarde introuvable"}
+    if dest.resolve() == memory.DB_PATH.resolve():
+        return {"success": False, "error": "Refus d'écraser la base en service"}
+    if dest.exists() and not overwrite:
+        return {"success": False, "error": f"{dest} existe déjà"}
+
+    manifest = _read_manifest(path)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = dest.with_name(dest.name + ".partial")
+
+    started = time.perf_counter()
+    try:
+        with _open_snapshot(path) as reader, open(partial_path, "wb") as writer:
+            size, sha256 = _copy_hashed(reader, writer)
+    except (OSError, EOFError) as e:
+        partial_path.unlink(missing_ok=True)
+        return {"success": False, "error": f"Archive illisible: {e}"}
+
+    if manifest is not None and sha256 != manifest["sha256"]:
+        partial_path.unlink()
+        return {"success": False, "error": "Empreinte SHA-256 différente de celle du manifeste"}
+
+    conn = sqlite3.connect(partial_path)
+    try:
+        integrity = _check_integrity(conn, check)
+        schema_version = conn.execute("PRAGMA user_version").fetchone()[0]
+    except sqlite3.DatabaseError as e:
+        integrity = str(e)
+    finally:
+        conn.close()
+    if integrity not in ("ok", "skipped"):
+        partial_path.unlink()
+        return {"success": False, "error": f"Sauvegarde corrompue: {integrity}"}
+
+    for suffix in ("-wal", "-shm"):
+        Path(f"{dest}{suffix}").unlink(missing_ok=True)
+    partial_path.replace(dest)
+    seconds = time.perf_counter() - started
+
+    return {"success": True, "path": str(dest), "bytes": size, "sha256": sha256,
+            "schema_version": schema_version, "integrity": integrity,
+            "seconds": round(seconds, 3), "mb_per_second": _throughput(size, seconds)}
+
+
+def list_backups(dest_dir=None) -> list:
+    """Manifestes des sauvegardes d'un dossier, de la plus récente à la plus ancienne"""
+    dest_dir = Path(dest_dir) if dest_dir else get_backup_dir()
+    if not dest_dir.exists():
+        return []
+    manifests = []
+    for manifest_path in dest_dir.glob("*.json"):
+        try:
+            manifests.append(json.loads(manifest_path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    return sorted(manifests, key=lambda manifest: manifest.get("created_at", ""), reverse=True)
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    command = args[0] if args else "backup"
+
+    if command == "backup":
+        result = backup_database(args[1] if len(args) > 1 else None,
+                                 check="full" if "--full" in sys.argv else "quick")
+        if result["success"]:
+            print(f"✅ {result['path']}: {result['bytes'] / 1e6:.1f} Mo -> {result['stored_bytes'] / 1e6:.1f} Mo, "
+                  f"{result['mb_per_second']['total']} Mo/s, intégrité {result['integrity']}")
+        else:
+            print(f"❌ {result['error']}")
+    elif command == "verify" and len(args) > 1:
+        print(verify_backup(args[1]))
+    elif command == "restore" and len(args) > 2:
+        print(restore_backup(args[1], args[2], check="full" if "--full" in sys.argv else "quick"))
+    elif command == "list":
+        for manifest in list_backups(args[1] if len(args) > 1 else None):
+            print(f"{manifest['created_at']}  {manifest['file']}  {manifest['bytes'] / 1e6:.1f} Mo  "
+                  f"schéma v{manifest['schema_version']}")
+    else:
+        print(__doc__)
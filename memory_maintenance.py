@@ -0,0 +1,408 @@
+"""
+Yevedia AI Chat - Maintenance de la Mémoire
+Archivage des souvenirs et documents désactivés depuis longtemps dans une base
+attachée (memory_archive.db), restauration, vacuum incrémental et PRAGMA optimize.
+
+Chaque étape travaille par petits lots bornés dans le temps: le job peut
+tourner pendant que le serveur mémoire répond aux requêtes. Avec la file
+d'écriture (memory.enable_write_queue), chaque étape passe seule dans le
+thread écrivain, entre deux lots (ATTACH et VACUUM ne peuvent pas s'exécuter
+dans une transaction).
+
+    python memory_maintenance.py run                 # une tranche de maintenance
+    python memory_maintenance.py archive 30          # archiver (désactivés depuis 30 jours)
+    python memory_maintenance.py restore memories 12 15
+    python memory_maintenance.py enable-incremental-vacuum
+    python memory_maintenance.py stats
+"""
+
+import sqlite3
+import sys
+import threading
+import time
+
+import memory
+
+# Ancienneté minimale de la désactivation avant archivage (jours)
+ARCHIVE_AFTER_DAYS = 30
+
+# Lignes déplacées par transaction (les documents portent leur contenu complet)
+ARCHIVE_BATCH_SIZE = 50
+
+# Durée d'une tranche de maintenance (secondes)
+TIME_SLICE = 0.2
+
+# Pages libérées par pas de vacuum incrémental
+VACUUM_STEP_PAGES = 256
+
+# Lignes examinées par index pour ANALYZE (PRAGMA analysis_limit)
+OPTIMIZE_ANALYSIS_LIMIT = 400
+
+# Intervalle entre deux tranches du job périodique (secondes)
+MAINTENANCE_INTERVAL = 600
+
+# Tables archivées -> colonne de embeddings qui les référence
+ARCHIVED_TABLES = {
+    "memories": "memory_id",
+    "documents": "document_id",
+}
+
+
+def get_archive_path():
+    """Chemin de la base d'archive, à côté de memory.db"""
+    return memory.DB_PATH.with_name(f"{memory.DB_PATH.stem}_archive.db")
+
+
+def _columns(cursor, schema: str, table: str) -> dict:
+    cursor.execute(f"PRAGMA {schema}.table_info({table})")
+    return {row[1]: row[2] for row in cursor.fetchall()}
+
+
+def _attach(conn):
+    """Attacher l'archive et aligner ses tables sur celles de la base principale"""
+    conn.execute("ATTACH DATABASE ? AS archive", (str(get_archive_path()),))
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA archive.journal_mode = WAL")
+
+    for table in list(ARCHIVED_TABLES) + ["embeddings"]:
+        main_columns = _columns(cursor, "main", table)
+        archive_columns = _columns(cursor, "archive", table)
+        if not archive_columns:
+            cursor.execute(f"CREATE TABLE archive.{table} AS SELECT * FROM main.{table} WHERE 0")
+            cursor.execute(f"CREATE UNIQUE INDEX archive.idx_{table}_id ON {table}(id)")
+            archive_columns = dict(main_columns)
+        # Colonnes ajoutées par des migrations postérieures à la création de l'archive
+        for column, decl in main_columns.items():
+            if column not in archive_columns:
+                cursor.execute(f"ALTER TABLE archive.{table} ADD COLUMN {column} {decl}")
+        if table in ARCHIVED_TABLES and "archived_at" not in archive_columns:
+            cursor.execute(f"ALTER TABLE archive.{table} ADD COLUMN archived_at TIMESTAMP")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_embeddings_memory ON embeddings(memory_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS archive.idx_embeddings_document ON embeddings(document_id)")
+    conn.commit()
+    return cursor
+
+
+def _detach(conn):
+    if conn.in_transaction:
+        conn.rollback()
+    if any(row[1] == "archive" for row in conn.execute("PRAGMA database_list").fetchall()):
+        conn.execute("DETACH DATABASE archive")
+
+
+def _placeholders(values) -> str:
+    return ", ".join("?" * len(values))
+
+
+# ============================================
+# ARCHIVAGE ET RESTAURATION
+# ============================================
+
+@memory.exclusive_write
+def archive_inactive(older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE,
+                     time_budget: float = None) -> dict:
+    """
+    Déplacer dans l'archive les souvenirs et documents désactivés depuis plus
+    de older_than_days jours, avec leurs vecteurs.
+
+    Une transaction par lot de batch_size lignes; avec time_budget (secondes),
+    s'arrête après le lot qui dépasse le budget ("done" vaut alors False).
+    Les morceaux et index plein texte des documents sont supprimés par les
+    triggers, et recalculés à la restauration.
+    """
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    archived = {table: 0 for table in ARCHIVED_TABLES}
+    done = True
+
+    conn = memory.get_connection()
+    try:
+        cursor = _attach(conn)
+        for table, reference in ARCHIVED_TABLES.items():
+            columns = ", ".join(_columns(cursor, "main", table))
+            embedding_columns = ", ".join(_columns(cursor, "main", "embeddings"))
+            while True:
+                if deadline is not None and time.monotonic() >= deadline:
+                    done = False
+                    break
+                cursor.execute(f"""
+                    SELECT id FROM main.{table}
+                    WHERE is_active = 0 AND deactivated_at <= datetime('now', ?)
+                    ORDER BY deactivated_at
+                    LIMIT ?
+                """, (f"-{older_than_days} days", batch_size))
+                ids = [row[0] for row in cursor.fetchall()]
+                if not ids:
+                    break
+                marks = _placeholders(ids)
+
+                # INSERT OR REPLACE: un lot rejoué après une interruption ne duplique rien
+                cursor.execute(f"""
+                    INSERT OR REPLACE INTO archive.{table} ({columns}, archived_at)
+                    SELECT {columns}, CURRENT_TIMESTAMP FROM main.{table} WHERE id IN ({marks})
+                """, ids)
+                cursor.execute(f"""
+                    INSERT OR REPLACE INTO archive.embeddings ({embedding_columns})
+                    SELECT {embedding_columns} FROM main.embeddings WHERE {reference} IN ({marks})
+                """, ids)
+                cursor.execute(f"DELETE FROM main.embeddings WHERE {reference} IN ({marks})", ids)
+                cursor.execute(f"DELETE FROM main.{table} WHERE id IN ({marks})", ids)
+                conn.commit()
+                archived[table] += len(ids)
+            if not done:
+                break
+    except sqlite3.Error as e:
+        return {"success": False, "error": str(e), "archived": archived}
+    finally:
+        _detach(conn)
+        conn.close()
+
+    return {"success": True, "archived": archived, "done": done}
+
+
+@memory.exclusive_write
+def restore_archived(memory_ids: list = None, document_ids: list = None, reactivate: bool = True) -> dict:
+    """
+    Remettre des souvenirs et documents archivés dans la base principale.
+
+    Les lignes gardent leur id; les vecteurs reçoivent de nouveaux id (l'index
+    vectoriel ne charge que les id au-delà de son filigrane) et les documents
+    sont redécoupés. Avec reactivate=False, les lignes reviennent désactivées,
+    avec une nouvelle date de désactivation.
+    """
+    requested = {"memories": list(memory_ids or []), "documents": list(document_ids or [])}
+    restored = {table: 0 for table in ARCHIVED_TABLES}
+
+    conn = memory.get_connection()
+    try:
+        cursor = _attach(conn)
+        embedding_columns = ", ".join(c for c in _columns(cursor, "main", "embeddings") if c != "id")
+        for table, reference in ARCHIVED_TABLES.items():
+            ids = requested[table]
+            if not ids:
+                continue
+            marks = _placeholders(ids)
+            columns = ", ".join(_columns(cursor, "main", table))
+
+            cursor.execute(f"SELECT id FROM archive.{table} WHERE id IN ({marks})", ids)
+            found = [row[0] for row in cursor.fetchall()]
+            if not found:
+                continue
+            marks = _placeholders(found)
+
+            cursor.execute(f"""
+                INSERT OR IGNORE INTO main.{table} ({columns})
+                SELECT {columns} FROM archive.{table} WHERE id IN ({marks})
+            """, found)
+            cursor.execute(f"""
+                INSERT INTO main.embeddings ({embedding_columns})
+                SELECT {embedding_columns} FROM archive.embeddings
+                WHERE {reference} IN ({marks}) ORDER BY id
+            """, found)
+            if table == "memories" and reactivate:
+                # Les buckets LSH des quasi-doublons ont suivi la suppression
+                # (un souvenir désactivé n'en a pas)
+                for memory_id in found:
+                    cursor.execute("SELECT title, content FROM main.memories WHERE id = ?", (memory_id,))
+                    memory.index_memory_fingerprint(cursor, memory_id, memory.memory_tokens(*cursor.fetchone()))
+            if table == "documents":
+                for doc_id in found:
+                    cursor.execute("SELECT content FROM main.documents WHERE id = ?", (doc_id,))
+                    memory.store_document_chunks(cursor, doc_id, cursor.fetchone()[0], force=True)
+            if reactivate:
+                cursor.execute(f"UPDATE main.{table} SET is_active = 1 WHERE id IN ({marks})", found)
+            else:
+                cursor.execute(f"""
+                    UPDATE main.{table} SET deactivated_at = CURRENT_TIMESTAMP WHERE id IN ({marks})
+                """, found)
+
+            cursor.execute(f"DELETE FROM archive.embeddings WHERE {reference} IN ({marks})", found)
+            cursor.execute(f"DELETE FROM archive.{table} WHERE id IN ({marks})", found)
+            restored[table] = len(found)
+        conn.commit()
+    except sqlite3.Error as e:
+        return {"success": False, "error": str(e)}
+    finally:
+        _detach(conn)
+        conn.close()
+
+    return {"success": True, "restored": restored}
+
+
+@memory.exclusive_write
+def list_archived(table: str = "memories", limit: int = 50, cursor: int = None) -> dict:
+    """
+    Lister les lignes archivées (sans le contenu des documents), des plus
+    récemment archivées aux plus anciennes; cursor = next_cursor de la page précédente.
+    """
+    if table not in ARCHIVED_TABLES:
+        return {"success": False, "error": f"Table non archivée: {table}"}
+
+    columns = "id, title, category, priority, created_at, deactivated_at, archived_at" \
+        if table == "memories" else "id, name, type, size, created_at, deactivated_at, archived_at"
+    condition = "" if cursor is None else "WHERE id < ?"
+    params = [] if cursor is None else [cursor]
+
+    conn = memory.get_connection()
+    try:
+        db_cursor = _attach(conn)
+        db_cursor.execute(f"""
+            SELECT {columns} FROM archive.{table} {condition}
+            ORDER BY id DESC LIMIT ?
+        """, params + [limit + 1])
+        rows = [dict(row) for row in db_cursor.fetchall()]
+    finally:
+        _detach(conn)
+        conn.close()
+
+    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    return {"success": True, table: rows[:limit], "next_cursor": next_cursor}
+
+
+# ============================================
+# COMPACTAGE ET STATISTIQUES DE L'OPTIMISEUR
+# ============================================
+
+@memory.exclusive_write
+def enable_incremental_vacuum() -> dict:
+    """
+    Passer une base existante en auto_vacuum=INCREMENTAL.
+
+    Nécessite un VACUUM complet (réécriture du fichier, verrou d'écriture
+    pendant toute la durée): à lancer une fois, hors service. Les bases
+    neuves sont créées en mode incrémental (voir ConnectionPool._connect).
+    """
+    conn = memory.get_connection()
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return {"success": True, "changed": False}
+        start = time.perf_counter()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    finally:
+        conn.close()
+
+    return {"success": mode == 2, "changed": True, "seconds": round(time.perf_counter() - start, 3)}
+
+
+@memory.exclusive_write
+def incremental_vacuum(time_budget: float = TIME_SLICE, step_pages: int = VACUUM_STEP_PAGES) -> dict:
+    """Rendre les pages libres au système par pas de step_pages, pendant time_budget secondes"""
+    deadline = time.monotonic() + time_budget
+    freed = 0
+
+    conn = memory.get_connection()
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            return {"success": False, "error": "auto_vacuum n'est pas INCREMENTAL (voir enable_incremental_vacuum)"}
+        remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        while remaining and time.monotonic() < deadline:
+            # Le pragma libère une page par étape: fetchall() le mène à son terme
+            conn.execute(f"PRAGMA incremental_vacuum({step_pages})").fetchall()
+            left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if left == remaining:
+                break
+            freed += remaining - left
+            remaining = left
+    finally:
+        conn.close()
+
+    return {"success": True, "freed_pages": freed, "free_pages": remaining}
+
+
+@memory.exclusive_write
+def optimize(analysis_limit: int = OPTIMIZE_ANALYSIS_LIMIT) -> dict:
+    """PRAGMA optimize, avec un ANALYZE borné à analysis_limit lignes par index"""
+    start = time.perf_counter()
+    conn = memory.get_connection()
+    try:
+        conn.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+        conn.execute("PRAGMA optimize").fetchall()
+    finally:
+        conn.close()
+    return {"success": True, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def run_maintenance(time_budget: float = TIME_SLICE, older_than_days: int = ARCHIVE_AFTER_DAYS) -> dict:
+    """Une tranche de maintenance: archivage, puis vacuum incrémental, puis optimize"""
+    deadline = time.monotonic() + time_budget
+    archive = archive_inactive(older_than_days, time_budget=time_budget)
+    vacuum = incremental_vacuum(max(0.0, deadline - time.monotonic()))
+    return {"success": archive["success"], "archive": archive, "vacuum": vacuum, "optimize": optimize()}
+
+
+@memory.exclusive_write
+def get_archive_stats() -> dict:
+    """Lignes archivées, pages libres de la base principale et taille de l'archive"""
+    conn = memory.get_connection()
+    try:
+        cursor = _attach(conn)
+        counts = {}
+        for table in list(ARCHIVED_TABLES) + ["embeddings"]:
+            cursor.execute(f"SELECT COUNT(*) FROM archive.{table}")
+            counts[table] = cursor.fetchone()[0]
+        stats = {
+            "archived": counts,
+            "auto_vacuum": {0: "NONE", 1: "FULL", 2: "INCREMENTAL"}[cursor.execute("PRAGMA auto_vacuum").fetchone()[0]],
+            "free_pages": cursor.execute("PRAGMA freelist_count").fetchone()[0],
+            "page_count": cursor.execute("PRAGMA page_count").fetchone()[0],
+        }
+    finally:
+        _detach(conn)
+        conn.close()
+
+    archive_path = get_archive_path()
+    stats["archive_bytes"] = archive_path.stat().st_size if archive_path.exists() else 0
+    return stats
+
+
+_maintenance = {"thread": None, "stop": None}
+
+
+def start_maintenance(interval: float = MAINTENANCE_INTERVAL) -> dict:
+    """Lancer (une seule fois) une tranche de maintenance toutes les interval secondes"""
+    if _maintenance["thread"] is not None and _maintenance["thread"].is_alive():
+        return {"success": True, "started": False}
+
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                run_maintenance()
+            except sqlite3.Error as e:
+                print(f"⚠️ Maintenance de la mémoire: {e}", file=sys.stderr)
+
+    thread = threading.Thread(target=run, name="memory-maintenance", daemon=True)
+    _maintenance.update(thread=thread, stop=stop)
+    thread.start()
+    return {"success": True, "started": True}
+
+
+def stop_maintenance() -> dict:
+    """Arrêter la maintenance périodique"""
+    if _maintenance["stop"] is not None:
+        _maintenance["stop"].set()
+    _maintenance.update(thread=None, stop=None)
+    return {"success": True}
+
+
+if __name__ == "__main__":
+    memory.init_database()
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+
+    if command == "run":
+        print(run_maintenance())
+    elif command == "archive":
+        print(archive_inactive(int(sys.argv[2]) if len(sys.argv) > 2 else ARCHIVE_AFTER_DAYS))
+    elif command == "restore" and len(sys.argv) > 3:
+        ids = [int(value) for value in sys.argv[3:]]
+        print(restore_archived(**{"memory_ids" if sys.argv[2] == "memories" else "document_ids": ids}))
+    elif command == "vacuum":
+        print(incremental_vacuum(time_budget=float("inf")))
+    elif command == "enable-incremental-vacuum":
+        print(enable_incremental_vacuum())
+    elif command == "optimize":
+        print(optimize())
+    else:
+        print(get_archive_stats())
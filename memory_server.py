@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Yevedia - Serveur de Mémoire Persistant
+Processus long qui expose les fonctions de memory.py en JSON-RPC sur HTTP (port 8084),
+pour éviter de relancer un interpréteur Python à chaque appel mémoire.
+"""
+
+import json
+import sys
+import inspect
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import memory
+import memory_maintenance
+
+HOST = '127.0.0.1'
+PORT = 8084
+
+# Recherche web du serveur Node, utilisée pour rafraîchir le cache en arrière-plan
+NODE_SEARCH_URL = 'http://127.0.0.1:8080/api/search'
+FETCH_TIMEOUT = 30
+
+# Codes d'erreur JSON-RPC 2.0
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+# Fonctions de memory.py appelables par server.js (callMemory). Les autres
+# (connexions, file d'écriture, fonctions qui prennent un curseur...) restent internes.
+EXPOSED_METHODS = (
+    # Souvenirs
+    "get_all_memories", "add_memory", "delete_memory", "clear_all_memories",
+    "build_memory_context", "build_relevant_memory_context", "get_memory_stats",
+    # Conversations
+    "list_conversations", "get_recent_messages",
+    # Documents
+    "get_all_documents", "list_documents", "read_document_slice", "add_document",
+    "delete_document", "toggle_document",
+    "open_document_upload", "append_document_upload", "finalize_document_upload",
+    "abort_document_upload",
+    # Cache de recherche web
+    "get_cached_search", "cache_search_results",
+)
+
+
+def _public_methods() -> dict:
+    """Associer chaque méthode exposée à sa fonction dans memory.py"""
+    return {name: getattr(memory, name) for name in EXPOSED_METHODS}
+
+
+METHODS = _public_methods()
+
+
+def _error(request_id, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+def dispatch(request) -> dict:
+    """Exécuter un appel JSON-RPC et retourner la réponse"""
+    if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+        return _error(None, INVALID_REQUEST, "Requête invalide")
+
+    request_id = request.get('id')
+    func = METHODS.get(request['method'])
+    if func is None:
+        return _error(request_id, METHOD_NOT_FOUND, f"Méthode inconnue: {request['method']}")
+
+    params = request.get('params', [])
+    try:
+        if isinstance(params, dict):
+            bound = inspect.signature(func).bind(**params)
+        elif isinstance(params, list):
+            bound = inspect.signature(func).bind(*params)
+        else:
+            return _error(request_id, INVALID_PARAMS, "params doit être une liste ou un objet")
+    except TypeError as e:
+        return _error(request_id, INVALID_PARAMS, str(e))
+
+    try:
+        result = func(*bound.args, **bound.kwargs)
+    except Exception as e:
+        print(f"❌ [memory] {request['method']}: {e}", file=sys.stderr)
+        return _error(request_id, INTERNAL_ERROR, str(e))
+
+    return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+
+def handle_payload(payload):
+    """Traiter une requête simple ou un lot (liste) de requêtes"""
+    if isinstance(payload, list):
+        if not payload:
+            return _error(None, INVALID_REQUEST, "Lot vide")
+        return [dispatch(item) for item in payload]
+    return dispatch(payload)
+
+
+class MemoryHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        # Chaque message de chat passe par ici, pas de logs par requête
+        pass
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json({"status": "ok", "db": str(memory.DB_PATH), "methods": len(METHODS)})
+        else:
+            self.send_json({"error": "Not found"}, 404)
+
+    def do_POST(self):
+        if self.path != '/rpc':
+            self.send_json({"error": "Not found"}, 404)
+            return
+
+        content_length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(content_length).decode('utf-8')
+
+        try:
+            payload = json.loads(body) if body else None
+        except json.JSONDecodeError:
+            self.send_json(_error(None, PARSE_ERROR, "JSON invalide"))
+            return
+
+        self.send_json(handle_payload(payload))
+
+
+def node_search_fetcher(query: str):
+    """Refaire une recherche via le serveur Node, qui met lui-même le résultat en cache"""
+    body = json.dumps({"query": query, "refresh": True}).encode('utf-8')
+    request = urllib.request.Request(NODE_SEARCH_URL, data=body,
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+        result = json.loads(response.read().decode('utf-8'))
+    if not result.get('success', True):
+        raise RuntimeError(result.get('error', 'recherche échouée'))
+    return None
+
+
+def run_once():
+    """Mode ponctuel: lire une requête JSON-RPC sur stdin et écrire la réponse sur stdout"""
+    try:
+        payload = json.loads(sys.stdin.read() or 'null')
+    except json.JSONDecodeError:
+        response = _error(None, PARSE_ERROR, "JSON invalide")
+    else:
+        memory.init_database()
+        response = handle_payload(payload)
+    print(json.dumps(response, ensure_ascii=False, default=str))
+
+
+def main():
+    if "--once" in sys.argv:
+        run_once()
+        return
+
+    # Le schéma n'est initialisé qu'une seule fois, au démarrage du processus
+    memory.init_database()
+    # Les requêtes HTTP sont servies par plusieurs threads: un seul écrivain
+    memory.enable_write_queue()
+    memory.start_search_cache_sweeper()
+    # Archivage des lignes désactivées et compactage, par tranches courtes
+    memory_maintenance.start_maintenance()
+    memory.set_search_fetcher(node_search_fetcher)
+
+    server = ThreadingHTTPServer((HOST, PORT), MemoryHandler)
+    server.daemon_threads = True
+    print(f"✅ Memory Server ready at http://{HOST}:{PORT} ({len(METHODS)} méthodes)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⛔ Memory Server stopped")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
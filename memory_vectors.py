@@ -0,0 +1,338 @@
+"""
+Yevedia AI Chat - Stockage Vectoriel
+Vecteurs float32 des souvenirs et des morceaux de documents (table embeddings),
+recherche top-k par similarité cosinus sur une matrice NumPy gardée en mémoire.
+"""
+
+import threading
+
+import numpy as np
+
+import memory
+
+# Taille initiale de la matrice (doublée quand elle est pleine)
+INITIAL_CAPACITY = 1024
+
+# Part de lignes supprimées au-delà de laquelle la matrice est reconstruite
+MAX_DELETED_RATIO = 0.25
+
+
+def _to_vector(vector) -> np.ndarray:
+    """Convertir une liste ou un tableau en vecteur float32 1-D"""
+    vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+    if vec.size == 0:
+        raise ValueError("Vecteur vide")
+    return vec
+
+
+def _dim_error(cursor, dim: int, column: str, owner_id: int):
+    """Message d'erreur si dim diffère de celle des vecteurs déjà stockés (hors ceux remplacés)"""
+    cursor.execute(f"SELECT dim FROM embeddings WHERE {column} IS NOT ? LIMIT 1", (owner_id,))
+    row = cursor.fetchone()
+    if row is not None and row[0] != dim:
+        return f"Dimension {dim} différente des vecteurs existants ({row[0]})"
+    return None
+
+
+@memory.queued_write
+def add_memory_embedding(memory_id: int, vector) -> dict:
+    """Enregistrer le vecteur d'un souvenir (remplace le vecteur précédent)"""
+    vec = _to_vector(vector)
+    conn = memory.get_connection()
+    cursor = conn.cursor()
+
+    error = _dim_error(cursor, vec.size, "memory_id", memory_id)
+    if error:
+        conn.close()
+        return {"success": False, "error": error}
+
+    cursor.execute("DELETE FROM embeddings WHERE memory_id = ?", (memory_id,))
+    cursor.execute("""
+        INSERT INTO embeddings (memory_id, embedding, dim)
+        VALUES (?, ?, ?)
+    """, (memory_id, vec.tobytes(), vec.size))
+
+    embedding_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+
+    return {"id": embedding_id, "memory_id": memory_id, "dim": int(vec.size), "success": True}
+
+
+@memory.queued_write
+def add_chunk_embeddings(document_id: int, vectors) -> dict:
+    """Enregistrer les vecteurs des morceaux d'un document (index = position dans la liste)"""
+    rows = []
+    for chunk_index, vector in enumerate(vectors):
+        vec = _to_vector(vector)
+        rows.append((document_id, chunk_index, vec.tobytes(), vec.size))
+    if len({row[3] for row in rows}) > 1:
+        return {"success": False, "error": "Vecteurs de dimensions différentes"}
+
+    conn = memory.get_connection()
+    cursor = conn.cursor()
+
+    error = _dim_error(cursor, rows[0][3], "document_id", document_id) if rows else None
+    if error:
+        conn.close()
+        return {"success": False, "error": error}
+
+    cursor.execute("DELETE FROM embeddings WHERE document_id = ?", (document_id,))
+    cursor.executemany("""
+        INSERT INTO embeddings (document_id, chunk_index, embedding, dim)
+        VALUES (?, ?, ?, ?)
+    """, rows)
+
+    conn.commit()
+    conn.close()
+
+    return {"document_id": document_id, "chunks": len(rows), "success": True}
+
+
+@memory.queued_write
+def delete_embeddings(memory_id: int = None, document_id: int = None) -> dict:
+    """Supprimer les vecteurs d'un souvenir ou d'un document"""
+    conn = memory.get_connection()
+    cursor = conn.cursor()
+
+    if memory_id is not None:
+        cursor.execute("DELETE FROM embeddings WHERE memory_id = ?", (memory_id,))
+    if document_id is not None:
+        cursor.execute("DELETE FROM embeddings WHERE document_id = ?", (document_id,))
+
+    deleted = cursor.rowcount
+    conn.commit()
+    conn.close()
+
+    return {"deleted": deleted, "success": True}
+
+
+class VectorIndex:
+    """
+    Matrice contiguë des vecteurs normalisés de la table embeddings.
+
+    Les nouvelles lignes sont chargées de façon incrémentale (rowid > filigrane).
+    Les métadonnées de filtrage (catégorie, actif) sont rechargées seulement quand
+    data_versions indique une écriture sur memories ou documents. Les vecteurs
+    supprimés de la table sont masqués, et la matrice n'est reconstruite que
+    lorsqu'ils dépassent MAX_DELETED_RATIO des lignes.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.dim = None
+        self.size = 0
+        self.watermark = 0
+        self.matrix = None
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.memory_ids = np.zeros(0, dtype=np.int64)
+        self.document_ids = np.zeros(0, dtype=np.int64)
+        self.chunk_indexes = np.zeros(0, dtype=np.int64)
+        self.categories = np.zeros(0, dtype=np.int32)
+        self.active = np.zeros(0, dtype=bool)
+        self.deleted = np.zeros(0, dtype=bool)
+        self.deleted_count = 0
+        self.category_codes = {}
+        self.versions = {}
+
+    def _grow(self, needed: int):
+        capacity = 0 if self.matrix is None else self.matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(INITIAL_CAPACITY, capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+
+        matrix = np.zeros((new_capacity, self.dim), dtype=np.float32)
+        arrays = {}
+        for name, dtype in (("ids", np.int64), ("memory_ids", np.int64), ("document_ids", np.int64),
+                            ("chunk_indexes", np.int64), ("categories", np.int32), ("active", bool),
+                            ("deleted", bool)):
+            arr = np.zeros(new_capacity, dtype=dtype)
+            arr[:self.size] = getattr(self, name)[:self.size]
+            arrays[name] = arr
+        if self.matrix is not None:
+            matrix[:self.size] = self.matrix[:self.size]
+
+        self.matrix = matrix
+        for name, arr in arrays.items():
+            setattr(self, name, arr)
+
+    def _category_code(self, category) -> int:
+        if category is None:
+            return -1
+        return self.category_codes.setdefault(category, len(self.category_codes))
+
+    def _load_rows(self, cursor, after_id: int):
+        cursor.execute("""
+            SELECT e.id, e.memory_id, e.document_id, e.chunk_index, e.embedding,
+                   m.category,
+                   COALESCE(m.is_active, d.is_active, 0) AS active
+            FROM embeddings e
+            LEFT JOIN memories m ON m.id = e.memory_id
+            LEFT JOIN documents d ON d.id = e.document_id
+            WHERE e.id > ?
+            ORDER BY e.id
+        """, (after_id,))
+        rows = cursor.fetchall()
+        if not rows:
+            return
+
+        watermark = int(rows[-1]["id"])
+        if self.dim is None:
+            self.dim = len(rows[0]["embedding"]) // 4
+        # Lignes d'une autre dimension (antérieures à la vérification à l'insertion):
+        # ignorées plutôt que de bloquer chaque rafraîchissement
+        rows = [row for row in rows if len(row["embedding"]) == self.dim * 4]
+        self.watermark = watermark
+        if not rows:
+            return
+        vectors = np.frombuffer(b"".join(row["embedding"] for row in rows), dtype=np.float32)
+        vectors = vectors.reshape(len(rows), self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+
+        start, end = self.size, self.size + len(rows)
+        self._grow(end)
+        self.matrix[start:end] = vectors / norms
+        self.ids[start:end] = [row["id"] for row in rows]
+        self.memory_ids[start:end] = [row["memory_id"] if row["memory_id"] is not None else -1 for row in rows]
+        self.document_ids[start:end] = [row["document_id"] if row["document_id"] is not None else -1 for row in rows]
+        self.chunk_indexes[start:end] = [row["chunk_index"] if row["chunk_index"] is not None else -1 for row in rows]
+        self.categories[start:end] = [self._category_code(row["category"]) for row in rows]
+        self.active[start:end] = [bool(row["active"]) for row in rows]
+        self.deleted[start:end] = False
+        self.size = end
+
+    def _reload_flags(self, cursor):
+        """Recharger catégorie et statut actif de toutes les lignes déjà chargées"""
+        cursor.execute("""
+            SELECT e.id, m.category, COALESCE(m.is_active, d.is_active, 0) AS active
+            FROM embeddings e
+            LEFT JOIN memories m ON m.id = e.memory_id
+            LEFT JOIN documents d ON d.id = e.document_id
+            WHERE e.id <= ?
+            ORDER BY e.id
+        """, (self.watermark,))
+        rows = cursor.fetchall()
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        categories = np.fromiter((self._category_code(row[1]) for row in rows), dtype=np.int32, count=len(rows))
+        active = np.fromiter((bool(row[2]) for row in rows), dtype=bool, count=len(rows))
+
+        # Les deux listes d'ids sont triées: alignement par recherche dichotomique
+        n = self.size
+        pos = np.minimum(np.searchsorted(ids, self.ids[:n]), max(len(ids) - 1, 0))
+        found = ids[pos] == self.ids[:n] if len(ids) else np.zeros(n, dtype=bool)
+        self.categories[:n] = np.where(found, categories[pos] if len(ids) else -1, -1)
+        self.active[:n] = found & (active[pos] if len(ids) else False)
+
+    def _mark_deleted(self, cursor):
+        """Masquer les lignes chargées qui n'existent plus dans la table"""
+        cursor.execute("SELECT id FROM embeddings WHERE id <= ?", (self.watermark,))
+        existing = np.fromiter((row[0] for row in cursor.fetchall()), dtype=np.int64)
+        self.deleted[:self.size] = ~np.isin(self.ids[:self.size], existing, assume_unique=True)
+        self.deleted_count = int(self.deleted[:self.size].sum())
+
+    def refresh(self):
+        """Synchroniser la matrice avec la base (coût nul si rien n'a changé)"""
+        with self._lock:
+            conn = memory.get_connection(readonly=True)
+            cursor = conn.cursor()
+            try:
+                versions = memory.get_data_versions(conn)
+                if self.size and versions.get("embeddings") != self.versions.get("embeddings"):
+                    self._mark_deleted(cursor)
+                    if self.deleted_count > self.size * MAX_DELETED_RATIO:
+                        self._reset()
+                if self.size and (versions.get("memories") != self.versions.get("memories")
+                                    or versions.get("documents") != self.versions.get("documents")):
+                    self._reload_flags(cursor)
+                self._load_rows(cursor, self.watermark)
+                self.versions = versions
+            finally:
+                conn.close()
+
+    def search(self, queries, k: int = 5, kind: str = None, category: str = None,
+               active_only: bool = True) -> list:
+        """
+        Rechercher les k vecteurs les plus proches (similarité cosinus).
+
+        Args:
+            queries: un vecteur (d,) ou un lot de vecteurs (b, d)
+            k: nombre de résultats par requête
+            kind: "memory", "chunk" ou None pour les deux
+            category: ne garder que les souvenirs de cette catégorie
+            active_only: ignorer les souvenirs et documents désactivés
+
+        Returns:
+            liste de résultats (ou liste de listes pour un lot)
+        """
+        self.refresh()
+        q = np.asarray(queries, dtype=np.float32)
+        single = q.ndim == 1
+        q = np.atleast_2d(q)
+
+        with self._lock:
+            n = self.size
+            if n == 0:
+                return [] if single else [[] for _ in range(len(q))]
+            if q.shape[1] != self.dim:
+                raise ValueError(f"Dimension {q.shape[1]} différente de l'index ({self.dim})")
+
+            norms = np.linalg.norm(q, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            scores = (q / norms) @ self.matrix[:n].T
+
+            mask = ~self.deleted[:n]
+            if active_only:
+                mask &= self.active[:n]
+            if kind == "memory":
+                mask &= self.memory_ids[:n] >= 0
+            elif kind == "chunk":
+                mask &= self.document_ids[:n] >= 0
+            if category is not None:
+                code = self.category_codes.get(category)
+                mask &= self.categories[:n] == (code if code is not None else -2)
+            if not mask.all():
+                scores[:, ~mask] = -np.inf
+
+            k = min(k, n)
+            results = []
+            for row in scores:
+                top = np.argpartition(-row, k - 1)[:k] if k < n else np.arange(n)
+                top = top[np.argsort(-row[top])]
+                results.append([self._result(i, row[i]) for i in top if np.isfinite(row[i])])
+
+        return results[0] if single else results
+
+    def _result(self, i: int, score: float) -> dict:
+        result = {"embedding_id": int(self.ids[i]), "score": float(score)}
+        if self.memory_ids[i] >= 0:
+            result["memory_id"] = int(self.memory_ids[i])
+        else:
+            result["document_id"] = int(self.document_ids[i])
+            result["chunk_index"] = int(self.chunk_indexes[i])
+        return result
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index() -> VectorIndex:
+    """Retourner l'index vectoriel associé à memory.DB_PATH (créé au premier appel)"""
+    global _index
+    with _index_lock:
+        if _index is None or _index.db_path != str(memory.DB_PATH):
+            _index = VectorIndex(memory.DB_PATH)
+        return _index
+
+
+def search_similar(vector, k: int = 5, kind: str = None, category: str = None,
+                   active_only: bool = True) -> list:
+    """Rechercher les souvenirs / morceaux de documents les plus proches d'un vecteur"""
+    return get_vector_index().search(vector, k=k, kind=kind, category=category, active_only=active_only)
@@ -203,10 +203,23 @@ const server = http.createServer(async (req, res) => {
         return handleGetMemoryContext(req, res);
     }
 
+    if (urlPath === '/api/memory/context' && req.method === 'POST') {
+        return handleGetRelevantMemoryContext(req, res);
+    }
+
     if (urlPath === '/api/memory/stats' && req.method === 'GET') {
         return handleGetMemoryStats(req, res);
     }
 
+    if (urlPath === '/api/conversations' && req.method === 'GET') {
+        return handleListConversations(req, res, new URLSearchParams(urlParts[1] || ''));
+    }
+
+    if (urlPath.match(/^\/api\/conversations\/\d+\/messages$/) && req.method === 'GET') {
+        const id = urlPath.split('/')[3];
+        return handleGetRecentMessages(req, res, id, new URLSearchParams(urlParts[1] || ''));
+    }
+
     // Documents API Endpoints
     if (urlPath === '/api/documents' && req.method === 'GET') {
         return handleGetDocuments(req, res);
@@ -216,6 +229,34 @@ const server = http.createServer(async (req, res) => {
         return handleAddDocument(req, res);
     }
 
+    if (urlPath === '/api/documents/list' && req.method === 'GET') {
+        return handleListDocuments(req, res, new URLSearchParams(urlParts[1] || ''));
+    }
+
+    if (urlPath.match(/^\/api\/documents\/\d+\/content$/) && req.method === 'GET') {
+        const id = urlPath.split('/')[3];
+        return handleReadDocumentContent(req, res, id, new URLSearchParams(urlParts[1] || ''));
+    }
+
+    if (urlPath === '/api/documents/uploads' && req.method === 'POST') {
+        return handleOpenDocumentUpload(req, res);
+    }
+
+    if (urlPath.match(/^\/api\/documents\/uploads\/\d+$/) && req.method === 'PUT') {
+        const id = urlPath.split('/')[4];
+        return handleAppendDocumentUpload(req, res, id);
+    }
+
+    if (urlPath.match(/^\/api\/documents\/uploads\/\d+\/finalize$/) && req.method === 'POST') {
+        const id = urlPath.split('/')[4];
+        return handleFinalizeDocumentUpload(req, res, id);
+    }
+
+    if (urlPath.match(/^\/api\/documents\/uploads\/\d+$/) && req.method === 'DELETE') {
+        const id = urlPath.split('/')[4];
+        return handleAbortDocumentUpload(req, res, id);
+    }
+
     if (urlPath.startsWith('/api/documents/') && req.method === 'DELETE') {
         const parts = urlPath.split('/');
         const id = parts[parts.length - 1];
@@ -1301,40 +1342,72 @@ function readBody(req) {
     });
 }
 
-// Exécuter un script Python pour la mémoire
-function executePythonMemory(command, args = []) {
-    return new Promise((resolve, reject) => {
-        const pythonScript = `
-import sys
-sys.path.insert(0, '${__dirname}')
-import memory
-import json
+// Appeler une fonction de memory.py via le serveur mémoire persistant (JSON-RPC)
+const MEMORY_SERVER_URL = 'http://127.0.0.1:8084/rpc';
+let memoryRpcId = 0;
 
-# Initialiser la DB
-memory.init_database()
+async function callMemory(method, params = []) {
+    const request = { jsonrpc: '2.0', id: ++memoryRpcId, method, params };
+    let data;
+    try {
+        const response = await fetch(MEMORY_SERVER_URL, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(request),
+            signal: AbortSignal.timeout(30000)
+        });
+        data = await response.json();
+    } catch (error) {
+        // Serveur mémoire indisponible: exécution ponctuelle
+        if (error.cause && error.cause.code === 'ECONNREFUSED') {
+            data = await executePythonMemory(request);
+        } else {
+            throw error;
+        }
+    }
+    if (data.error) {
+        throw new Error(data.error.message);
+    }
+    return data.result;
+}
 
-# Exécuter la commande
-result = ${command}
-print(json.dumps(result))
-`;
-        exec(`python3 -c "${pythonScript.replace(/"/g, '\\"')}"`, { cwd: __dirname }, (error, stdout, stderr) => {
-            if (error && !stdout) {
-                reject(new Error(stderr || error.message));
-            } else {
-                try {
-                    resolve(JSON.parse(stdout.trim()));
-                } catch (e) {
-                    resolve({ raw: stdout.trim() });
-                }
+// Repli: exécuter une requête JSON-RPC dans un processus Python ponctuel
+function executePythonMemory(request) {
+    return new Promise((resolve, reject) => {
+        const child = spawn('python3', [path.join(__dirname, 'memory_server.py'), '--once'], { cwd: __dirname });
+        let stdout = '';
+        let stderr = '';
+        child.stdout.on('data', chunk => stdout += chunk);
+        child.stderr.on('data', chunk => stderr += chunk);
+        child.on('error', reject);
+        child.on('close', () => {
+            try {
+                resolve(JSON.parse(stdout.trim()));
+            } catch (e) {
+                reject(new Error(stderr || stdout || 'Réponse mémoire invalide'));
             }
         });
+        child.stdin.end(JSON.stringify(request));
+    });
+}
+
+// Démarrer le serveur mémoire persistant (port 8084)
+let memoryProcess = null;
+
+function startMemoryServer() {
+    memoryProcess = spawn('python3', [path.join(__dirname, 'memory_server.py')], {
+        cwd: __dirname,
+        stdio: ['ignore', 'ignore', 'inherit']
+    });
+    memoryProcess.on('exit', () => {
+        memoryProcess = null;
     });
 }
 
 // GET /api/memory - Récupérer tous les souvenirs
 async function handleGetMemories(req, res) {
     try {
-        const memories = await executePythonMemory('memory.get_all_memories()');
+        const memories = await callMemory('get_all_memories');
         sendJSON(res, { success: true, memories });
     } catch (error) {
         console.error('Erreur get memories:', error);
@@ -1346,22 +1419,22 @@ async function handleGetMemories(req, res) {
 async function handleAddMemory(req, res) {
     try {
         const body = await readBody(req);
-        const { title, content, category, priority } = body;
+        const { title, content, category, priority, duplicates } = body;
 
         if (!title || !content) {
             sendJSON(res, { success: false, error: 'Titre et contenu requis' }, 400);
             return;
         }
 
-        // Encoder en Base64 pour éviter tous les problèmes d'échappement
-        const titleB64 = Buffer.from(title).toString('base64');
-        const contentB64 = Buffer.from(content).toString('base64');
+        // duplicates: "allow" (défaut côté Python), "reject" (409 si quasi-doublon) ou "merge"
+        const result = await callMemory('add_memory', [title, content, category || 'knowledge', priority || 1, duplicates || null]);
 
-        const result = await executePythonMemory(
-            `memory.add_memory_base64('${titleB64}', '${contentB64}', '${category || 'knowledge'}', ${priority || 1})`
-        );
+        if (result.success === false) {
+            sendJSON(res, { success: false, error: result.error, duplicate_of: result.duplicate_of }, result.duplicate_of ? 409 : 400);
+            return;
+        }
 
-        console.log('✅ Souvenir ajouté:', title);
+        console.log(result.merged ? '🔁 Souvenir fusionné:' : '✅ Souvenir ajouté:', title);
         sendJSON(res, { success: true, memory: result });
     } catch (error) {
         console.error('Erreur add memory:', error);
@@ -1372,7 +1445,7 @@ async function handleAddMemory(req, res) {
 // DELETE /api/memory/:id - Supprimer un souvenir
 async function handleDeleteMemory(req, res, id) {
     try {
-        const result = await executePythonMemory(`memory.delete_memory(${id})`);
+        const result = await callMemory('delete_memory', [Number(id)]);
         console.log('🗑️ Souvenir supprimé:', id);
         sendJSON(res, { success: true, result });
     } catch (error) {
@@ -1384,7 +1457,7 @@ async function handleDeleteMemory(req, res, id) {
 // POST /api/memory/clear - Effacer toute la mémoire
 async function handleClearMemories(req, res) {
     try {
-        const result = await executePythonMemory('memory.clear_all_memories()');
+        const result = await callMemory('clear_all_memories');
         console.log('🧹 Mémoire effacée');
         sendJSON(res, { success: true, result });
     } catch (error) {
@@ -1396,7 +1469,7 @@ async function handleClearMemories(req, res) {
 // GET /api/memory/context - Récupérer le contexte formaté
 async function handleGetMemoryContext(req, res) {
     try {
-        const context = await executePythonMemory('memory.build_memory_context()');
+        const context = await callMemory('build_memory_context');
         sendJSON(res, { success: true, context });
     } catch (error) {
         console.error('Erreur get context:', error);
@@ -1404,10 +1477,28 @@ async function handleGetMemoryContext(req, res) {
     }
 }
 
+// POST /api/memory/context - Contexte limité aux souvenirs pertinents pour un message
+async function handleGetRelevantMemoryContext(req, res) {
+    try {
+        const body = await readBody(req);
+        const { message, tokenBudget } = body;
+        const result = await callMemory('build_relevant_memory_context', [message || '', tokenBudget || 1500]);
+        sendJSON(res, {
+            success: true,
+            context: result.context,
+            selectedIds: result.selected_ids,
+            tokens: result.tokens
+        });
+    } catch (error) {
+        console.error('Erreur get relevant context:', error);
+        sendJSON(res, { success: false, error: error.message }, 500);
+    }
+}
+
 // GET /api/memory/stats - Statistiques de la mémoire
 async function handleGetMemoryStats(req, res) {
     try {
-        const stats = await executePythonMemory('memory.get_memory_stats()');
+        const stats = await callMemory('get_memory_stats');
         sendJSON(res, { success: true, stats });
     } catch (error) {
         console.error('Erreur get stats:', error);
@@ -1419,10 +1510,37 @@ async function handleGetMemoryStats(req, res) {
 // GESTION DES DOCUMENTS
 // ============================================
 
+// GET /api/conversations?limit=&cursor=&session= - Liste des conversations avec aperçu (paginée)
+async function handleListConversations(req, res, params) {
+    try {
+        const limit = Math.min(parseInt(params.get('limit'), 10) || 50, 500);
+        const cursor = params.get('cursor') || null;
+        const sessionId = params.get('session') || null;
+        const page = await callMemory('list_conversations', [limit, cursor, sessionId]);
+        sendJSON(res, { success: true, conversations: page.conversations, nextCursor: page.next_cursor });
+    } catch (error) {
+        console.error('Erreur list conversations:', error);
+        sendJSON(res, { success: false, error: error.message }, 500);
+    }
+}
+
+// GET /api/conversations/:id/messages?limit=&before= - Derniers messages (paginés vers le passé)
+async function handleGetRecentMessages(req, res, id, params) {
+    try {
+        const limit = Math.min(parseInt(params.get('limit'), 10) || 50, 500);
+        const before = params.get('before') || null;
+        const page = await callMemory('get_recent_messages', [Number(id), limit, before]);
+        sendJSON(res, { success: true, messages: page.messages, nextCursor: page.next_cursor });
+    } catch (error) {
+        console.error('Erreur get messages:', error);
+        sendJSON(res, { success: false, error: error.message }, 500);
+    }
+}
+
 // GET /api/documents - Récupérer tous les documents
 async function handleGetDocuments(req, res) {
     try {
-        const documents = await executePythonMemory('memory.get_all_documents()');
+        const documents = await callMemory('get_all_documents');
         sendJSON(res, { success: true, documents });
     } catch (error) {
         console.error('Erreur get documents:', error);
@@ -1430,19 +1548,40 @@ async function handleGetDocuments(req, res) {
     }
 }
 
+// GET /api/documents/list?limit=&cursor=&active=1 - Lister les documents sans leur contenu (paginé)
+async function handleListDocuments(req, res, params) {
+    try {
+        const limit = parseInt(params.get('limit'), 10) || 50;
+        const cursor = params.get('cursor') || null;
+        const activeOnly = params.get('active') === '1';
+        const page = await callMemory('list_documents', [limit, cursor, activeOnly]);
+        sendJSON(res, { success: true, documents: page.documents, nextCursor: page.next_cursor });
+    } catch (error) {
+        console.error('Erreur list documents:', error);
+        sendJSON(res, { success: false, error: error.message }, 500);
+    }
+}
+
+// GET /api/documents/:id/content?start=&length= - Lire une tranche du contenu (en octets)
+async function handleReadDocumentContent(req, res, id, params) {
+    try {
+        const start = parseInt(params.get('start'), 10) || 0;
+        const length = parseInt(params.get('length'), 10) || 65536;
+        const slice = await callMemory('read_document_slice', [Number(id), start, length]);
+        sendJSON(res, slice, slice.success ? 200 : 404);
+    } catch (error) {
+        console.error('Erreur read document content:', error);
+        sendJSON(res, { success: false, error: error.message }, 500);
+    }
+}
+
 // POST /api/documents - Ajouter un document
 async function handleAddDocument(req, res) {
     try {
         const body = await readBody(req);
         const { name, content, type, size } = body;
 
-        // Encoder le contenu en Base64 pour éviter les problèmes d'échappement shell
-        const base64Content = Buffer.from(content).toString('base64');
-        const safeName = name.replace(/['"\\]/g, '');
-
-        const result = await executePythonMemory(
-            `memory.add_document_base64('${safeName}', '${base64Content}', '${type}', ${size})`
-        );
+        const result = await callMemory('add_document', [name, content, type || 'text/plain', size || 0]);
         console.log('📄 Document ajouté:', name);
         sendJSON(res, { success: true, result });
     } catch (error) {
@@ -1451,10 +1590,73 @@ async function handleAddDocument(req, res) {
     }
 }
 
+// POST /api/documents/uploads - Commencer un import en plusieurs morceaux
+async function handleOpenDocumentUpload(req, res) {
+    try {
+        const { name, type, size } = await readBody(req);
+        const result = await callMemory('open_document_upload', [name, type || 'text/plain', size || 0]);
+        sendJSON(res, result);
+    } catch (error) {
+        console.error('Erreur open upload:', error);
+        sendJSON(res, { success: false, error: error.message }, 500);
+    }
+}
+
+// PUT /api/documents/uploads/:id - Envoyer le contenu brut (UTF-8), transmis morceau par morceau
+function handleAppendDocumentUpload(req, res, id) {
+    let pending = Promise.resolve({ success: true, upload_id: Number(id) });
+
+    const fail = (result) => {
+        if (res.writableEnded) return;
+        callMemory('abort_document_upload', [Number(id)]).catch(() => { });
+        sendJSON(res, result, 400);
+        req.destroy();
+    };
+
+    req.on('data', chunk => {
+        // Un seul morceau en vol: la lecture reprend quand Python l'a écrit
+        req.pause();
+        pending = callMemory('append_document_upload', [Number(id), chunk.toString('base64'), 'base64'])
+            .catch(error => ({ success: false, error: error.message }))
+            .then(result => {
+                if (result.success) req.resume();
+                else fail(result);
+                return result;
+            });
+    });
+    req.on('end', async () => {
+        const result = await pending;
+        if (result.success) sendJSON(res, result);
+    });
+}
+
+// POST /api/documents/uploads/:id/finalize - Terminer l'import et créer le document
+async function handleFinalizeDocumentUpload(req, res, id) {
+    try {
+        const result = await callMemory('finalize_document_upload', [Number(id)]);
+        if (result.success) console.log('📄 Document importé:', result.name, `(${result.chunks} morceaux)`);
+        sendJSON(res, result, result.success ? 200 : 400);
+    } catch (error) {
+        console.error('Erreur finalize upload:', error);
+        sendJSON(res, { success: false, error: error.message }, 500);
+    }
+}
+
+// DELETE /api/documents/uploads/:id - Abandonner un import
+async function handleAbortDocumentUpload(req, res, id) {
+    try {
+        const result = await callMemory('abort_document_upload', [Number(id)]);
+        sendJSON(res, result);
+    } catch (error) {
+        console.error('Erreur abort upload:', error);
+        sendJSON(res, { success: false, error: error.message }, 500);
+    }
+}
+
 // DELETE /api/documents/:id - Supprimer un document
 async function handleDeleteDocument(req, res, id) {
     try {
-        const result = await executePythonMemory(`memory.delete_document(${id})`);
+        const result = await callMemory('delete_document', [Number(id)]);
         console.log('🗑️ Document supprimé:', id);
         sendJSON(res, { success: true, result });
     } catch (error) {
@@ -1472,7 +1674,7 @@ async function handleToggleDocument(req, res, id) {
             const data = JSON.parse(body);
             const isActive = data.is_active ? 1 : 0;
 
-            const result = await executePythonMemory(`memory.toggle_document(${id}, ${isActive})`);
+            const result = await callMemory('toggle_document', [Number(id), isActive]);
             console.log('🔄 Document toggle:', id, '->', isActive ? 'actif' : 'inactif');
             sendJSON(res, { success: true, result });
         });
@@ -1489,8 +1691,8 @@ async function handleToggleDocument(req, res, id) {
 // GET /api/training/stats - Récupérer les statistiques d'entraînement
 async function handleGetTrainingStats(req, res) {
     try {
-        const memories = await executePythonMemory('memory.get_all_memories()');
-        const documents = await executePythonMemory('memory.get_all_documents()');
+        const memories = await callMemory('get_all_memories');
+        const documents = await callMemory('get_all_documents');
 
         const memoryList = Array.isArray(memories) ? memories : [];
         const documentList = Array.isArray(documents) ? documents : [];
@@ -1746,12 +1948,14 @@ async function handleExecuteCode(req, res) {
 
 /**
  * POST /api/search - Effectuer une recherche web (avec cache)
- * Body: { query: string, maxCacheAge?: number }
+ * Body: { query: string, maxCacheAge?: number, refresh?: boolean, fuzzy?: boolean }
+ * refresh: ignorer les caches (utilisé par le rafraîchissement en arrière-plan du serveur mémoire)
+ * fuzzy: accepter en cache les résultats d'une requête proche (désactivé par défaut)
  */
 async function handleWebSearch(req, res) {
     try {
         const body = await readBody(req);
-        const { query, maxCacheAge = 24 } = body;
+        const { query, maxCacheAge = 24, refresh = false, fuzzy = false } = body;
 
         if (!query) {
             sendJSON(res, { success: false, error: 'Query requise' }, 400);
@@ -1761,18 +1965,19 @@ async function handleWebSearch(req, res) {
         console.log('🔍 Recherche web:', query);
 
         // 1. Vérifier d'abord le cache
-        try {
-            const cachedResult = await executePythonMemory(
-                `memory.get_cached_search('${query.replace(/'/g, "\\'")}', ${maxCacheAge})`
-            );
+        if (!refresh) try {
+            const cachedResult = await callMemory('get_cached_search', [query, maxCacheAge, Boolean(fuzzy)]);
 
             if (cachedResult && cachedResult.cached) {
-                console.log(`📦 Résultat trouvé en cache (${cachedResult.hit_count} hits)`);
+                const matched = cachedResult.match === 'fuzzy' ? `, requête proche: "${cachedResult.query}"` : '';
+                const stale = cachedResult.stale ? ', périmé: rafraîchissement en arrière-plan' : '';
+                console.log(`📦 Résultat trouvé en cache (${cachedResult.hit_count} hits${matched}${stale})`);
                 sendJSON(res, {
                     success: true,
                     results: cachedResult.results,
                     source: cachedResult.source,
                     cached: true,
+                    stale: cachedResult.stale,
                     cachedAt: cachedResult.cached_at,
                     hitCount: cachedResult.hit_count
                 });
@@ -1784,7 +1989,7 @@ async function handleWebSearch(req, res) {
         }
 
         // 2. Vérifier dans la base de connaissances permanente
-        try {
+        if (!refresh) try {
             const savedResult = await executePythonWebKnowledge(
                 `web_knowledge_db.get_saved_search('${query.replace(/'/g, "\\'")}')`
             );
@@ -1811,10 +2016,7 @@ async function handleWebSearch(req, res) {
 
         // 4. Sauvegarder dans le cache temporaire
         try {
-            const resultsForCache = JSON.stringify(results.results).replace(/'/g, "\\'");
-            await executePythonMemory(
-                `memory.cache_search_results('${query.replace(/'/g, "\\'")}', ${resultsForCache}, '${results.source}')`
-            );
+            await callMemory('cache_search_results', [query, results.results, results.source]);
             console.log(`💾 Résultats mis en cache`);
         } catch (cacheError) {
             console.log('⚠️ Erreur sauvegarde cache:', cacheError.message);
@@ -1975,13 +2177,16 @@ async function handleSmartChat(req, res) {
 // Nettoyer à la fermeture
 process.on('SIGINT', async () => {
     console.log('\n🛑 Arrêt du serveur...');
+    if (memoryProcess) {
+        memoryProcess.kill();
+    }
     process.exit(0);
 });
 
 // Démarrer le serveur
 server.listen(PORT, () => {
-    // Initialiser la base de données au démarrage
-    exec(`python3 -c "import sys; sys.path.insert(0, '${__dirname}'); import memory; memory.init_database()"`, { cwd: __dirname });
+    // Démarrer le serveur mémoire (initialise la base de données une seule fois)
+    startMemoryServer();
 
     // ============================================
     // MLX SERVER HANDLERS
@@ -0,0 +1,19 @@
+"""Fixtures communes: une base memory.db neuve par test"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import memory
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory, "DB_PATH", tmp_path / "memory.db")
+    memory.init_database()
+    yield tmp_path / "memory.db"
+    memory.disable_write_queue()
+    memory.close_all_connections()
@@ -0,0 +1,55 @@
+"""Tests de la sauvegarde: backup -> verify -> restore"""
+
+import sqlite3
+
+import pytest
+
+import memory
+import memory_backup
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_backup_verify_restore_round_trip(db, tmp_path, compress):
+    memory.add_memory("Sauvegardé", "présent dans l'instantané")
+    backup = memory_backup.backup_database(tmp_path / "backups", compress=compress)
+    assert backup["success"], backup
+    assert backup["schema_version"] == memory.SCHEMA_VERSION
+    # Écrit après l'instantané: absent de la sauvegarde
+    memory.add_memory("Après", "écrit après la sauvegarde")
+
+    verified = memory_backup.verify_backup(backup["path"])
+    assert verified["success"] and verified["matches_manifest"]
+    assert verified["sha256"] == backup["sha256"]
+
+    restored = memory_backup.restore_backup(backup["path"], tmp_path / "restored" / "memory.db")
+    assert restored["success"], restored
+    assert restored["integrity"] == "ok"
+    assert restored["schema_version"] == memory.SCHEMA_VERSION
+
+    conn = sqlite3.connect(restored["path"])
+    titles = [row[0] for row in conn.execute("SELECT title FROM memories")]
+    conn.close()
+    assert titles == ["Sauvegardé"]
+    assert [entry["file"] for entry in memory_backup.list_backups(tmp_path / "backups")] == [backup["file"]]
+
+
+def test_damaged_backup_is_not_restored(db, tmp_path):
+    memory.add_memory("Sauvegardé", "présent dans l'instantané")
+    backup = memory_backup.backup_database(tmp_path / "backups", compress=False)
+    data = bytearray(open(backup["path"], "rb").read())
+    data[-1] ^= 0xFF
+    open(backup["path"], "wb").write(bytes(data))
+
+    verified = memory_backup.verify_backup(backup["path"])
+    assert not verified["success"] and verified["matches_manifest"] is False
+
+    dest = tmp_path / "restored.db"
+    assert not memory_backup.restore_backup(backup["path"], dest)["success"]
+    assert not dest.exists()
+    assert not dest.with_name(dest.name + ".partial").exists()
+
+
+def test_restore_refuses_live_database(db, tmp_path):
+    backup = memory_backup.backup_database(tmp_path / "backups")
+    result = memory_backup.restore_backup(backup["path"], db, overwrite=True)
+    assert not result["success"]
@@ -0,0 +1,46 @@
+"""Tests des documents: import en flux et lecture par tranches"""
+
+import memory
+
+
+def test_upload_parts_are_joined_in_order(db):
+    parts = [f"partie {i:03d} — été, café, 日本語. " for i in range(40)]
+    upload_id = memory.open_document_upload("doc.txt")["upload_id"]
+    for part in parts:
+        assert memory.append_document_upload(upload_id, part, encoding="text")["success"]
+
+    # Lignes des morceaux dans un ordre physique différent de part_index
+    conn = memory.get_connection()
+    rows = conn.execute("SELECT upload_id, part_index, data FROM document_upload_parts ORDER BY part_index DESC").fetchall()
+    conn.execute("DELETE FROM document_upload_parts")
+    conn.executemany("INSERT INTO document_upload_parts (upload_id, part_index, data) VALUES (?, ?, ?)",
+                     [tuple(row) for row in rows])
+    conn.commit()
+    conn.close()
+
+    result = memory.finalize_document_upload(upload_id)
+    assert result["success"]
+    assert memory.get_document_content(result["id"]) == "".join(parts)
+
+
+def test_small_slices_never_cut_multibyte_text_short(db):
+    import asyncio
+
+    import memory_aio
+
+    text = "é日本😀a" * 5 + "fin"
+    doc_id = memory.add_document("multi.txt", text)["id"]
+
+    piece = memory.read_document_slice(doc_id, len("é".encode("utf-8")), 1)
+    assert piece["content"] == "日"
+    assert piece["end_byte"] > piece["start_byte"]
+
+    for slice_size in (1, 2, 3, 5):
+        assert "".join(memory.iter_document_content(doc_id, slice_size)) == text
+
+    async def read_all():
+        return [piece async for piece in memory_aio.iter_document_content(doc_id, slice_size=2)]
+    try:
+        assert "".join(asyncio.run(read_all())) == text
+    finally:
+        memory_aio.shutdown()
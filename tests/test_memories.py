@@ -0,0 +1,29 @@
+"""Tests des souvenirs (quasi-doublons et index LSH)"""
+
+import memory
+
+
+def _bucket_count(memory_id):
+    conn = memory.get_connection()
+    count = conn.execute("SELECT COUNT(*) FROM memories_lsh WHERE memory_id = ?", (memory_id,)).fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_deactivated_memories_leave_no_buckets(db):
+    text = "le serveur de production redémarre chaque nuit à trois heures pour la sauvegarde"
+    kept = memory.add_memory("Redémarrage", text, duplicates="allow")["id"]
+    duplicate = memory.add_memory("Redémarrage", text + " complète", duplicates="allow")["id"]
+    deleted = memory.add_memory("Redémarrage", text + " du disque", duplicates="allow")["id"]
+    assert _bucket_count(deleted) > 0
+
+    memory.delete_memory(deleted)
+    assert _bucket_count(deleted) == 0
+
+    result = memory.deduplicate_memories()
+    assert result["groups"] == {kept: [duplicate]}
+    assert _bucket_count(duplicate) == 0
+    assert _bucket_count(kept) > 0
+
+    memory.clear_all_memories()
+    assert _bucket_count(kept) == 0
@@ -0,0 +1,42 @@
+"""Tests de la façade asyncio (memory_aio)"""
+
+import asyncio
+import time
+
+import pytest
+
+import memory
+import memory_aio
+
+
+def _pinned_connections():
+    return [conn for connections in list(memory_aio._thread_connections)
+            for conn in connections._conns.values()]
+
+
+@pytest.mark.parametrize("wait", [True, False])
+def test_shutdown_closes_worker_connections(db, wait):
+    async def work():
+        await memory_aio.add_memory("Nom", "Je suis Jean", "identity")
+        return await memory_aio.get_all_memories()
+
+    assert len(asyncio.run(work())) == 1
+    connections = _pinned_connections()
+    assert connections
+
+    memory_aio.shutdown(wait=wait)
+    deadline = time.monotonic() + 5
+    while memory_aio._thread_connections and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert memory_aio._thread_connections == []
+    for conn in connections:
+        with pytest.raises(Exception):
+            conn.execute("SELECT 1")
+
+
+def test_only_database_functions_are_mirrored():
+    for name in ("add_memory", "get_cached_search", "rebuild_stat_counters", "read_document_slice"):
+        assert name in memory_aio.MIRRORED
+    for name in ("normalize_query", "compress_results", "query_tokens", "estimate_tokens", "get_connection"):
+        assert name not in memory_aio.MIRRORED
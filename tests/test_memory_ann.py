@@ -0,0 +1,34 @@
+"""Tests de l'index IVF-PQ (memory_ann)"""
+
+import numpy as np
+import pytest
+
+import memory
+import memory_ann
+import memory_vectors
+
+
+@pytest.fixture
+def ann_db(db):
+    memory_ann._reset_ann_index()
+    yield db
+    memory_ann._reset_ann_index()
+
+
+def test_small_index_builds_and_searches(ann_db):
+    # Moins de KSUB vecteurs: les dictionnaires PQ ont moins de 256 centroïdes
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(100, 32)).astype(np.float32)
+    for i, vector in enumerate(vectors):
+        memory_id = memory.add_memory(f"souvenir {i}", f"contenu {i}", duplicates="allow")["id"]
+        memory_vectors.add_memory_embedding(memory_id, vector)
+
+    result = memory_ann.build_ann_index()
+    assert result["success"]
+
+    index = memory_ann.get_ann_index()
+    assert index.codebooks.shape[1] < memory_ann.KSUB
+
+    hits = memory_ann.search_ann(vectors[7], k=3)
+    assert hits
+    assert hits[0]["memory_id"] == 8
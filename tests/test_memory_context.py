@@ -0,0 +1,30 @@
+"""Tests du contexte mémoire (score de pertinence et budget de tokens)"""
+
+import os
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+import memory
+
+
+@pytest.fixture
+def far_timezone():
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = "Pacific/Kiritimati"  # UTC+14
+    time.tzset()
+    yield
+    if previous is None:
+        os.environ.pop("TZ")
+    else:
+        os.environ["TZ"] = previous
+    time.tzset()
+
+
+def test_age_days_reads_sqlite_timestamps_as_utc(far_timezone):
+    now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    now_local = datetime.now().isoformat()
+
+    assert memory._age_days(now_utc) < 0.01
+    assert memory._age_days(now_local) < 0.01
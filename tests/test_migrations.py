@@ -0,0 +1,82 @@
+"""Tests des migrations: une base d'une ancienne version mise à jour en place"""
+
+import json
+from datetime import datetime
+
+import pytest
+
+import memory
+
+
+@pytest.fixture
+def baseline_db(tmp_path, monkeypatch):
+    """Base au schéma initial, remplie comme par une version sans migrations"""
+    monkeypatch.setattr(memory, "DB_PATH", tmp_path / "memory.db")
+    memory.migrate_database(target=1)
+    conn = memory.get_connection()
+    conn.executemany("INSERT INTO memories (title, content, is_active, updated_at) VALUES (?, ?, ?, ?)", [
+        ("Serveur", "le serveur de production redémarre chaque nuit", 1, datetime.now().isoformat()),
+        ("Ancien serveur", "le serveur de test redémarre chaque semaine", 0, datetime.now().isoformat()),
+    ])
+    conn.execute("INSERT INTO documents (name, content, size) VALUES ('notes.txt', 'première ligne\ndeuxième ligne', 30)")
+    conn.execute("INSERT INTO conversations (session_id, title) VALUES ('s1', 'Discussion')")
+    conn.executemany("INSERT INTO messages (conversation_id, role, content) VALUES (1, ?, ?)",
+                     [("user", "bonjour"), ("assistant", "bonjour, que puis-je faire ?")])
+    conn.execute("INSERT INTO web_search_cache (query, query_normalized, results) VALUES (?, ?, ?)",
+                 ("Météo Paris", memory.normalize_query("Météo Paris"), json.dumps([{"title": "Ensoleillé"}])))
+    conn.commit()
+    conn.close()
+    yield tmp_path / "memory.db"
+    memory.flush_search_hits()
+    memory.close_all_connections()
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def test_baseline_database_migrates_to_latest(baseline_db):
+    result = memory.migrate_database()
+
+    assert result["from"] == 1
+    assert result["to"] == memory.SCHEMA_VERSION
+    assert [m["version"] for m in result["applied"]] == list(range(2, memory.SCHEMA_VERSION + 1))
+    assert memory.get_schema_version() == memory.SCHEMA_VERSION
+
+    conn = memory.get_connection()
+    assert {"fingerprint", "deactivated_at"} <= _columns(conn, "memories")
+    assert {"expires_at", "results_size", "eviction_score"} <= _columns(conn, "web_search_cache")
+    triggers = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+    assert {"memories_lsh_deactivated_au", "web_search_cache_score_au", "memories_deactivated_au"} <= triggers
+
+    # Rattrapages des lignes existantes
+    deactivated_at, = conn.execute("SELECT deactivated_at FROM memories WHERE id = 2").fetchone()
+    assert deactivated_at is not None and "T" not in deactivated_at
+    buckets = dict(conn.execute("SELECT memory_id, COUNT(*) FROM memories_lsh GROUP BY memory_id").fetchall())
+    assert set(buckets) == {1}
+    cache = conn.execute("SELECT expires_at, results_size, eviction_score FROM web_search_cache").fetchone()
+    assert None not in tuple(cache)
+    conn.close()
+
+    assert [m["id"] for m in memory.search_memories("production")] == [1]
+    assert memory.search_memories("semaine") == []
+    assert len(memory.get_document_chunks(1)) > 0
+    assert memory.get_cached_search("météo paris")["results"] == [{"title": "Ensoleillé"}]
+    assert memory.list_conversations()["conversations"][0]["message_count"] == 2
+
+    # Base à jour: plus rien à appliquer
+    assert memory.migrate_database()["applied"] == []
+
+
+def test_database_without_user_version_migrates(baseline_db):
+    """Une base d'avant user_version (0) repasse par toutes les migrations"""
+    conn = memory.get_connection()
+    conn.execute("PRAGMA user_version = 0")
+    conn.close()
+
+    result = memory.migrate_database()
+
+    assert result["from"] == 0
+    assert len(result["applied"]) == memory.SCHEMA_VERSION
+    assert memory.get_schema_version() == memory.SCHEMA_VERSION
+    assert [m["title"] for m in memory.search_memories("production")] == ["Serveur"]
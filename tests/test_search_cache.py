@@ -0,0 +1,84 @@
+"""Tests du cache des recherches web"""
+
+import memory
+
+
+def _hit_count(cache_id):
+    conn = memory.get_connection(readonly=True)
+    row = conn.execute("SELECT hit_count FROM web_search_cache WHERE id = ?", (cache_id,)).fetchone()
+    conn.close()
+    return row[0]
+
+
+def test_refresh_keeps_row_and_hit_count(db):
+    cache_id = memory.cache_search_results("météo paris", [{"title": "Avant"}], "test")["id"]
+    for _ in range(10):
+        assert memory.get_cached_search("météo paris") is not None
+    memory.flush_search_hits()
+    assert _hit_count(cache_id) == 10
+
+    # Hits encore en mémoire au moment du rafraîchissement
+    for _ in range(3):
+        memory.get_cached_search("météo paris")
+    refreshed = memory.cache_search_results("Météo Paris", [{"title": "Après"}], "test")
+    assert refreshed["id"] == cache_id
+    memory.flush_search_hits()
+    assert _hit_count(cache_id) == 13
+
+    cached = memory.get_cached_search("météo paris")
+    assert cached["results"] == [{"title": "Après"}]
+    assert cached["hit_count"] == 14
+    assert memory.get_search_cache_stats()["total_cached"] == 1
+
+
+def test_eviction_reads_score_index_and_keeps_popular_entries(db):
+    for i in range(20):
+        memory.cache_search_results(f"requête {i} mot{i}", [{"title": f"résultat {i}" * 50}], "test")
+    for _ in range(5):
+        memory.get_cached_search("requête 3 mot3")
+    memory.flush_search_hits()
+
+    conn = memory.get_connection(readonly=True)
+    plan = [row[3] for row in conn.execute("""
+        EXPLAIN QUERY PLAN
+        SELECT id, COALESCE(results_size, 0) FROM web_search_cache WHERE id != ? ORDER BY eviction_score
+    """, (0,))]
+    conn.close()
+    assert any("idx_web_cache_score" in detail for detail in plan)
+    assert not any("TEMP B-TREE" in detail for detail in plan)
+
+    total = memory.get_stat_counters()["search_cache.bytes_stored"]
+    result = memory.enforce_search_cache_budget(max_bytes=total // 2)
+    assert result["evicted"] > 0
+    assert memory.get_cached_search("requête 3 mot3") is not None
+
+
+def test_fuzzy_lookup_is_opt_in(db):
+    memory.cache_search_results("météo paris demain", [{"title": "Paris"}], "test")
+
+    assert memory.get_cached_search("demain météo à paris") is None
+    cached = memory.get_cached_search("demain météo à paris", fuzzy=True)
+    assert cached["match"] == "fuzzy"
+    assert cached["query"] == "météo paris demain"
+
+
+def test_hit_flush_runs_off_the_reader_thread(db, monkeypatch):
+    import threading
+
+    cache_id = memory.cache_search_results("météo lyon", [{"title": "Lyon"}], "test")["id"]
+    flush = memory.flush_search_hits
+    flush_threads = []
+
+    def recording_flush():
+        flush_threads.append(threading.current_thread())
+        return flush()
+    monkeypatch.setattr(memory, "flush_search_hits", recording_flush)
+
+    for _ in range(memory.HIT_FLUSH_EVERY):
+        memory.get_cached_search("météo lyon")
+    timer = memory._search_lru["timer"]
+    assert timer is not None and memory._search_lru["urgent"]
+    timer.join(5)
+
+    assert flush_threads and threading.current_thread() not in flush_threads
+    assert _hit_count(cache_id) == memory.HIT_FLUSH_EVERY
@@ -0,0 +1,70 @@
+"""Tests de la file d'écriture (écrivain unique, commit groupé)"""
+
+import threading
+
+import pytest
+
+import memory
+
+
+def _titles():
+    conn = memory.get_connection(readonly=True)
+    titles = [row[0] for row in conn.execute("SELECT title FROM memories ORDER BY id")]
+    conn.close()
+    return titles
+
+
+def _insert(title):
+    conn = memory.get_connection()
+    conn.execute("INSERT INTO memories (title, content) VALUES (?, ?)", (title, "contenu"))
+    conn.commit()
+    conn.close()
+
+
+def _insert_then_fail(title):
+    _insert(title)
+    raise ValueError("échec voulu")
+
+
+def test_failed_operation_is_rolled_back_alone(db):
+    memory.enable_write_queue()
+    writer = memory.get_write_queue()
+    started, release = threading.Event(), threading.Event()
+    blocker = writer.submit(lambda: (started.set(), release.wait(5)))
+    started.wait(5)
+
+    # Ces trois opérations attendent derrière blocker: elles forment un même lot
+    futures = [writer.submit(_insert, "a"), writer.submit(_insert_then_fail, "b"), writer.submit(_insert, "c")]
+    release.set()
+    blocker.result(5)
+
+    assert futures[0].result(5) is None
+    with pytest.raises(ValueError):
+        futures[1].result(5)
+    assert futures[2].result(5) is None
+    assert _titles() == ["a", "c"]
+    assert writer.batches == 2
+
+
+@pytest.mark.parametrize("queued", [False, True])
+def test_bulk_insert_reports_only_committed_batches(db, queued):
+    if queued:
+        memory.enable_write_queue()
+    rows = [(f"titre {i}", f"contenu numéro {i}") for i in range(5)] + [(None, "titre manquant")]
+
+    result = memory.add_memories(rows, commit_every=2)
+
+    assert not result["success"]
+    assert result["ids"] == [1, 2, 3, 4]
+    assert _titles() == ["titre 0", "titre 1", "titre 2", "titre 3"]
+
+
+def test_bulk_insert_without_chunks_is_all_or_nothing(db):
+    memory.enable_write_queue()
+    rows = [("titre", "contenu"), (None, "titre manquant")]
+
+    result = memory.add_memories(rows)
+
+    assert not result["success"]
+    assert result["ids"] == []
+    assert _titles() == []